@@ -0,0 +1,164 @@
+"""
+Сжатие ответов API с выбором алгоритма по Accept-Encoding.
+
+РЕШЕНИЕ: Свой middleware вместо django.middleware.gzip.GZipMiddleware
+ПОЧЕМУ:
+1. В списке книг ФИО и bio автора повторяются в каждой строке - JSON
+   сжимается в разы, а GZipMiddleware умеет только gzip
+2. brotli и zstd (пакеты brotli и zstandard, если установлены) при той же
+   степени сжатия быстрее gzip; алгоритм выбирается по q из
+   Accept-Encoding, при равных q - по порядку COMPRESSION_ENCODINGS
+3. Ответы короче COMPRESSION_MIN_SIZE не сжимаются: заголовки и CPU
+   стоят дороже выигрыша
+4. Сжимаются только ответы на безопасные методы: ответ на POST /token/
+   содержит секрет рядом с данными клиента (атака BREACH)
+"""
+import gzip
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+from .instrumentation import timed
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli необязателен
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard необязателен
+    zstandard = None
+
+# Уровни для динамических ответов: максимальные дают проценты выигрыша
+# за кратно больший CPU на каждый запрос
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+COMPRESSIBLE_TYPES = (
+    "application/json", "application/msgpack", "application/x-ndjson",
+    "application/vnd.oai.openapi", "text/",
+)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def gzip_compress(data):
+    # mtime=0: одинаковые ответы дают одинаковые байты
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+CODECS = {"gzip": gzip_compress}
+if brotli is not None:
+    CODECS["br"] = lambda data: brotli.compress(data, quality=BROTLI_QUALITY)
+if zstandard is not None:
+    CODECS["zstd"] = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress
+
+
+def parse_accept_encoding(header):
+    """'br;q=1.0, gzip;q=0.8, *;q=0' -> {"br": 1.0, "gzip": 0.8, "*": 0.0}"""
+    accepted = {}
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+def choose_encoding(header, encodings):
+    """Кодировка из encodings (в порядке предпочтения сервера) или None"""
+    accepted = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for name in encodings:
+        quality = accepted.get(name, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def compress(data, encoding):
+    return CODECS[encoding](data)
+
+
+class CompressionMiddleware:
+    """
+    Ставится сразу после InstrumentationMiddleware: время сжатия попадает
+    в фазу compress заголовка Server-Timing
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.encodings = [
+            name for name in settings.COMPRESSION_ENCODINGS if name in CODECS
+        ]
+        if not self.encodings:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.min_size = settings.COMPRESSION_MIN_SIZE
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.process(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process(request, await self.get_response(request))
+
+    def compressible(self, request, response):
+        return (
+            request.method in SAFE_METHODS
+            and response.status_code == 200
+            and not response.streaming
+            and not response.has_header("Content-Encoding")
+            and response.get("Content-Type", "").startswith(
+                COMPRESSIBLE_TYPES
+            )
+            and len(response.content) >= self.min_size
+        )
+
+    def process(self, request, response):
+        if not self.compressible(request, response):
+            return response
+
+        # Ответ зависит от Accept-Encoding, даже если этот клиент
+        # получит его без сжатия
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = choose_encoding(
+            request.headers.get("Accept-Encoding", ""), self.encodings
+        )
+        if encoding is None:
+            return response
+
+        with timed("compress"):
+            content = compress(response.content, encoding)
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response["Content-Length"] = str(len(content))
+        response["Content-Encoding"] = encoding
+        # Как GZipMiddleware: байты сжатого и несжатого ответа разные,
+        # поэтому сильный ETag становится слабым (If-None-Match сравнивает
+        # слабо и продолжает давать 304)
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
@@ -0,0 +1,381 @@
+"""
+Инструментирование запросов API: SQL, сериализация, рендер, перцентили.
+
+РЕШЕНИЕ: Метрики запроса в ContextVar + постоянный execute_wrapper на
+каждом соединении
+ПОЧЕМУ:
+1. Без замеров непонятно, куда уходит время /api/v1/*: в БД, N+1,
+   сериализацию или рендер JSON
+2. execute_wrapper ставится один раз при создании соединения (сигнал
+   connection_created) - так он видит и реплики (library.routers), и
+   запросы async views из потока sync_to_async. Вне запроса обертка
+   стоит одного ContextVar.get()
+3. На запрос - два perf_counter и инкремент словаря на SQL, без
+   стек-трейсов и копирования параметров: можно держать включенным в
+   продакшене
+4. Результат уходит в заголовок Server-Timing (DevTools браузера),
+   в структурированный лог и в скользящее окно перцентилей по endpoint'ам,
+   которое отдает /metrics в текстовом формате Prometheus
+"""
+import hmac
+import json
+import logging
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger("api.requests")
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    __slots__ = ("started", "queries", "db_time", "statements", "phases")
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        # Текст SQL с плейсхолдерами -> сколько раз выполнен. Один и тот
+        # же запрос с разными параметрами - признак N+1
+        self.statements = {}
+        # serialize/render -> секунды
+        self.phases = {}
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values())
+
+    def worst_duplicate(self):
+        if not self.statements:
+            return None, 0
+        return max(self.statements.items(), key=lambda item: item[1])
+
+
+def current_metrics():
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += perf_counter() - started
+        metrics.queries += 1
+        metrics.statements[sql] = metrics.statements.get(sql, 0) + 1
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created: при переподключении обертка уже стоит"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed(phase):
+    """
+    Засекает фазу запроса; работает и как декоратор. Вне
+    инструментированного запроса ничего не делает
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(phase, perf_counter() - started)
+
+
+class EndpointStats:
+    """Скользящее окно последних запросов endpoint'а и счетчики с запуска"""
+
+    def __init__(self, window):
+        self.durations = deque(maxlen=window)
+        self.queries = deque(maxlen=window)
+        self.count = 0
+        self.duration_sum = 0.0
+        self.queries_sum = 0
+        self.db_sum = 0.0
+        self.duplicates = 0
+        self.phases = Counter()
+        self.statuses = Counter()
+
+
+def quantile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def escape(value):
+    return (
+        str(value).replace("\\", "\\\\").replace("\n", "\\n")
+        .replace('"', '\\"')
+    )
+
+
+class MetricsRegistry:
+    """
+    Метрики процесса. При нескольких воркерах gunicorn каждый отдает
+    свои - Prometheus собирает их с каждого воркера или через сумму
+    """
+
+    def __init__(self, window=None):
+        self.window = window or settings.INSTRUMENTATION_WINDOW
+        self.endpoints = {}
+        self.lock = threading.Lock()
+
+    def observe(self, method, view, status, duration, metrics):
+        key = (method, view)
+        with self.lock:
+            stats = self.endpoints.get(key)
+            if stats is None:
+                stats = self.endpoints[key] = EndpointStats(self.window)
+            stats.durations.append(duration)
+            stats.queries.append(metrics.queries)
+            stats.count += 1
+            stats.duration_sum += duration
+            stats.queries_sum += metrics.queries
+            stats.db_sum += metrics.db_time
+            stats.duplicates += metrics.duplicates
+            stats.phases.update(metrics.phases)
+            stats.statuses[status] += 1
+
+    def snapshot(self):
+        # Перцентили считаются при чтении /metrics, а не на каждый запрос
+        with self.lock:
+            return [
+                (key, stats, sorted(stats.durations), sorted(stats.queries))
+                for key, stats in self.endpoints.items()
+            ]
+
+    def render(self):
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        snapshot = self.snapshot()
+
+        def labels(key, **extra):
+            method, view = key
+            pairs = {"method": method, "view": view, **extra}
+            return ",".join(f'{k}="{escape(v)}"' for k, v in pairs.items())
+
+        metric("library_http_request_duration_seconds", "summary",
+               "Время ответа (скользящее окно для квантилей)")
+        for key, stats, durations, _ in snapshot:
+            for q in QUANTILES:
+                lines.append(
+                    "library_http_request_duration_seconds"
+                    f"{{{labels(key, quantile=q)}}} "
+                    f"{quantile(durations, q):.6f}"
+                )
+            lines.append(
+                f"library_http_request_duration_seconds_sum{{{labels(key)}}} "
+                f"{stats.duration_sum:.6f}"
+            )
+            lines.append(
+                "library_http_request_duration_seconds_count"
+                f"{{{labels(key)}}} {stats.count}"
+            )
+
+        metric("library_db_queries_per_request", "summary",
+               "SQL-запросов на запрос (скользящее окно для квантилей)")
+        for key, stats, _, queries in snapshot:
+            for q in QUANTILES:
+                lines.append(
+                    f"library_db_queries_per_request{{{labels(key, quantile=q)}}} "
+                    f"{quantile(queries, q)}"
+                )
+            lines.append(
+                f"library_db_queries_per_request_sum{{{labels(key)}}} "
+                f"{stats.queries_sum}"
+            )
+            lines.append(
+                f"library_db_queries_per_request_count{{{labels(key)}}} "
+                f"{stats.count}"
+            )
+
+        metric("library_http_requests_total", "counter",
+               "Запросы по статусу ответа")
+        for key, stats, _, _ in snapshot:
+            for status, count in sorted(stats.statuses.items()):
+                lines.append(
+                    f"library_http_requests_total"
+                    f"{{{labels(key, status=status)}}} {count}"
+                )
+
+        metric("library_db_duration_seconds_total", "counter",
+               "Суммарное время SQL")
+        for key, stats, _, _ in snapshot:
+            lines.append(
+                f"library_db_duration_seconds_total{{{labels(key)}}} "
+                f"{stats.db_sum:.6f}"
+            )
+
+        metric("library_db_duplicate_queries_total", "counter",
+               "Повторы одного SQL в пределах запроса (признак N+1)")
+        for key, stats, _, _ in snapshot:
+            lines.append(
+                f"library_db_duplicate_queries_total{{{labels(key)}}} "
+                f"{stats.duplicates}"
+            )
+
+        metric("library_phase_duration_seconds_total", "counter",
+               "Суммарное время фаз serialize и render")
+        for key, stats, _, _ in snapshot:
+            for phase, seconds in sorted(stats.phases.items()):
+                lines.append(
+                    f"library_phase_duration_seconds_total"
+                    f"{{{labels(key, phase=phase)}}} {seconds:.6f}"
+                )
+
+        return "\n".join(lines) + "\n"
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MetricsRegistry()
+    return _registry
+
+
+def server_timing(metrics, total):
+    entries = [
+        f'db;dur={metrics.db_time * 1000:.1f};'
+        f'desc="{metrics.queries} queries, {metrics.duplicates} dup"'
+    ]
+    for phase, seconds in metrics.phases.items():
+        entries.append(f"{phase};dur={seconds * 1000:.1f}")
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def log_request(request, response, view, metrics, total):
+    sql, repeats = metrics.worst_duplicate()
+    n_plus_one = repeats >= settings.INSTRUMENTATION_DUPLICATE_THRESHOLD
+    level = logging.WARNING if n_plus_one else logging.INFO
+    if not logger.isEnabledFor(level):
+        return
+    record = {
+        "method": request.method,
+        "path": request.path,
+        # С query string лог можно проиграть: manage.py bench_replay --log
+        "query": request.META.get("QUERY_STRING", ""),
+        "view": view,
+        "status": response.status_code,
+        "duration_ms": round(total * 1000, 2),
+        "db_queries": metrics.queries,
+        "db_ms": round(metrics.db_time * 1000, 2),
+        "db_duplicates": metrics.duplicates,
+        **{
+            f"{phase}_ms": round(seconds * 1000, 2)
+            for phase, seconds in metrics.phases.items()
+        },
+    }
+    if n_plus_one:
+        record["n_plus_one"] = {"sql": sql[:300], "count": repeats}
+    logger.log(
+        level, json.dumps(record, ensure_ascii=False),
+        extra={"metrics": record},
+    )
+
+
+class InstrumentationMiddleware:
+    """
+    Внешний middleware: замеряет запросы с префиксами
+    INSTRUMENTATION_PATH_PREFIXES вместе со всеми остальными middleware
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefixes = tuple(settings.INSTRUMENTATION_PATH_PREFIXES)
+        self.registry = get_registry()
+        # Под ASGI не заставляем async views проходить через поток
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not request.path.startswith(self.prefixes):
+            return self.get_response(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        if not request.path.startswith(self.prefixes):
+            return await self.get_response(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        total = perf_counter() - metrics.started
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match is not None else "unmatched"
+        self.registry.observe(
+            request.method, view, response.status_code, total, metrics
+        )
+        if settings.INSTRUMENTATION_SERVER_TIMING:
+            response["Server-Timing"] = server_timing(metrics, total)
+        log_request(request, response, view, metrics, total)
+        return response
+
+
+def metrics_view(request):
+    """
+    /metrics в текстовом формате Prometheus по заголовку
+    Authorization: Bearer <METRICS_TOKEN>; без METRICS_TOKEN - 404
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        raise Http404
+    if not hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(),
+        f"Bearer {token}".encode(),
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        get_registry().render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
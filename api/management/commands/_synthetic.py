@@ -0,0 +1,201 @@
+"""
+Синтетический каталог для бенчмарков: авторы и книги в духе db.json.
+
+ФИО собираются из частых русских имен и фамилий с правильными женскими
+формами, названия - из словаря. Распределение книг по авторам
+степенное (закон Ципфа): несколько авторов с тысячами книг и длинный
+хвост авторов с одной-двумя - так выглядит настоящий каталог, и именно
+такие перекосы ломают планы запросов.
+"""
+import random
+from bisect import bisect
+from datetime import date
+from itertools import accumulate
+
+MALE_NAMES = (
+    "Александр", "Алексей", "Андрей", "Антон", "Борис", "Василий", "Виктор",
+    "Владимир", "Георгий", "Григорий", "Дмитрий", "Евгений", "Иван", "Игорь",
+    "Константин", "Лев", "Михаил", "Николай", "Олег", "Павел", "Петр",
+    "Сергей", "Степан", "Федор", "Юрий",
+)
+FEMALE_NAMES = (
+    "Александра", "Анна", "Валентина", "Вера", "Галина", "Дарья", "Екатерина",
+    "Елена", "Зинаида", "Ирина", "Лидия", "Любовь", "Мария", "Марина",
+    "Надежда", "Наталья", "Ольга", "Светлана", "Софья", "Татьяна",
+)
+# Отчество: основа + мужское/женское окончание
+PATRONYMICS = (
+    ("Александров", "ич", "на"), ("Алексеев", "ич", "на"),
+    ("Андреев", "ич", "на"), ("Борисов", "ич", "на"),
+    ("Васильев", "ич", "на"), ("Владимиров", "ич", "на"),
+    ("Дмитриев", "ич", "на"), ("Иванов", "ич", "на"),
+    ("Михайлов", "ич", "на"), ("Николаев", "ич", "на"),
+    ("Павлов", "ич", "на"), ("Петров", "ич", "на"),
+    ("Сергеев", "ич", "на"), ("Федоров", "ич", "на"),
+    ("Ильич", "", "на"),
+)
+SURNAMES = (
+    "Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров",
+    "Соколов", "Михайлов", "Новиков", "Федоров", "Морозов", "Волков",
+    "Алексеев", "Лебедев", "Семенов", "Егоров", "Павлов", "Козлов",
+    "Степанов", "Николаев", "Орлов", "Андреев", "Макаров", "Никитин",
+    "Захаров", "Зайцев", "Соловьев", "Борисов", "Яковлев", "Григорьев",
+    "Романов", "Воробьев", "Сергеев", "Кузьмин", "Фролов", "Александров",
+    "Дмитриев", "Королев", "Гусев", "Киселев", "Ильин", "Максимов",
+    "Поляков", "Сорокин", "Виноградов", "Ковалев", "Белов", "Медведев",
+    "Антонов", "Тарасов", "Жуков", "Баранов", "Филиппов", "Комаров",
+    "Давыдов", "Беляев", "Герасимов", "Богданов", "Осипов", "Сидоров",
+    "Матвеев", "Титов", "Марков", "Миронов", "Крылов", "Куликов",
+    "Карпов", "Власов", "Мельников", "Денисов", "Гаврилов", "Тихонов",
+    "Казаков", "Афанасьев", "Данилов", "Савельев", "Тимофеев", "Фомин",
+    "Чернов", "Абрамов", "Мартынов", "Ефимов", "Федотов", "Щербаков",
+    "Назаров", "Калинин", "Исаев", "Чернышев", "Быков", "Маслов",
+    "Родионов", "Коновалов", "Лазарев", "Воронин", "Климов", "Филатов",
+    "Пономарев", "Голубев", "Кудрявцев", "Прохоров", "Наумов", "Потапов",
+    "Журавлев", "Овчинников", "Трофимов", "Леонов", "Соболев", "Ермаков",
+    "Колесников", "Гончаров", "Емельянов", "Никифоров", "Грачев", "Котов",
+    "Гришин", "Ефремов", "Архипов", "Громов", "Кириллов", "Малышев",
+    "Панов", "Моисеев", "Румянцев", "Акимов", "Кондратьев", "Бирюков",
+    "Горбунов", "Анисимов", "Еремин", "Тихомиров", "Галкин", "Лукьянов",
+    "Михеев", "Скворцов", "Юдин", "Белоусов", "Нестеров", "Симонов",
+    "Прокофьев", "Харитонов", "Князев", "Цветков", "Левин", "Митрофанов",
+    "Воронов", "Аксенов", "Софронов", "Мальцев", "Логинов", "Горшков",
+    "Савин", "Краснов", "Майоров", "Демидов", "Елисеев", "Рыбаков",
+    "Сафонов", "Плотников", "Демин", "Хохлов", "Жданов", "Островский",
+    "Вознесенский", "Покровский", "Успенский", "Белинский", "Преображенский",
+)
+ADJECTIVES = (
+    "Тихий", "Белый", "Последний", "Дальний", "Старый", "Новый", "Золотой",
+    "Темный", "Зимний", "Летний", "Красный", "Синий", "Горький", "Чужой",
+    "Вечный", "Забытый", "Северный", "Южный", "Потерянный", "Ясный",
+    "Долгий", "Ранний", "Поздний", "Речной", "Лесной", "Степной", "Морской",
+    "Ночной", "Утренний", "Осенний", "Весенний", "Каменный", "Стеклянный",
+    "Тайный", "Верный", "Одинокий", "Бедный", "Веселый", "Светлый", "Родной",
+)
+NOUNS = (
+    "дом", "сад", "берег", "путь", "огонь", "ветер", "город", "лес",
+    "остров", "мост", "край", "рассвет", "вечер", "голос", "след",
+    "поезд", "колокол", "перевал", "маяк", "двор", "причал", "сон",
+    "полк", "портрет", "рубеж", "хутор", "приход", "разговор", "год",
+    "век", "свет", "шум", "обрыв", "родник", "тракт", "плен", "бал",
+    "пароход", "сундук", "флигель",
+)
+GENITIVES = (
+    "времени", "памяти", "судьбы", "весны", "реки", "степи", "моря",
+    "детства", "войны", "дороги", "ночи", "надежды", "тишины", "снега",
+    "отца", "матери", "героя", "мастера", "сна", "правды", "осени",
+    "зимы", "юности", "старости", "чести", "совести", "разлуки", "встречи",
+    "любви", "смерти", "жизни", "родины", "эпохи", "империи", "столицы",
+    "провинции", "деревни", "усадьбы", "поколения", "семьи",
+)
+PREFACES = (
+    "Роман о семье, пережившей смену эпох.",
+    "Сборник рассказов о провинциальной жизни.",
+    "Повесть о взрослении и первой любви.",
+    "Документальная проза, основанная на письмах и дневниках.",
+    "Исторический роман о забытых страницах прошлого.",
+    "",
+)
+BIOS = (
+    "Русский писатель, прозаик и драматург.",
+    "Поэт и переводчик, автор сборников стихов.",
+    "Публицист и литературный критик.",
+    "Прозаик, лауреат литературных премий.",
+    "",
+)
+
+# Книг автора без номера тома (см. CatalogueGenerator.title)
+UNNUMBERED_BOOKS = 8
+
+# Масштабы: (авторов, книг)
+SCALES = {
+    "10k": (1_000, 10_000),
+    "1m": (50_000, 1_000_000),
+    "10m": (300_000, 10_000_000),
+}
+
+
+def female_surname(surname):
+    if surname.endswith("ский"):
+        return surname[:-2] + "ая"
+    if surname.endswith(("ов", "ев", "ин", "ын")):
+        return surname + "а"
+    return surname
+
+
+class CatalogueGenerator:
+    """
+    Детерминированный генератор: один seed - один и тот же каталог, чтобы
+    результаты бенчмарков разных коммитов были сравнимы
+    """
+
+    def __init__(self, seed=0, skew=1.1):
+        self.random = random.Random(seed)
+        self.skew = skew
+
+    def author(self):
+        rnd = self.random
+        female = rnd.random() < 0.3
+        stem, male_end, female_end = rnd.choice(PATRONYMICS)
+        surname = rnd.choice(SURNAMES)
+        # Активные годы автора: книги группируются вокруг них
+        born = rnd.randint(1750, 1975)
+        return {
+            "last_name": female_surname(surname) if female else surname,
+            "first_name": rnd.choice(FEMALE_NAMES if female else MALE_NAMES),
+            # Отчество есть не у всех (иностранные авторы, псевдонимы)
+            "middle_name": (
+                stem + (female_end if female else male_end)
+                if rnd.random() < 0.85 else None
+            ),
+            "birth_date": (
+                date(born, rnd.randint(1, 12), rnd.randint(1, 28))
+                if rnd.random() < 0.9 else None
+            ),
+            "bio": rnd.choice(BIOS),
+            "born": born,
+        }
+
+    def title(self, number=0):
+        """
+        number - порядковый номер книги у автора. У плодовитых авторов
+        словаря не хватает на уникальные названия (unique_author_title),
+        поэтому после первых книг идут тома: "Тихий дом. Том 12"
+        """
+        rnd = self.random
+        roll = rnd.random()
+        if roll < 0.4:
+            title = f"{rnd.choice(ADJECTIVES)} {rnd.choice(NOUNS)}"
+        elif roll < 0.7:
+            title = f"{rnd.choice(NOUNS).capitalize()} {rnd.choice(GENITIVES)}"
+        else:
+            title = (
+                f"{rnd.choice(ADJECTIVES)} {rnd.choice(NOUNS)} "
+                f"{rnd.choice(GENITIVES)}"
+            )
+        if number >= UNNUMBERED_BOOKS:
+            title += f". Том {number - UNNUMBERED_BOOKS + 1}"
+        return title
+
+    def year(self, born):
+        # Первая книга в 20-35 лет, карьера до ~50 лет; в рамках CHECK
+        year = born + self.random.randint(20, 35) + int(
+            self.random.expovariate(1 / 12)
+        )
+        return max(1000, min(2030, year))
+
+    def preface(self):
+        return self.random.choice(PREFACES)
+
+    def author_weights(self, count):
+        """
+        Накопленные веса Ципфа: автор i получает книги с весом 1/(i+1)^s.
+        Порядок авторов перемешан, чтобы плодовитые не шли подряд по id
+        """
+        ranks = list(range(count))
+        self.random.shuffle(ranks)
+        return list(accumulate(1 / (rank + 1) ** self.skew for rank in ranks))
+
+    def pick(self, cumulative):
+        point = self.random.random() * cumulative[-1]
+        return min(bisect(cumulative, point), len(cumulative) - 1)
@@ -0,0 +1,142 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.test import RequestFactory, override_settings
+
+from library.models import Book
+
+from ._bench import isolated_database, populate
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочное сравнение чтения каталога: WSGI (пул потоков, как "
+        "gunicorn --threads) против ASGI (цикл событий, как uvicorn) для "
+        "синхронных viewset'ов и async views. Приложения вызываются в "
+        "процессе, без HTTP-сервера; кэш ответов выключен"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--books", type=int, default=20_000)
+        parser.add_argument("--authors", type=int, default=1_000)
+        parser.add_argument("--requests", type=int, default=1_000)
+        parser.add_argument(
+            "--concurrency", type=int, nargs="+", default=[1, 8, 32]
+        )
+
+    def handle(self, *args, **options):
+        with isolated_database(), override_settings(
+            CATALOGUE_CACHE_TIMEOUT=0, DEBUG=False
+        ):
+            populate(options["authors"], options["books"])
+            self.run(options)
+
+    def run(self, options):
+        wsgi = get_wsgi_application()
+        asgi = get_asgi_application()
+        book = Book.objects.order_by("id").values_list("id", flat=True)[0]
+        endpoints = [
+            ("список", "books/?cursor="),
+            ("карточка", f"books/{book}/"),
+        ]
+        cases = [
+            ("WSGI viewset", "/api/v1/", self.run_wsgi, wsgi),
+            ("ASGI viewset", "/api/v1/", self.run_asgi, asgi),
+            ("ASGI async view", "/api/v1/async/", self.run_asgi, asgi),
+        ]
+
+        self.stdout.write(
+            f"{'endpoint':<10} {'сервер':<16} {'conc':>5} {'req/s':>9} "
+            f"{'p50 ms':>8} {'p99 ms':>8}"
+        )
+        for label, endpoint in endpoints:
+            for name, prefix, runner, app in cases:
+                for concurrency in options["concurrency"]:
+                    elapsed, latencies = runner(
+                        app, prefix + endpoint, options["requests"],
+                        concurrency,
+                    )
+                    self.report(label, name, concurrency, elapsed, latencies)
+
+    def report(self, label, name, concurrency, elapsed, latencies):
+        latencies = sorted(latencies)
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f"{label:<10} {name:<16} {concurrency:>5} "
+            f"{len(latencies) / elapsed:>9,.0f} "
+            f"{statistics.median(latencies) * 1000:>8.2f} "
+            f"{p99 * 1000:>8.2f}"
+        )
+
+    @staticmethod
+    def run_wsgi(app, url, total, concurrency):
+        factory = RequestFactory()
+
+        def start_response(status, headers, exc_info=None):
+            assert status.startswith("200"), status
+
+        def call(_):
+            environ = factory.get(url).environ
+            started = time.perf_counter()
+            body = app(environ, start_response)
+            b"".join(body)
+            body.close()
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(call, range(total)))
+        return time.perf_counter() - started, latencies
+
+    @staticmethod
+    def run_asgi(app, url, total, concurrency):
+        parts = urlsplit(url)
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": parts.path,
+            "raw_path": parts.path.encode(),
+            "query_string": parts.query.encode(),
+            "headers": [(b"host", b"testserver")],
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+
+        async def call(semaphore):
+            sent = False
+
+            async def receive():
+                nonlocal sent
+                if not sent:
+                    sent = True
+                    return {"type": "http.request", "body": b""}
+                # Клиент не отключается: Django отменит ожидание сам
+                await asyncio.Future()
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    assert message["status"] == 200, message["status"]
+
+            async with semaphore:
+                started = time.perf_counter()
+                await app(dict(scope), receive, send)
+                return time.perf_counter() - started
+
+        async def main():
+            semaphore = asyncio.Semaphore(concurrency)
+            started = time.perf_counter()
+            latencies = await asyncio.gather(
+                *(call(semaphore) for _ in range(total))
+            )
+            return time.perf_counter() - started, latencies
+
+        return asyncio.run(main())
@@ -0,0 +1,131 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from library.cache import bump_generation
+from library.models import Author, Book
+from library.search import author_document, book_document
+from library.stats import (
+    install_stats_triggers, reconcile, uninstall_stats_triggers,
+)
+
+from ._synthetic import SCALES, CatalogueGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет текущую БД синтетическим каталогом для bench_replay: "
+        "русские ФИО, названия из словаря, степенное распределение книг по "
+        "авторам. Один --seed - один и тот же каталог"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale", choices=sorted(SCALES), default="10k",
+            help="Готовый масштаб: 10k, 1m или 10m книг",
+        )
+        parser.add_argument("--authors", type=int, help="Вместо --scale")
+        parser.add_argument("--books", type=int, help="Вместо --scale")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--skew", type=float, default=1.1,
+            help="Показатель Ципфа: больше - сильнее перекос к "
+                 "плодовитым авторам",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--append", action="store_true",
+            help="Дописать к непустому каталогу",
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        if Book.objects.exists() and not options["append"]:
+            raise CommandError(
+                "Каталог не пуст. Используйте чистую БД или --append."
+            )
+        authors, books = SCALES[options["scale"]]
+        authors = options["authors"] or authors
+        books = options["books"] or books
+        generator = CatalogueGenerator(options["seed"], options["skew"])
+
+        # РЕШЕНИЕ: Триггеры статистики авторов снимаем на время загрузки
+        # ПОЧЕМУ: UPDATE автора на каждую из миллионов книг дороже одного
+        # пересчета пачками в конце (library.stats.reconcile)
+        uninstall_stats_triggers(connection)
+        try:
+            ids, born, names = self.create_authors(
+                generator, authors, options["batch_size"]
+            )
+            self.create_books(
+                generator, books, ids, born, names, options["batch_size"]
+            )
+        finally:
+            install_stats_triggers(connection)
+
+        self.stdout.write("Пересчет статистики авторов...")
+        reconcile(chunk_size=max(options["batch_size"], 10000))
+        bump_generation(Author)
+        bump_generation(Book)
+        self.stdout.write(self.style.SUCCESS(
+            f"Авторов: {Author.objects.count()}, книг: {Book.objects.count()}"
+        ))
+
+    def create_authors(self, generator, total, batch_size):
+        last_id = Author.objects.order_by("-id").values_list(
+            "id", flat=True
+        ).first() or 0
+        born, names = [], []
+        started = time.perf_counter()
+        for offset in range(0, total, batch_size):
+            batch = []
+            for _ in range(min(batch_size, total - offset)):
+                data = generator.author()
+                born.append(data.pop("born"))
+                author = Author(**data)
+                author.search_text = author_document(author)
+                names.append(author.full_name)
+                batch.append(author)
+            Author.objects.bulk_create(batch)
+            self.progress("авторов", offset + len(batch), total, started)
+        ids = list(
+            Author.objects.filter(pk__gt=last_id).order_by("id").values_list(
+                "id", flat=True
+            )
+        )
+        return ids, born, names
+
+    def create_books(self, generator, total, ids, born, names, batch_size):
+        weights = generator.author_weights(len(ids))
+        # Сколько книг автора уже создано - номер следующего тома
+        numbers = [0] * len(ids)
+        started = time.perf_counter()
+        for offset in range(0, total, batch_size):
+            batch = []
+            for _ in range(min(batch_size, total - offset)):
+                index = generator.pick(weights)
+                book = Book(
+                    author_id=ids[index],
+                    title=generator.title(numbers[index]),
+                    year=generator.year(born[index]),
+                    preface=generator.preface(),
+                )
+                book.search_text = book_document(book, names[index])
+                numbers[index] += 1
+                batch.append(book)
+            # Повтор (автор, название) у плодовитого автора пропускается -
+            # книг выйдет чуть меньше заказанного
+            Book.objects.bulk_create(batch, ignore_conflicts=True)
+            self.progress("книг", offset + len(batch), total, started)
+
+    def progress(self, label, done, total, started):
+        if self.verbosity < 1:
+            return
+        elapsed = time.perf_counter() - started
+        rate = done / elapsed if elapsed else 0
+        self.stdout.write(
+            f"\r{label}: {done:,}/{total:,} ({rate:,.0f}/с)",
+            ending="\n" if done >= total else "",
+        )
+        self.stdout.flush()
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from api.v1.pagination import KeysetPagination
+from library.models import Book
+
+from ._bench import isolated_database, measure, populate, uncached_requests
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает стоимость первой и глубокой страницы /api/v1/books/ "
+        "для PageNumberPagination и keyset-пагинации (?cursor=)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--books", type=int, default=100_000)
+        parser.add_argument("--authors", type=int, default=1_000)
+        parser.add_argument("--page", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with isolated_database(), uncached_requests():
+            populate(options["authors"], options["books"])
+            self.run(options)
+
+    def run(self, options):
+        client = Client()
+        page = options["page"]
+        page_size = KeysetPagination.page_size
+        url = "/api/v1/books/"
+
+        for ordering in ("title", "-year", "author__last_name"):
+            paginator = KeysetPagination()
+            queryset = Book.objects.select_related("author").order_by(ordering)
+            keyset_ordering = paginator.get_ordering(queryset)
+
+            # Курсор, указывающий на последнюю строку страницы page - 1:
+            # ровно то, что клиент получил бы, пройдя по ссылкам next
+            offset = (page - 1) * page_size - 1
+            row = queryset.order_by(*keyset_ordering)[offset]
+            deep_cursor = KeysetPagination.make_token(row, keyset_ordering)
+
+            cases = [
+                ("page=1", {"page": 1}),
+                (f"page={page}", {"page": page}),
+                ("cursor (1)", {"cursor": ""}),
+                (f"cursor ({page})", {"cursor": deep_cursor}),
+            ]
+            self.stdout.write(f"\nordering={ordering}")
+            for label, params in cases:
+                params = {**params, "ordering": ordering}
+                elapsed, queries = measure(
+                    lambda: client.get(url, params), options["repeat"]
+                )
+                self.stdout.write(
+                    f"  {label:<16} {elapsed * 1000:8.2f} ms  "
+                    f"{queries} SQL"
+                )
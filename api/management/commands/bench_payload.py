@@ -0,0 +1,116 @@
+import random
+
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.compression import CODECS, compress
+from api.v1.envelope import include_authors
+from api.v1.renderers import FastJSONRenderer, MessagePackRenderer, msgpack
+from api.v1.serializers import FastBookSerializer
+from library.models import Author, Book
+
+from ._bench import isolated_database, measure, populate
+
+# Биографии в сотни символов, как у настоящих авторов: у каждого своя,
+# но повторяется в каждой его книге
+BIO_SENTENCES = (
+    "Русский писатель и драматург.",
+    "Автор романов, повестей и рассказов о провинциальной жизни.",
+    "Учился в Московском университете, служил в губернской канцелярии.",
+    "Много путешествовал, вел подробные дневники.",
+    "Его проза переведена на десятки языков.",
+    "Лауреат литературных премий, член редакции толстого журнала.",
+    "Переводил с французского и немецкого.",
+    "Последние годы жизни провел в родовой усадьбе.",
+    "Публиковал критические статьи и воспоминания о современниках.",
+    "Письма и черновики хранятся в государственном архиве.",
+)
+PREFACE = "Роман о семье, пережившей смену эпох, и о цене выбора."
+
+
+class Command(BaseCommand):
+    help = (
+        "Размер ответа и CPU на рендер и сжатие страницы книг: JSON и "
+        "MessagePack, с вложенными авторами и с ?include=author, без сжатия "
+        "и с каждым доступным алгоритмом"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--books", type=int, default=10_000)
+        parser.add_argument(
+            "--authors", type=int, default=100,
+            help="Меньше авторов - больше повторов на странице",
+        )
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=[10, 100, 1000]
+        )
+        parser.add_argument(
+            "--ordering", default="title",
+            help="Сортировка страницы: title - авторы вперемешку, "
+                 "author__last_name - книги автора подряд",
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            populate(options["authors"], options["books"])
+            rnd = random.Random(0)
+            authors = list(Author.objects.only("id"))
+            for author in authors:
+                author.bio = " ".join(rnd.sample(BIO_SENTENCES, 5))
+                author.middle_name = "Николаевич"
+            Author.objects.bulk_update(authors, ["bio", "middle_name"])
+            Book.objects.update(preface=PREFACE)
+            self.run(options)
+
+    def run(self, options):
+        request = Request(APIRequestFactory().get("/api/v1/books/"))
+        serializer = FastBookSerializer(request=request)
+        queryset = Book.objects.order_by(options["ordering"], "id").values(
+            *serializer.values
+        )
+
+        renderers = [("json", FastJSONRenderer().render)]
+        if msgpack is not None:
+            renderers.append(("msgpack", MessagePackRenderer().render))
+        else:
+            self.stderr.write("msgpack не установлен - только JSON")
+        encodings = ["identity", *CODECS]
+
+        self.stdout.write(
+            f"{'rows':>6}  {'format':<18} {'encoding':<9} {'bytes':>10} "
+            f"{'ratio':>6} {'render ms':>10} {'compress ms':>12}"
+        )
+        for size in options["sizes"]:
+            page = serializer.serialize(list(queryset[:size]))
+            baseline = None
+            for name, render in renderers:
+                for envelope in (False, True):
+                    label = name + (" +include" if envelope else "")
+
+                    def build():
+                        data = {"results": page}
+                        if envelope:
+                            data = include_authors(data)
+                        return render(data)
+
+                    render_time, _ = measure(build, options["repeat"])
+                    body = build()
+                    for encoding in encodings:
+                        if encoding == "identity":
+                            compressed, compress_time = body, 0.0
+                        else:
+                            compressed = compress(body, encoding)
+                            compress_time, _ = measure(
+                                lambda: compress(body, encoding),
+                                options["repeat"],
+                            )
+                        baseline = baseline or len(compressed)
+                        self.stdout.write(
+                            f"{size:>6}  {label:<18} {encoding:<9} "
+                            f"{len(compressed):>10,} "
+                            f"{len(compressed) / baseline:>6.2f} "
+                            f"{render_time * 1000:>10.3f} "
+                            f"{compress_time * 1000:>12.3f}"
+                        )
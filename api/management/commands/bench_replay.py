@@ -0,0 +1,429 @@
+import http.client
+import json
+import logging
+import random
+import re
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.urls import Resolver404, resolve
+
+from api.instrumentation import quantile
+from library.models import Author, Book
+from library.search import tokenize
+
+# Сценарий -> вес в смеси по умолчанию
+DEFAULT_MIX = {
+    "list": 30,
+    "author": 15,
+    "year": 10,
+    "search": 15,
+    "ordering": 10,
+    "cursor": 5,
+    "detail": 10,
+    "authors": 5,
+}
+
+SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries')
+
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+def parse_mix(raw):
+    """'list=30,search=10' -> {"list": 30, "search": 10}"""
+    mix = {}
+    for part in filter(None, raw.split(",")):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX or not weight.isdigit():
+            raise CommandError(
+                f"Неизвестный сценарий или вес: {part}. "
+                f"Сценарии: {', '.join(DEFAULT_MIX)}"
+            )
+        mix[name] = int(weight)
+    return mix
+
+
+class RequestMix:
+    """
+    Детерминированная смесь запросов по данным текущей БД: id авторов и
+    книг, годы и слова названий берутся выборкой, а не выдумываются -
+    фильтры попадают в существующие строки
+    """
+
+    def __init__(self, mix, seed=0, sample=2000):
+        self.random = random.Random(seed)
+        self.mix = mix
+        books = list(
+            Book.objects.order_by("id").values_list("id", "author_id", "year",
+                                                   "title")[:sample]
+        )
+        if not books:
+            raise CommandError(
+                "Каталог пуст: сначала manage.py bench_generate."
+            )
+        self.book_ids = [row[0] for row in books]
+        self.author_ids = sorted({row[1] for row in books})
+        self.years = sorted({row[2] for row in books})
+        self.words = sorted({
+            word for row in books for word in tokenize(row[3]) if len(word) > 3
+        })
+        self.prolific = list(
+            Author.objects.order_by("-books_count").values_list(
+                "id", flat=True
+            )[:20]
+        )
+
+    def build(self, scenario):
+        rnd = self.random
+        if scenario == "list":
+            return "/api/v1/books/", {"page": rnd.randint(1, 5)}
+        if scenario == "author":
+            # Половина - плодовитые авторы: самые тяжелые страницы фильтра
+            pool = self.prolific if rnd.random() < 0.5 else self.author_ids
+            return "/api/v1/books/", {"author": rnd.choice(pool)}
+        if scenario == "year":
+            return "/api/v1/books/", {"year": rnd.choice(self.years)}
+        if scenario == "search":
+            return "/api/v1/books/", {"search": rnd.choice(self.words)}
+        if scenario == "ordering":
+            return "/api/v1/books/", {"ordering": rnd.choice(
+                ["-year", "title", "author__last_name", "-title"]
+            )}
+        if scenario == "cursor":
+            return "/api/v1/books/", {"cursor": "", "ordering": "-year"}
+        if scenario == "detail":
+            return f"/api/v1/books/{rnd.choice(self.book_ids)}/", {}
+        if scenario == "authors":
+            return "/api/v1/authors/", {"ordering": rnd.choice(
+                ["last_name", "-books_count"]
+            )}
+        raise ValueError(scenario)
+
+    def requests(self, total):
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+        for name in self.random.choices(names, weights, k=total):
+            path, params = self.build(name)
+            query = urlencode(params)
+            yield name, path + (f"?{query}" if query else "")
+
+
+def recorded_requests(path, total=None):
+    """
+    Запросы из лога api.requests (JSON-строки api.instrumentation).
+    Повторяются только GET - запись изменила бы данные между прогонами
+    """
+    loaded = []
+    with open(path, encoding="utf-8") as log:
+        for line in log:
+            line = line.strip()
+            if not line.startswith("{"):
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("method") != "GET" or "path" not in record:
+                continue
+            query = record.get("query")
+            url = record["path"] + (f"?{query}" if query else "")
+            loaded.append((record.get("view") or label_for(url), url))
+    if not loaded:
+        raise CommandError(f"В {path} нет GET-запросов api.requests.")
+    if total is None:
+        return loaded
+    # Лог короче заказанного числа запросов - проигрываем по кругу
+    return [loaded[index % len(loaded)] for index in range(total)]
+
+
+def label_for(url):
+    try:
+        return resolve(urlsplit(url).path).view_name
+    except Resolver404:
+        return "unmatched"
+
+
+class InProcessClient:
+    """WSGI-приложение в процессе: без сети, но со всеми middleware"""
+
+    def __init__(self):
+        self.app = get_wsgi_application()
+        self.factory = RequestFactory()
+
+    def get(self, url):
+        result = {}
+
+        def start_response(status, headers, exc_info=None):
+            result["status"] = int(status.split()[0])
+            result["headers"] = dict(headers)
+
+        body = self.app(self.factory.get(url).environ, start_response)
+        b"".join(body)
+        body.close()
+        return result["status"], result["headers"].get("Server-Timing", "")
+
+
+class HttpClient:
+    """HTTP к запущенному серверу; keep-alive соединение на поток"""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip("/")
+        self.local = threading.local()
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            factory = (
+                http.client.HTTPSConnection if self.scheme == "https"
+                else http.client.HTTPConnection
+            )
+            conn = self.local.conn = factory(self.netloc, timeout=30)
+        return conn
+
+    def get(self, url):
+        for attempt in range(2):
+            conn = self.connection()
+            try:
+                conn.request("GET", self.prefix + url)
+                response = conn.getresponse()
+                response.read()
+                return response.status, response.getheader("Server-Timing", "")
+            except (http.client.HTTPException, OSError):
+                # Сервер закрыл keep-alive соединение - переподключаемся
+                conn.close()
+                self.local.conn = None
+                if attempt:
+                    raise
+
+
+class EndpointResult:
+    def __init__(self):
+        self.latencies = []
+        self.queries = []
+        self.db_ms = []
+        self.errors = 0
+
+    def as_dict(self, elapsed):
+        latencies = sorted(self.latencies)
+        result = {
+            "requests": len(latencies),
+            "errors": self.errors,
+            "rps": round(len(latencies) / elapsed, 1),
+            **{
+                f"p{int(q * 100)}_ms": round(quantile(latencies, q) * 1000, 2)
+                for q in PERCENTILES
+            },
+        }
+        if self.queries:
+            result["queries"] = round(sum(self.queries) / len(self.queries), 2)
+            result["db_ms"] = round(sum(self.db_ms) / len(self.db_ms), 2)
+        return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, check=True, cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Проигрывает смесь запросов чтения каталога (или записанный лог "
+        "api.requests) в процессе либо против запущенного сервера и "
+        "печатает пропускную способность, перцентили и число SQL по "
+        "endpoint'ам. --save/--compare сравнивают прогоны разных коммитов"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--warmup", type=int, default=100)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--mix", type=parse_mix,
+            help="Веса сценариев, например list=30,search=10. "
+                 f"Сценарии: {', '.join(DEFAULT_MIX)}",
+        )
+        parser.add_argument(
+            "--log", help="Проиграть GET-запросы из лога api.requests",
+        )
+        parser.add_argument(
+            "--url", help="Базовый URL сервера (http://127.0.0.1:8000); "
+                          "по умолчанию - в процессе",
+        )
+        parser.add_argument(
+            "--no-cache", action="store_true",
+            help="Выключить кэш ответов каталога (только в процессе)",
+        )
+        parser.add_argument("--save", help="Записать результат в JSON")
+        parser.add_argument(
+            "--compare", help="Сравнить с результатом, записанным --save",
+        )
+        parser.add_argument(
+            "--threshold", type=float, default=10.0,
+            help="Рост p50/p99 или числа SQL в процентах, считающийся "
+                 "регрессией (по умолчанию 10)",
+        )
+
+    def handle(self, *args, **options):
+        total = options["requests"]
+        if options["log"]:
+            plan = recorded_requests(options["log"], total)
+            warmup = plan[:options["warmup"]]
+        else:
+            mix = RequestMix(options["mix"] or DEFAULT_MIX, options["seed"])
+            warmup = list(mix.requests(options["warmup"]))
+            plan = list(mix.requests(total))
+
+        if options["url"]:
+            client = HttpClient(options["url"])
+            results, elapsed = self.run(client, warmup, plan, options)
+        else:
+            overrides = {
+                "DEBUG": False,
+                "ALLOWED_HOSTS": [*settings.ALLOWED_HOSTS, "testserver"],
+            }
+            if options["no_cache"]:
+                overrides["CATALOGUE_CACHE_TIMEOUT"] = 0
+            with override_settings(**overrides):
+                # get_wsgi_application() заново применяет LOGGING - уровень
+                # меняем после него
+                client = InProcessClient()
+                # Строки лога api.requests на каждый запрос перемешались бы
+                # с отчетом
+                request_log = logging.getLogger("api.requests")
+                level = request_log.level
+                request_log.setLevel(logging.ERROR)
+                try:
+                    results, elapsed = self.run(client, warmup, plan, options)
+                finally:
+                    request_log.setLevel(level)
+
+        report = {
+            "revision": git_revision(),
+            "created": datetime.now(timezone.utc).isoformat(),
+            "target": options["url"] or "in-process",
+            "vendor": connection.vendor,
+            "concurrency": options["concurrency"],
+            "requests": total,
+            "seed": options["seed"],
+            "elapsed_s": round(elapsed, 3),
+            "rps": round(total / elapsed, 1),
+            "catalogue": {
+                "authors": Author.objects.count(),
+                "books": Book.objects.count(),
+            },
+            "endpoints": {
+                name: result.as_dict(elapsed)
+                for name, result in sorted(results.items())
+            },
+        }
+        self.print_report(report)
+        if options["save"]:
+            with open(options["save"], "w", encoding="utf-8") as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as baseline:
+                regressions = self.compare(
+                    json.load(baseline), report, options["threshold"]
+                )
+            if regressions:
+                raise CommandError(f"Регрессии: {', '.join(regressions)}")
+
+    def run(self, client, warmup, plan, options):
+        results = defaultdict(EndpointResult)
+        lock = threading.Lock()
+
+        def call(item):
+            name, url = item
+            started = time.perf_counter()
+            try:
+                status, timing = client.get(url)
+            except (http.client.HTTPException, OSError):
+                status, timing = 599, ""
+            latency = time.perf_counter() - started
+            return name, status, timing, latency
+
+        def record(outcome):
+            name, status, timing, latency = outcome
+            match = SERVER_TIMING_DB.search(timing)
+            with lock:
+                result = results[name]
+                result.latencies.append(latency)
+                if status >= 400:
+                    result.errors += 1
+                # Число SQL сервер сообщает в Server-Timing
+                # (api.instrumentation) - работает и для удаленного сервера
+                if match:
+                    result.db_ms.append(float(match.group(1)))
+                    result.queries.append(int(match.group(2)))
+
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            list(pool.map(call, warmup))
+            started = time.perf_counter()
+            for outcome in pool.map(call, plan):
+                record(outcome)
+            elapsed = time.perf_counter() - started
+        return results, elapsed
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"{report['target']}, {report['vendor']}, ревизия "
+            f"{report['revision'] or '?'}: {report['requests']} запросов за "
+            f"{report['elapsed_s']} с ({report['rps']} req/s), "
+            f"конкурентность {report['concurrency']}"
+        )
+        self.stdout.write(
+            f"{'endpoint':<18} {'req':>6} {'err':>4} {'req/s':>8} "
+            f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'SQL':>6} "
+            f"{'SQL ms':>7}"
+        )
+        for name, row in report["endpoints"].items():
+            self.stdout.write(
+                f"{name:<18} {row['requests']:>6} {row['errors']:>4} "
+                f"{row['rps']:>8} {row['p50_ms']:>8} {row['p90_ms']:>8} "
+                f"{row['p99_ms']:>8} {row.get('queries', '-'):>6} "
+                f"{row.get('db_ms', '-'):>7}"
+            )
+
+    def compare(self, baseline, report, threshold):
+        if baseline.get("catalogue") != report["catalogue"]:
+            self.stderr.write(
+                "Каталоги прогонов различаются - сравнение приблизительное"
+            )
+        self.stdout.write(
+            f"\nСравнение с {baseline.get('revision') or '?'} "
+            f"(порог {threshold}%):"
+        )
+        regressions = []
+        for name, row in report["endpoints"].items():
+            old = baseline["endpoints"].get(name)
+            if old is None:
+                continue
+            changes = []
+            for key in ("p50_ms", "p99_ms", "queries"):
+                if key not in row or not old.get(key):
+                    continue
+                delta = (row[key] - old[key]) / old[key] * 100
+                changes.append(f"{key} {delta:+.1f}%")
+                if delta > threshold:
+                    regressions.append(f"{name} {key}")
+            self.stdout.write(f"{name:<18} {', '.join(changes)}")
+        return regressions
@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.v1.renderers import FastJSONRenderer
+from api.v1.serializers import BookSerializer, FastBookSerializer
+from library.models import Book
+
+from ._bench import isolated_database, measure, populate
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает строки/сек сериализации списка книг: BookSerializer + "
+        "JSONRenderer против values() + FastBookSerializer + FastJSONRenderer"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--books", type=int, default=10_000)
+        parser.add_argument("--authors", type=int, default=500)
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=[10, 100, 1000]
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            populate(options["authors"], options["books"])
+            # Обложка у каждой второй книги: URL строится и в старом пути
+            Book.objects.annotate(odd=F("id") % 2).filter(odd=1).update(
+                cover="covers/bench.jpg"
+            )
+            self.run(options)
+
+    def run(self, options):
+        request = Request(APIRequestFactory().get("/api/v1/books/"))
+        queryset = Book.objects.select_related("author").defer(
+            "search_text", "author__search_text"
+        ).order_by("title", "id")
+        fast = FastBookSerializer(request=request)
+
+        def current(books):
+            data = BookSerializer(
+                books, many=True, context={"request": request}
+            ).data
+            return JSONRenderer().render(data)
+
+        def fast_path(rows):
+            return FastJSONRenderer().render(fast.serialize(rows))
+
+        self.stdout.write(
+            f"{'rows':>6}  {'path':<8} {'с БД, строк/с':>16} "
+            f"{'без БД, строк/с':>16}"
+        )
+        for size in options["sizes"]:
+            books = list(queryset[:size])
+            rows = list(queryset.values(*fast.values)[:size])
+            assert current(books) == JSONRenderer().render(fast.serialize(rows))
+
+            cases = [
+                ("current",
+                 lambda: current(list(queryset[:size])),
+                 lambda: current(books)),
+                ("fast",
+                 lambda: fast_path(list(queryset.values(*fast.values)[:size])),
+                 lambda: fast_path(rows)),
+            ]
+            for label, with_db, without_db in cases:
+                total, _ = measure(with_db, options["repeat"])
+                render, _ = measure(without_db, options["repeat"])
+                self.stdout.write(
+                    f"{size:>6}  {label:<8} {size / total:>16,.0f} "
+                    f"{size / render:>16,.0f}"
+                )
@@ -0,0 +1,140 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from .bench_replay import git_revision
+
+# Выполняется в чистом процессе: время импорта и памяти без влияния
+# родителя. ru_maxrss в Linux - килобайты, в macOS - байты
+PROBE = """
+import json, os, resource, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls = time.perf_counter()
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    "setup_ms": (setup - started) * 1000,
+    "urls_ms": (urls - setup) * 1000,
+    "rss_mb": rss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+    "modules": len(sys.modules),
+    "spectacular": any(m.startswith("drf_spectacular.views")
+                       for m in sys.modules),
+}))
+"""
+
+METRICS = ("setup_ms", "urls_ms", "rss_mb", "modules")
+
+
+class Command(BaseCommand):
+    help = (
+        "Время старта воркера (django.setup() и загрузка URLconf) и RSS "
+        "после них в отдельных процессах; --top показывает самые дорогие "
+        "импорты, --save/--compare сравнивают ревизии"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--top", type=int, default=0,
+            help="Вывести N самых дорогих импортов (python -X importtime)",
+        )
+        parser.add_argument("--save", help="Записать результат в JSON")
+        parser.add_argument(
+            "--compare", help="Сравнить с результатом, записанным --save",
+        )
+        parser.add_argument(
+            "--threshold", type=float, default=10.0,
+            help="Рост в процентах, считающийся регрессией",
+        )
+
+    def probe(self, *flags):
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": os.environ["DJANGO_SETTINGS_MODULE"],
+        }
+        result = subprocess.run(
+            [sys.executable, *flags, "-c", PROBE], capture_output=True,
+            text=True, cwd=settings.BASE_DIR, env=env,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr)
+        return json.loads(result.stdout), result.stderr
+
+    def handle(self, *args, **options):
+        runs = [self.probe()[0] for _ in range(options["repeat"])]
+        report = {
+            "revision": git_revision(),
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "spectacular_loaded": runs[0]["spectacular"],
+            **{
+                metric: round(statistics.median(
+                    run[metric] for run in runs
+                ), 1)
+                for metric in METRICS
+            },
+        }
+        self.stdout.write(
+            f"ревизия {report['revision'] or '?'}, медиана "
+            f"{options['repeat']} запусков: django.setup() "
+            f"{report['setup_ms']} мс, URLconf {report['urls_ms']} мс, "
+            f"RSS {report['rss_mb']} МБ, модулей {report['modules']:.0f}, "
+            f"drf_spectacular.views "
+            f"{'загружен' if report['spectacular_loaded'] else 'нет'}"
+        )
+        if options["top"]:
+            self.print_top(options["top"])
+
+        if options["save"]:
+            with open(options["save"], "w", encoding="utf-8") as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as baseline:
+                regressions = self.compare(
+                    json.load(baseline), report, options["threshold"]
+                )
+            if regressions:
+                raise CommandError(f"Регрессии: {', '.join(regressions)}")
+
+    def print_top(self, count):
+        _, stderr = self.probe("-X", "importtime")
+        # "import time: self [us] | cumulative | package"; считаем только
+        # пакеты верхнего уровня - их cumulative включает вложенные
+        rows = []
+        for line in stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if not name.startswith(" ") or name.startswith("  "):
+                continue
+            rows.append((int(cumulative), name.strip()))
+        self.stdout.write("\nСамые дорогие импорты (cumulative, мс):")
+        for cumulative, name in sorted(rows, reverse=True)[:count]:
+            self.stdout.write(f"{cumulative / 1000:>9.1f}  {name}")
+
+    def compare(self, baseline, report, threshold):
+        self.stdout.write(
+            f"\nСравнение с {baseline.get('revision') or '?'} "
+            f"(порог {threshold}%):"
+        )
+        regressions = []
+        changes = []
+        for metric in METRICS:
+            if not baseline.get(metric):
+                continue
+            delta = (report[metric] - baseline[metric]) / baseline[metric]
+            changes.append(f"{metric} {delta * 100:+.1f}%")
+            if delta * 100 > threshold:
+                regressions.append(metric)
+        self.stdout.write(", ".join(changes))
+        return regressions
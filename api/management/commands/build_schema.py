@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.v1.schema import build_artifacts
+
+
+class Command(BaseCommand):
+    help = (
+        "Собирает OpenAPI-схему в SCHEMA_ROOT: YAML и JSON со сжатыми "
+        "вариантами и манифест с ETag. Запускать при выкладке, как "
+        "collectstatic"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output", "-o", default=str(settings.SCHEMA_ROOT),
+            help="Каталог для файлов схемы (по умолчанию SCHEMA_ROOT)",
+        )
+
+    def handle(self, *args, **options):
+        manifest = build_artifacts(options["output"])
+        for fmt, meta in manifest["formats"].items():
+            variants = ", ".join(
+                f"{encoding} {size:,}"
+                for encoding, size in meta["encodings"].items()
+            )
+            self.stdout.write(
+                f"{fmt}: {meta['size']:,} байт ({variants}), "
+                f"ETag {meta['etag']}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Схема {manifest['version']} записана в {options['output']}"
+        ))
@@ -0,0 +1,112 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from library.cache import get_cache
+from library.models import Author, Book
+
+from ._bench import isolated_database, populate
+
+PRIMARY = "primary"
+REPLICA = "replica"
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверяет маршрутизацию чтения на реплики (DB_REPLICAS): "
+        "какой БД достаются запросы к таблицам каталога в типовых сценариях"
+    )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                "Реплики не настроены: задайте DB_REPLICAS, например "
+                "DB_ENGINE=django.db.backends.sqlite3 "
+                "DB_REPLICAS=replica.sqlite3"
+            )
+        with isolated_database():
+            # Как TEST["MIRROR"] в тест-раннере: реплики смотрят в
+            # тестовую основную БД, данные видны сразу
+            for alias in settings.DATABASE_REPLICAS:
+                connections[alias].creation.set_as_test_mirror(
+                    connections[DEFAULT_DB_ALIAS].settings_dict
+                )
+            populate(authors=10, books=50)
+            failures = self.run()
+        if failures:
+            raise CommandError(f"Сценариев с ошибкой: {failures}")
+        self.stdout.write(self.style.SUCCESS("Маршрутизация корректна"))
+
+    def run(self):
+        anonymous = Client()
+        admin = Client()
+        admin.force_login(get_user_model().objects.create_superuser(
+            "routing-admin", "admin@example.com", "password"
+        ))
+        author = Author.objects.first()
+        book = Book.objects.first()
+
+        scenarios = [
+            ("GET /books/ анонимно", REPLICA,
+             lambda: anonymous.get("/api/v1/books/")),
+            ("GET /authors/<id>/ анонимно", REPLICA,
+             lambda: anonymous.get(f"/api/v1/authors/{author.pk}/")),
+            ("GET /books/ администратор", PRIMARY,
+             lambda: admin.get("/api/v1/books/")),
+            ("PATCH /books/<id>/ администратор", PRIMARY,
+             lambda: admin.patch(
+                 f"/api/v1/books/{book.pk}/", {"year": 1900},
+                 content_type="application/json",
+             )),
+            # Сразу после записи реплика может отставать
+            ("GET /books/ анонимно после записи", PRIMARY,
+             lambda: anonymous.get("/api/v1/books/")),
+            ("GET /admin/library/book/", PRIMARY,
+             lambda: admin.get("/admin/library/book/")),
+        ]
+
+        failures = 0
+        for index, (label, expected, request) in enumerate(scenarios):
+            if expected == REPLICA:
+                # Ответ не из кэша и вне окна после записи
+                get_cache().clear()
+            used = self.catalogue_queries(request)
+            actual = {alias for alias, count in used.items() if count}
+            target = (
+                {DEFAULT_DB_ALIAS} if expected == PRIMARY
+                else set(settings.DATABASE_REPLICAS)
+            )
+            ok = bool(actual) and actual <= target
+            failures += not ok
+            counts = ", ".join(
+                f"{alias}={count}" for alias, count in used.items()
+            )
+            status = self.style.SUCCESS("OK") if ok else self.style.ERROR(
+                "FAIL"
+            )
+            self.stdout.write(
+                f"{status:<4} {label:<36} ожидается {expected:<8} {counts}"
+            )
+        return failures
+
+    def catalogue_queries(self, request):
+        """Число запросов к таблицам library_* по алиасам БД"""
+        with ExitStack() as stack:
+            captured = {
+                alias: stack.enter_context(
+                    CaptureQueriesContext(connections[alias])
+                )
+                for alias in settings.DATABASES
+            }
+            response = request()
+        if response.status_code >= 400:
+            raise CommandError(f"Ответ {response.status_code}")
+        return {
+            alias: sum("library_" in query["sql"] for query in context)
+            for alias, context in captured.items()
+        }
@@ -0,0 +1,24 @@
+from django.test import TestCase
+
+from library.models import Author, Book
+
+
+class ChangesFeedTests(TestCase):
+    def test_new_object_is_insert_after_updates(self):
+        author = Author.objects.create(last_name="Фамилия", first_name="Имя")
+        book = Book.objects.create(author=author, title="Книга", year=1900)
+        book.year = 1901
+        book.save()
+
+        response = self.client.get("/api/v1/changes/", {"since": 0})
+        self.assertEqual(response.status_code, 200)
+        entries = {
+            (entry["model"], entry["id"]): entry
+            for entry in response.json()["results"]
+        }
+        # Клиент с since=0 этих объектов не видел: правки свернуты во
+        # вставку с текущими данными
+        self.assertEqual(entries["author", author.pk]["action"], "insert")
+        entry = entries["book", book.pk]
+        self.assertEqual(entry["action"], "insert")
+        self.assertEqual(entry["data"]["year"], 1901)
@@ -0,0 +1,104 @@
+from django.test import TestCase, override_settings
+
+from api.v1.serializers import EXPAND_BOOKS_LIMIT
+from library.models import Author, Book
+
+
+# Кэш ответов и версий выключен: считаются запросы самого пути чтения.
+# Реплики выключены: все запросы идут в default, который и считается
+@override_settings(CATALOGUE_CACHE_TIMEOUT=0, DATABASE_REPLICAS=[],
+                   CATALOGUE_SNAPSHOT_PATH="")
+class ExpandQueryCountTests(TestCase):
+    """
+    Число SQL на список и карточку не зависит от числа строк: с ?expand=
+    связанные книги приходят одним prefetch, без него prefetch нет
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = [
+            Author.objects.create(last_name=f"Фамилия{i}", first_name="Имя")
+            for i in range(3)
+        ]
+        for author in authors:
+            for year in range(1900, 1904):
+                Book.objects.create(
+                    author=author, title=f"{author.last_name} {year}",
+                    year=year,
+                )
+        cls.author = authors[0]
+        cls.book = Book.objects.filter(author=cls.author).first()
+
+    def assertQueries(self, count, url):
+        with self.assertNumQueries(count):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    # Список: версия (COUNT/MAX для ETag) + COUNT пагинации + страница
+    def test_book_list(self):
+        data = self.assertQueries(3, "/api/v1/books/")
+        self.assertEqual(len(data["results"]), 10)
+
+    def test_book_list_expand_author(self):
+        # Автор и так приходит JOIN'ом - раскрывать нечего
+        self.assertQueries(3, "/api/v1/books/?expand=author")
+
+    def test_book_list_expand_author_books(self):
+        data = self.assertQueries(4, "/api/v1/books/?expand=author.books")
+        self.assertEqual(len(data["results"][0]["author"]["books"]), 4)
+
+    def test_author_list(self):
+        data = self.assertQueries(3, "/api/v1/authors/")
+        self.assertNotIn("books", data["results"][0])
+
+    def test_author_list_expand_books(self):
+        data = self.assertQueries(4, "/api/v1/authors/?expand=books")
+        self.assertEqual(
+            [len(author["books"]) for author in data["results"]], [4, 4, 4]
+        )
+
+    # Карточка: версия + строка
+    def test_book_detail(self):
+        self.assertQueries(2, f"/api/v1/books/{self.book.pk}/")
+
+    def test_book_detail_expand_author(self):
+        self.assertQueries(2, f"/api/v1/books/{self.book.pk}/?expand=author")
+
+    def test_book_detail_expand_author_books(self):
+        data = self.assertQueries(
+            3, f"/api/v1/books/{self.book.pk}/?expand=author.books"
+        )
+        self.assertEqual(len(data["author"]["books"]), 4)
+
+    def test_author_detail(self):
+        data = self.assertQueries(2, f"/api/v1/authors/{self.author.pk}/")
+        self.assertNotIn("books", data)
+
+    def test_author_detail_expand_books(self):
+        data = self.assertQueries(
+            3, f"/api/v1/authors/{self.author.pk}/?expand=books"
+        )
+        self.assertEqual(len(data["books"]), 4)
+
+    def test_expand_books_limit(self):
+        # Книг больше лимита: раскрывается не больше EXPAND_BOOKS_LIMIT,
+        # а число запросов то же - срез делает Prefetch, а не Python
+        prolific = Author.objects.create(last_name="Плодовитый")
+        Book.objects.bulk_create(
+            Book(author=prolific, title=f"Книга {i:02}", year=1900)
+            for i in range(EXPAND_BOOKS_LIMIT + 5)
+        )
+        data = self.assertQueries(4, "/api/v1/authors/?expand=books")
+        books = {
+            author["id"]: len(author["books"]) for author in data["results"]
+        }
+        self.assertEqual(books.pop(prolific.pk), EXPAND_BOOKS_LIMIT)
+        self.assertEqual(list(books.values()), [4, 4, 4])
+        data = self.assertQueries(
+            3, f"/api/v1/authors/{prolific.pk}/?expand=books"
+        )
+        self.assertEqual(
+            [book["title"] for book in data["books"]],
+            [f"Книга {i:02}" for i in range(EXPAND_BOOKS_LIMIT)],
+        )
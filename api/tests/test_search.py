@@ -0,0 +1,48 @@
+from django.test import TestCase, override_settings
+
+from library.models import Author, Book
+
+
+@override_settings(CATALOGUE_CACHE_TIMEOUT=0, DATABASE_REPLICAS=[],
+                   CATALOGUE_SNAPSHOT_PATH="")
+class SearchOrderingTests(TestCase):
+    """Без ?ordering= результаты ?search= идут по релевантности"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # По алфавиту (сортировка по умолчанию) первым был бы Алексей;
+        # релевантнее короткий документ, где слово занимает большую долю
+        cls.alexey = Author.objects.create(
+            last_name="Толстой", first_name="Алексей",
+            middle_name="Константинович",
+        )
+        cls.lev = Author.objects.create(last_name="Толстой", first_name="Лев")
+        Book.objects.create(
+            author=cls.alexey, title="Князь Серебряный и другие повести",
+            year=1862,
+        )
+        Book.objects.create(author=cls.lev, title="Война", year=1869)
+
+    def ids(self, url, params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return [item["id"] for item in response.json()["results"]]
+
+    def test_authors_ranked_by_relevance(self):
+        self.assertEqual(
+            self.ids("/api/v1/authors/", {"search": "толстой"}),
+            [self.lev.pk, self.alexey.pk],
+        )
+
+    def test_authors_explicit_ordering(self):
+        self.assertEqual(
+            self.ids("/api/v1/authors/",
+                     {"search": "толстой", "ordering": "first_name"}),
+            [self.alexey.pk, self.lev.pk],
+        )
+
+    def test_books_ranked_by_relevance(self):
+        self.assertEqual(
+            self.ids("/api/v1/books/", {"search": "толстой"}),
+            [self.lev.books.get().pk, self.alexey.books.get().pk],
+        )
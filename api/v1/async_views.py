@@ -0,0 +1,139 @@
+"""
+Async-версия чтения каталога: /api/v1/async/books/, /api/v1/async/authors/.
+
+РЕШЕНИЕ: Нативные async views рядом с синхронными viewset'ами
+ПОЧЕМУ:
+1. Под ASGI синхронный DRF view выполняется через sync_to_async в одном
+   общем потоке - запросы воркера обслуживаются строго по очереди
+2. Здесь ожидание БД и кэша идет через async ORM (acount, aget, aiterator)
+   и async API кэша, а сериализация - FastBookSerializer/
+   FastAuthorSerializer без обращений к БД
+3. Фильтры, сортировка, поиск, пагинация и кэш ответов берутся из
+   соответствующего viewset'а - поведение совпадает с синхронным API
+4. Только анонимное чтение без ?expand=, ?fields= и без ETag: запись, админы и
+   раскрытие связей остаются за синхронными endpoint'ами
+"""
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+from rest_framework.request import Request
+
+from library import routers
+from library.cache import aget_generations, arecently_written, get_cache
+
+from .renderers import FastJSONRenderer
+from .serializers import get_expand, get_sparse
+from .views import AuthorViewSet, BookViewSet
+
+
+class AsyncCatalogueView(View):
+    viewset_class = None
+    basename = None
+
+    def get_viewset(self, request, pk):
+        detail = pk is not None
+        return self.viewset_class(
+            request=request,
+            args=(),
+            kwargs={"pk": pk} if detail else {},
+            action="retrieve" if detail else "list",
+            detail=detail,
+            basename=self.basename,
+            format_kwarg=None,
+        )
+
+    async def get(self, request, pk=None):
+        # Без аутентификаторов: request.user - AnonymousUser без запросов
+        request = Request(request, authenticators=[])
+        viewset = self.get_viewset(request, pk)
+        token = None
+        if settings.DATABASE_REPLICAS and not await arecently_written():
+            token = routers.use_replica()
+        try:
+            handler = self.list if pk is None else self.retrieve
+            data = await self.cached(viewset, request, handler)
+            return self.render(data)
+        except APIException as exc:
+            # Формат ошибок как у rest_framework.views.exception_handler
+            detail = exc.detail
+            if not isinstance(detail, (list, dict)):
+                detail = {"detail": detail}
+            return self.render(detail, exc.status_code)
+        finally:
+            if token is not None:
+                routers.reset_replica(token)
+
+    async def cached(self, viewset, request, handler):
+        if not viewset.should_cache(request):
+            return await handler(viewset, request)
+        generations = await aget_generations(*viewset.get_cache_models())
+        key = viewset.get_cache_key(request, generations)
+        cache = get_cache()
+        cached = await cache.aget(key)
+        if cached is not None:
+            return cached[1]
+        data = await handler(viewset, request)
+        # Тот же формат значения, что у CachedResponseMixin
+        await cache.aset(key, (200, data), settings.CATALOGUE_CACHE_TIMEOUT)
+        return data
+
+    def get_rows(self, viewset, request):
+        if get_expand(request):
+            raise ValidationError({
+                "expand": ["Не поддерживается async-версией списка."]
+            })
+        if any(get_sparse(request)):
+            raise ValidationError({
+                "fields": ["Не поддерживается async-версией списка."]
+            })
+        serializer = viewset.fast_serializer_class(request=request)
+        queryset = viewset.filter_queryset(viewset.get_queryset())
+        return serializer, viewset.get_fast_values(queryset, serializer)
+
+    async def list(self, viewset, request):
+        serializer, rows = self.get_rows(viewset, request)
+        paginator = viewset.paginator
+        page = await paginator.apaginate_queryset(rows, request, viewset)
+        if page is None:
+            data = serializer.serialize(
+                [row async for row in rows.aiterator()]
+            )
+        else:
+            data = paginator.get_paginated_response(
+                serializer.serialize(page)
+            ).data
+        # ?include=author у книг - тот же конверт, что в синхронном списке
+        include_related = getattr(viewset, "include_related", None)
+        if include_related is not None:
+            data = include_related(request, data)
+        return data
+
+    async def retrieve(self, viewset, request):
+        serializer, rows = self.get_rows(viewset, request)
+        try:
+            row = await rows.aget(pk=viewset.kwargs["pk"])
+        except ObjectDoesNotExist:
+            # Текст как у get_object_or_404 в синхронном retrieve
+            raise NotFound(
+                f"No {rows.model._meta.object_name} matches the given query."
+            )
+        return serializer.serialize([row])[0]
+
+    def render(self, data, status=200):
+        return HttpResponse(
+            FastJSONRenderer().render(data),
+            status=status,
+            content_type=FastJSONRenderer.media_type,
+        )
+
+
+class AsyncBookView(AsyncCatalogueView):
+    viewset_class = BookViewSet
+    basename = "book"
+
+
+class AsyncAuthorView(AsyncCatalogueView):
+    viewset_class = AuthorViewSet
+    basename = "author"
@@ -0,0 +1,109 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from rest_framework import permissions
+from rest_framework.response import Response
+
+from library.cache import get_cache, get_generations
+
+
+def normalized_query(request, exclude=()):
+    """
+    РЕШЕНИЕ: Нормализуем query string
+    ПОЧЕМУ: ?year=1869&author=1 и ?author=1&year=1869 - один ответ
+    """
+    return urlencode(
+        sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            if key not in exclude
+            for value in values
+        )
+    )
+
+
+class CachedResponseMixin:
+    """
+    РЕШЕНИЕ: Кэш сериализованных ответов для анонимных GET/HEAD
+    ПОЧЕМУ:
+    1. Каталог меняется только при правках администратора, а анонимное
+       чтение - почти весь трафик
+    2. Кэшируем response.data, а не байты: рендерер (JSON, browsable API)
+       выбирается при каждом запросе, а БД и сериализация пропускаются
+    3. В ключ входят поколения моделей (library.cache), поэтому любая
+       запись делает старые ключи недостижимыми без их перебора
+    """
+
+    # Модели, от которых зависит ответ viewset'а
+    cache_models = ()
+
+    def get_cache_models(self):
+        return self.cache_models
+
+    def should_cache(self, request):
+        return (
+            request.method in permissions.SAFE_METHODS
+            and self.cache_allowed(request)
+        )
+
+    def cache_allowed(self, request):
+        return (
+            # CATALOGUE_CACHE_TIMEOUT=0 отключает кэш ответов
+            settings.CATALOGUE_CACHE_TIMEOUT != 0
+            and not request.user.is_authenticated
+        )
+
+    def get_cache_key(self, request, generations=None):
+        return self.make_cache_key(
+            request,
+            request.path,
+            self.action,
+            str(self.kwargs.get(self.lookup_url_kwarg or self.lookup_field, "")),
+            normalized_query(request),
+            generations,
+        )
+
+    def make_cache_key(self, request, path, action, lookup, query,
+                       generations=None):
+        if generations is None:
+            generations = get_generations(*self.get_cache_models())
+        raw = "|".join((
+            # Хост и схема нужны из-за абсолютных ссылок next/previous и
+            # cover, путь - из-за async-версии тех же списков
+            request.scheme,
+            request.get_host(),
+            path,
+            self.basename,
+            action,
+            lookup,
+            query,
+            ":".join(map(str, generations)),
+        ))
+        digest = hashlib.sha1(raw.encode()).hexdigest()
+        return f"catalogue:response:{self.basename}:{digest}"
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not self.should_cache(request):
+            return handler(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = self.get_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            status, data = cached
+            return Response(data, status=status)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(
+                key, (response.status_code, response.data),
+                settings.CATALOGUE_CACHE_TIMEOUT,
+            )
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
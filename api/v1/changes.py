@@ -0,0 +1,134 @@
+"""
+Лента изменений каталога: GET /api/v1/changes/?since=<seq>.
+
+РЕШЕНИЕ: Async view поверх журнала library_change (library.changes)
+ПОЧЕМУ:
+1. Клиент хранит номер последнего изменения и получает только то, что
+   случилось после него: новые и измененные объекты с данными в формате
+   списков API, удаленные - надгробием {"action": "delete"}
+2. Страница - range scan по первичному ключу журнала и по одному запросу
+   данных на модель. Несколько изменений одного объекта на странице
+   сворачиваются в последнее; вставка с правками остается insert
+3. ?wait= держит запрос, пока изменений нет (long-poll). Под ASGI
+   ожидание - asyncio.sleep и не занимает поток; журнал опрашивается
+   раз в CHANGES_POLL_INTERVAL секунд запросом по индексу
+4. Журнал читается из основной БД: отставшая реплика не даст пропуска,
+   но заставила бы клиента ждать то, что уже записано
+"""
+import asyncio
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+from library.changes import compact
+from library.models import Author, Book, Change
+
+from .renderers import FastJSONRenderer
+from .serializers import (
+    ChangesQuerySerializer, FastAuthorSerializer, FastBookSerializer,
+)
+
+SERIALIZERS = {"author": FastAuthorSerializer, "book": FastBookSerializer}
+QUERYSETS = {"author": Author.objects, "book": Book.objects}
+
+
+class ChangesGone(APIException):
+    status_code = 410
+    default_detail = (
+        "Изменения после since недоступны (журнал очищен или каталог "
+        "загружен заново). Перечитайте каталог и начните с last_seq."
+    )
+    default_code = "gone"
+
+
+class ChangesView(View):
+    async def get(self, request):
+        request = Request(request, authenticators=[])
+        try:
+            params = ChangesQuerySerializer(data=request.query_params)
+            params.is_valid(raise_exception=True)
+            data = await self.changes(request, **params.validated_data)
+        except APIException as exc:
+            detail = exc.detail
+            if not isinstance(detail, (list, dict)):
+                detail = {"detail": detail}
+            if isinstance(exc, ChangesGone):
+                detail["last_seq"] = await self.last_seq()
+            return self.render(detail, exc.status_code)
+        return self.render(data)
+
+    async def last_seq(self):
+        seq = await Change.objects.order_by("-seq").values_list(
+            "seq", flat=True
+        ).afirst()
+        return seq or 0
+
+    async def changes(self, request, limit, wait, since=None):
+        if since is None:
+            return {"results": [], "last_seq": await self.last_seq(),
+                    "more": False}
+
+        deadline = time.monotonic() + wait
+        while True:
+            rows = [
+                row async for row in Change.objects.filter(seq__gt=since)
+                .order_by("seq")
+                .values_list("seq", "model", "object_id", "action")[:limit]
+            ]
+            remaining = deadline - time.monotonic()
+            if rows or remaining <= 0:
+                break
+            await asyncio.sleep(
+                min(settings.CHANGES_POLL_INTERVAL, remaining)
+            )
+
+        if any(action == Change.RESET for *_, action in rows):
+            raise ChangesGone()
+        return {
+            "results": await self.entries(request, compact(rows)),
+            "last_seq": rows[-1][0] if rows else since,
+            "more": len(rows) == limit,
+        }
+
+    async def entries(self, request, rows):
+        data = {}
+        for model, serializer_class in SERIALIZERS.items():
+            ids = [
+                object_id for _, name, object_id, action in rows
+                if name == model and action != Change.DELETE
+            ]
+            if not ids:
+                continue
+            serializer = serializer_class(request=request)
+            objects = serializer.serialize([
+                row async for row in QUERYSETS[model]
+                .filter(pk__in=ids).order_by().values(*serializer.values)
+            ])
+            data[model] = {obj["id"]: obj for obj in objects}
+
+        entries = []
+        for seq, model, object_id, action in rows:
+            entry = {"seq": seq, "model": model, "id": object_id}
+            obj = data.get(model, {}).get(object_id)
+            if action == Change.DELETE or obj is None:
+                # Объект удален после этой записи - его надгробие дальше
+                # в журнале, клиенту достаточно удалить его сейчас
+                entry["action"] = Change.DELETE
+            else:
+                entry["action"] = action
+                entry["data"] = obj
+            entries.append(entry)
+        return entries
+
+    def render(self, data, status=200):
+        response = HttpResponse(
+            FastJSONRenderer().render(data),
+            status=status,
+            content_type=FastJSONRenderer.media_type,
+        )
+        response["Cache-Control"] = "no-store"
+        return response
@@ -0,0 +1,186 @@
+import hashlib
+from calendar import timegm
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from library.cache import get_cache
+
+from .cache import normalized_query
+
+
+class ConditionalGetMixin:
+    """
+    РЕШЕНИЕ: ETag/Last-Modified из агрегата по updated_at
+    ПОЧЕМУ:
+    1. Клиенты опрашивают одни и те же ресурсы - 304 экономит и
+       сериализацию, и трафик
+    2. Версия считается одним запросом MAX(updated_at)/COUNT(*) по тому же
+       отфильтрованному queryset, без создания объектов моделей
+    3. COUNT ловит удаления, MAX - вставки и правки; поля связанных моделей
+       (author__updated_at) ловят правки вложенных представлений
+    4. Та же версия проверяется в If-Match при записи - оптимистичная
+       блокировка без отдельного поля version
+    """
+
+    # Поля updated_at, от которых зависит представление
+    version_fields = ("updated_at",)
+
+    def get_version_fields(self):
+        return self.version_fields
+
+    def get_version(self, queryset):
+        fields = self.get_version_fields()
+        aggregates = {
+            f"max_{index}": Max(field) for index, field in enumerate(fields)
+        }
+        row = queryset.order_by().aggregate(count=Count("pk"), **aggregates)
+        return self.make_version(
+            row["count"], [row[f"max_{index}"] for index in range(len(fields))]
+        )
+
+    def make_version(self, count, maxima):
+        """ETag и Last-Modified по числу строк и MAX полей версии"""
+        if not count:
+            return None, None
+        timestamps = [value for value in maxima if value is not None]
+
+        # Представление зависит и от формата (JSON / browsable API),
+        # и от query string (страница, сортировка, expand). action не
+        # используем: If-Match при PUT сверяется с ETag карточки из GET
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        raw = "|".join((
+            self.request.accepted_renderer.format,
+            "detail" if lookup_url_kwarg in self.kwargs else "list",
+            normalized_query(self.request),
+            str(count),
+            *(value.isoformat() for value in timestamps),
+        ))
+        etag = quote_etag(hashlib.sha1(raw.encode()).hexdigest())
+        last_modified = timegm(max(timestamps).utctimetuple())
+        return etag, last_modified
+
+    def get_object_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return queryset.filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+
+    def conditional(self, handler, queryset, request, *args, **kwargs):
+        return self.conditional_version(
+            handler, self.get_cached_version(queryset, request),
+            request, *args, **kwargs
+        )
+
+    def get_cached_version(self, queryset, request):
+        """
+        РЕШЕНИЕ: Версия GET кэшируется под поколениями каталога рядом с
+        ответом (CachedResponseMixin)
+        ПОЧЕМУ:
+        1. Агрегат COUNT/MAX - проход по всему отфильтрованному queryset;
+           без кэша он выполнялся бы перед каждым попаданием в кэш ответов
+           и на каждой странице ?cursor=, которой COUNT не нужен
+        2. Любая запись меняет поколение - версия пересчитывается вместе с
+           ответом. ETag по-прежнему зависит от данных, а не от поколения:
+           запись в другую книгу не ломает If-Match этой
+        """
+        if not hasattr(self, "make_cache_key") or \
+                not self.cache_allowed(request):
+            return self.get_version(queryset)
+
+        cache = get_cache()
+        key = self.make_cache_key(
+            request,
+            request.path,
+            # Версия зависит и от рендерера (см. make_version)
+            f"version:{self.action}:{request.accepted_renderer.format}",
+            str(self.kwargs.get(self.lookup_url_kwarg or self.lookup_field,
+                                "")),
+            normalized_query(request),
+        )
+        version = cache.get(key)
+        if version is None:
+            version = self.get_version(queryset)
+            cache.set(key, version, settings.CATALOGUE_CACHE_TIMEOUT)
+        return version
+
+    def conditional_version(self, handler, version, request, *args,
+                            **kwargs):
+        etag, last_modified = version
+        if etag is None:
+            return handler(request, *args, **kwargs)
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if 200 <= response.status_code < 300 or response.status_code == 304:
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional(
+            super().list, queryset, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(
+            super().retrieve, self.get_object_queryset(),
+            request, *args, **kwargs
+        )
+
+    def guarded_write(self, handler, request, *args, **kwargs):
+        """
+        If-Match / If-Unmodified-Since для PUT, PATCH и DELETE.
+        Строка блокируется до конца записи, чтобы между проверкой
+        версии и UPDATE никто не успел ее изменить.
+        """
+        meta = request.META
+        if "HTTP_IF_MATCH" not in meta and \
+                "HTTP_IF_UNMODIFIED_SINCE" not in meta:
+            return handler(request, *args, **kwargs)
+
+        if "HTTP_IF_MATCH" in meta:
+            # api.compression ослабляет ETag сжатого ответа (W/"..."), а
+            # If-Match сравнивает строго. Наш ETag - версия данных, а не
+            # байты, поэтому слабая форма тоже подтверждает версию
+            meta["HTTP_IF_MATCH"] = meta["HTTP_IF_MATCH"].replace("W/", "")
+
+        with transaction.atomic():
+            queryset = self.get_object_queryset()
+            # FOR UPDATE несовместим с агрегатами - блокируем отдельно
+            list(
+                queryset.select_for_update(of=("self",))
+                .values_list("pk", flat=True)
+            )
+            etag, last_modified = self.get_version(queryset)
+            failed = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if failed is not None:
+                return failed
+            return handler(request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        response = self.guarded_write(
+            super().update, request, *args, **kwargs
+        )
+        if response.status_code == 200:
+            # Новая версия сразу пригодна для следующего If-Match
+            etag, last_modified = self.get_version(
+                self.get_object_queryset()
+            )
+            if etag is not None:
+                response["ETag"] = etag
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def destroy(self, request, *args, **kwargs):
+        return self.guarded_write(super().destroy, request, *args, **kwargs)
@@ -0,0 +1,51 @@
+from .serializers import get_paths
+
+INCLUDE_QUERY_PARAM = "include"
+
+
+def include_authors(data):
+    """
+    {"results": [{..., "author": {...}}]} ->
+    {"results": [{..., "author": 1}], "included": {"authors": [{...}]}}
+    Автор без id (?fields= без author.id) остается вложенным
+    """
+    rows = data["results"] if isinstance(data, dict) else data
+    authors = {}
+    results = []
+    for row in rows:
+        author = row.get("author")
+        if isinstance(author, dict) and "id" in author:
+            authors.setdefault(author["id"], author)
+            row = {**row, "author": author["id"]}
+        results.append(row)
+    envelope = dict(data) if isinstance(data, dict) else {}
+    envelope["results"] = results
+    envelope["included"] = {"authors": list(authors.values())}
+    return envelope
+
+
+class IncludedAuthorsMixin:
+    """
+    РЕШЕНИЕ: ?include=author - каждый автор один раз на страницу
+    ПОЧЕМУ:
+    1. У книг одного автора в списке повторяется весь его объект с bio -
+       на странице плодовитого автора это большая часть ответа
+    2. Книга ссылается на автора по id, авторы лежат в included.authors
+       (как included в JSON:API); без параметра формат прежний
+    3. Преобразуется уже сериализованная страница, поэтому работает и
+       с быстрым путем, и с ?fields=, и с кэшем ответов
+    """
+
+    def wants_included_authors(self, request):
+        return "author" in get_paths(request, INCLUDE_QUERY_PARAM)
+
+    def include_related(self, request, data):
+        if self.wants_included_authors(request):
+            return include_authors(data)
+        return data
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.data = self.include_related(request, response.data)
+        return response
@@ -0,0 +1,113 @@
+from django.conf import settings
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
+
+from library.cache import get_cache, get_generations
+
+from .cache import normalized_query
+from .serializers import MultiGetSerializer
+
+
+class MultiGetMixin:
+    """
+    РЕШЕНИЕ: Пакетное чтение карточек: GET ?ids=1,2,3 на списке и
+    POST .../batch-get/ {"ids": [...]}
+    ПОЧЕМУ:
+    1. Полки и подборки фронтенда ссылаются на 50-200 книг, и каждая
+       карточка была отдельным запросом со своей аутентификацией,
+       SELECT и рендерингом. Здесь все строки читаются одним запросом
+       (автор - тем же JOIN, что и в списке)
+    2. results идут в порядке ids (повтор id выводится один раз),
+       ненайденные id перечислены в missing
+    3. Карточки, уже лежащие в кэше ответов retrieve (CachedResponseMixin),
+       берутся одним get_many; прочитанные из БД кладутся под теми же
+       ключами - следующий GET карточки тоже попадет в кэш
+    4. Не больше MULTIGET_MAX_IDS id за запрос. POST - для списков, которые
+       не помещаются в URL; это чтение, поэтому доступно без прав
+       администратора
+    """
+
+    multi_get_query_param = "ids"
+
+    def list(self, request, *args, **kwargs):
+        if self.multi_get_query_param not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        raw = request.query_params[self.multi_get_query_param]
+        return self.multi_get(request, raw.split(",") if raw else [])
+
+    @action(detail=False, methods=["post"], url_path="batch-get",
+            parser_classes=[JSONParser])
+    def batch_get(self, request):
+        """Карточки по id из тела {"ids": [...]}; ответ как у ?ids="""
+        data = request.data
+        return self.multi_get(
+            request, data.get("ids") if isinstance(data, dict) else None
+        )
+
+    def multi_get(self, request, ids):
+        params = MultiGetSerializer(data={"ids": ids})
+        params.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(params.validated_data["ids"]))
+
+        keys = {}
+        found = {}
+        if self.cache_allowed(request):
+            keys = self.object_cache_keys(request, ids)
+            cached = get_cache().get_many(keys.values())
+            found = {
+                pk: cached[key][1] for pk, key in keys.items()
+                if key in cached
+            }
+        missing = [pk for pk in ids if pk not in found]
+        if missing:
+            fetched = self.fetch_objects(request, missing)
+            if keys and fetched:
+                get_cache().set_many(
+                    {keys[pk]: (200, item) for pk, item in fetched.items()},
+                    settings.CATALOGUE_CACHE_TIMEOUT,
+                )
+            found.update(fetched)
+
+        data = {
+            "results": [found[pk] for pk in ids if pk in found],
+            "missing": [pk for pk in ids if pk not in found],
+        }
+        # ?include=author (IncludedAuthorsMixin) работает и для пакета
+        if hasattr(self, "include_related"):
+            data = self.include_related(request, data)
+        return Response(data)
+
+    def object_cache_keys(self, request, ids):
+        """{id: ключ кэша, под которым лежит ответ GET карточки}"""
+        generations = get_generations(*self.get_cache_models())
+        query = normalized_query(
+            request, exclude=(self.multi_get_query_param,)
+        )
+        return {
+            pk: self.make_cache_key(
+                request,
+                self.reverse_action(
+                    "detail", kwargs={"pk": pk}, request=None
+                ),
+                "retrieve",
+                str(pk),
+                query,
+                generations,
+            )
+            for pk in ids
+        }
+
+    def fetch_objects(self, request, ids):
+        """{id: представление} для найденных id одним запросом"""
+        queryset = self.get_queryset().filter(pk__in=ids).order_by()
+        if self.use_fast_list(request):
+            serializer = self.fast_serializer_class(request=request)
+            rows = list(queryset.values(*serializer.values))
+            return {
+                row["id"]: item
+                for row, item in zip(rows, serializer.serialize(rows))
+            }
+        objects = list(queryset)
+        data = self.get_serializer(objects, many=True).data
+        return {obj.pk: item for obj, item in zip(objects, data)}
@@ -0,0 +1,349 @@
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import F, Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# Типы значений в курсоре (JSON): строки, числа, bool и null
+CURSOR_VALUE_TYPES = (str, int, float, type(None))
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    РЕШЕНИЕ: Keyset (seek) пагинация, включаемая параметром ?cursor=
+    ПОЧЕМУ:
+    1. PageNumberPagination на каждый запрос делает COUNT(*) и OFFSET n -
+       чем глубже страница, тем дольше БД пропускает строки
+    2. Keyset продолжает выборку с последней строки страницы:
+       WHERE (title, id) > (:title, :id) ORDER BY title, id LIMIT n,
+       стоимость не зависит от номера страницы и использует существующие
+       индексы (title, book_year_title_idx, author_full_name_idx)
+    3. Без ?cursor= поведение прежнее - старые клиенты ничего не замечают
+    """
+
+    cursor_query_param = "cursor"
+    tiebreaker = "id"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            self.keyset = False
+            return super().paginate_queryset(
+                self.stable_order(queryset), request, view
+            )
+        return self.keyset_page(list(self.keyset_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset для async views: те же курсоры и номера страниц,
+        запросы через acount()/aiterator()
+        """
+        if self.cursor_query_param in request.query_params:
+            rows = self.keyset_queryset(queryset, request)
+            return self.keyset_page([row async for row in rows.aiterator()])
+
+        self.keyset = False
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(
+            self.stable_order(queryset), page_size
+        )
+        # Paginator.count - cached_property: заранее посчитанное значение
+        # избавляет page() от синхронного COUNT(*)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        self.page.object_list = [
+            row async for row in self.page.object_list.aiterator()
+        ]
+        self.request = request
+        return list(self.page)
+
+    def stable_order(self, queryset):
+        """
+        РЕШЕНИЕ: Страницы ?page= сортируются так же, как курсор и снимок
+        каталога: id на хвосте, явное место NULL
+        ПОЧЕМУ: При равных значениях сортировки (год, число книг) порядок
+        строк оставался на усмотрение БД - страницы могли повторять и
+        терять строки, а ответ снимка (api.v1.snapshot) отличался от ORM
+        при том же ETag
+        """
+        if not isinstance(queryset, QuerySet):
+            # Selection снимка уже упорядочена так же
+            return queryset
+        ordering = self.get_ordering(queryset)
+        nullable = self.nullable_fields(queryset.model, ordering)
+        return queryset.order_by(*self.order_by(ordering, nullable))
+
+    def keyset_start(self, ordering, request):
+        """
+        Порядок и курсор страницы: (значения курсора или None, reverse).
+        Общая часть keyset_queryset и снимка каталога (api.v1.snapshot)
+        """
+        self.keyset = True
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = ordering
+        cursor = self.decode_cursor(request)
+        self.cursor_values, self.reverse = cursor if cursor else (None, False)
+        return self.cursor_values, self.reverse
+
+    def keyset_queryset(self, queryset, request):
+        """Срез страницы по курсору; сам запрос выполняет вызывающий"""
+        # РЕШЕНИЕ: Порядок берем из уже отсортированного queryset
+        # ПОЧЕМУ: OrderingFilter отработал раньше пагинации, поэтому
+        # ?ordering=-year, author__last_name и ordering по умолчанию
+        # поддерживаются автоматически. id добавляем как tiebreaker -
+        # без уникального хвоста курсор может пропустить или повторить строки
+        values, reverse = self.keyset_start(
+            self.get_ordering(queryset), request
+        )
+        ordering = (
+            [self.invert(field) for field in self.ordering]
+            if reverse else self.ordering
+        )
+
+        nullable = self.nullable_fields(queryset.model, ordering)
+        queryset = queryset.order_by(*self.order_by(ordering, nullable))
+        if values is not None:
+            try:
+                queryset = queryset.filter(
+                    self.seek_filter(ordering, values, nullable)
+                )
+            except (TypeError, ValueError, ValidationError):
+                # Значение не приводится к типу поля (year="abc")
+                raise NotFound("Некорректный курсор.")
+
+        # Берем на одну строку больше, чтобы узнать, есть ли следующая
+        # страница, без отдельного COUNT(*)
+        return queryset[:self.page_size + 1]
+
+    def keyset_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        if self.reverse:
+            self.has_next = self.cursor_values is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor_values is not None
+
+        self.first_row = rows[0] if rows else None
+        self.last_row = rows[-1] if rows else None
+        return rows
+
+    def get_ordering(self, queryset):
+        return self.with_tiebreaker(
+            queryset.query.order_by or queryset.model._meta.ordering
+        )
+
+    def with_tiebreaker(self, ordering):
+        ordering = list(ordering)
+        names = {field.lstrip("-") for field in ordering}
+        if not names & {"id", "pk"}:
+            ordering.append(self.tiebreaker)
+        return ordering
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    @staticmethod
+    def nullable_fields(model, ordering):
+        """Поля сортировки, допускающие NULL (аннотации считаются NOT NULL)"""
+        nullable = set()
+        for field in ordering:
+            name = field.lstrip("-")
+            current = model
+            try:
+                for part in name.split("__"):
+                    db_field = current._meta.get_field(
+                        "id" if part == "pk" else part
+                    )
+                    current = db_field.related_model or current
+            except FieldDoesNotExist:
+                continue
+            if db_field.null:
+                nullable.add(name)
+        return nullable
+
+    @staticmethod
+    def order_by(ordering, nullable):
+        """
+        РЕШЕНИЕ: У NULL-полей явное место NULL: первыми по возрастанию,
+        последними по убыванию
+        ПОЧЕМУ: PostgreSQL и SQLite по умолчанию ставят NULL по-разному,
+        а курсору нужен один порядок, зеркальный при обратном проходе.
+        NOT NULL поля сортируются как раньше - иначе PostgreSQL не взял бы
+        для них b-tree индекс
+        """
+        expressions = []
+        for field in ordering:
+            name = field.lstrip("-")
+            if name not in nullable:
+                expressions.append(field)
+            elif field.startswith("-"):
+                expressions.append(F(name).desc(nulls_last=True))
+            else:
+                expressions.append(F(name).asc(nulls_first=True))
+        return expressions
+
+    @staticmethod
+    def after(name, value, descending, nullable):
+        """Условие "строго после value" для одного поля; None - таких нет"""
+        if value is None:
+            # NULL первый по возрастанию и последний по убыванию
+            return None if descending else Q(**{f"{name}__isnull": False})
+        if not descending:
+            return Q(**{f"{name}__gt": value})
+        clause = Q(**{f"{name}__lt": value})
+        if name in nullable:
+            clause |= Q(**{f"{name}__isnull": True})
+        return clause
+
+    @classmethod
+    def seek_filter(cls, ordering, values, nullable=()):
+        """
+        Разворачивает (a, b, id) > (x, y, z) с учетом направления каждого
+        поля в (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND id > z).
+        Для NULL-значений сравнение заменяется на IS NULL / IS NOT NULL
+        """
+        clauses = []
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip("-")
+            descending = field.startswith("-")
+            after = cls.after(name, value, descending, nullable)
+            if after is not None:
+                clauses.append(equal & after)
+            equal &= Q(**(
+                {f"{name}__isnull": True} if value is None else {name: value}
+            ))
+
+        # РЕШЕНИЕ: Дублируем нестрогую границу по первому полю (a >= x)
+        # ПОЧЕМУ: Из одного OR планировщик не всегда выводит диапазон по
+        # индексу и сканирует его с начала; явная граница дает range scan
+        first, value = ordering[0], values[0]
+        name = first.lstrip("-")
+        descending = first.startswith("-")
+        if value is None:
+            bound = Q(**{f"{name}__isnull": True}) if descending else Q()
+        else:
+            lookup = "lte" if descending else "gte"
+            bound = Q(**{f"{name}__{lookup}": value})
+            if descending and name in nullable:
+                bound |= Q(**{f"{name}__isnull": True})
+        return bound & reduce(or_, clauses)
+
+    @staticmethod
+    def row_values(row, ordering):
+        # Строка values() (быстрый путь списка) - словарь с теми же ключами
+        if isinstance(row, dict):
+            return [row[field.lstrip("-")] for field in ordering]
+        values = []
+        for field in ordering:
+            value = row
+            for attr in field.lstrip("-").split("__"):
+                value = getattr(value, "id" if attr == "pk" else attr)
+            values.append(value)
+        return values
+
+    @classmethod
+    def make_token(cls, row, ordering, reverse=False):
+        payload = {
+            "o": ordering,
+            "v": cls.row_values(row, ordering),
+            "r": reverse,
+        }
+        raw = json.dumps(payload, default=str, ensure_ascii=False)
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def encode_cursor(self, row, reverse):
+        token = self.make_token(row, self.ordering, reverse)
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+            values, reverse = payload["v"], bool(payload["r"])
+            ordering = payload["o"]
+            # Курсор приходит от клиента: v - список скаляров, иначе
+            # len() и seek_filter падали бы с 500
+            if not isinstance(values, list) or not all(
+                isinstance(value, CURSOR_VALUE_TYPES) for value in values
+            ):
+                raise TypeError(values)
+            matches = ordering == self.ordering and (
+                len(values) == len(ordering)
+            )
+        except (TypeError, ValueError, KeyError):
+            raise NotFound("Некорректный курсор.")
+        # Курсор, выданный для другой сортировки, не имеет смысла
+        if not matches:
+            raise NotFound("Курсор не соответствует параметру ordering.")
+        return values, reverse
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or self.last_row is None:
+            return None
+        return self.encode_cursor(self.last_row, reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or self.first_row is None:
+            return None
+        return self.encode_cursor(self.first_row, reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response = super().get_paginated_response_schema(schema)
+        response["properties"]["count"]["description"] = (
+            "Отсутствует при keyset-пагинации (?cursor=)"
+        )
+        return response
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append({
+            "name": self.cursor_query_param,
+            "required": False,
+            "in": "query",
+            "description": (
+                "Keyset-пагинация без COUNT(*) и OFFSET. "
+                "Передайте пустое значение для первой страницы, "
+                "далее используйте ссылки next/previous."
+            ),
+            "schema": {"type": "string"},
+        })
+        return parameters
@@ -0,0 +1,38 @@
+from django.conf import settings
+from rest_framework import permissions
+
+from library import routers
+from library.cache import recently_written
+
+
+class ReplicaReadMixin:
+    """
+    РЕШЕНИЕ: Безопасные запросы viewset'а читают каталог с реплики
+    ПОЧЕМУ:
+    1. Решение принимается в initial() - после аутентификации, когда
+       известны и метод, и пользователь
+    2. Администраторы (они же единственные, кто пишет каталог) всегда
+       читают основную БД - видят свои правки сразу
+    3. В течение DB_REPLICA_LAG секунд после любой записи каталога все
+       читают основную БД: отставшая реплика не попадет в кэш ответов
+    """
+
+    def use_replica(self, request):
+        return (
+            bool(settings.DATABASE_REPLICAS)
+            and request.method in permissions.SAFE_METHODS
+            and not request.user.is_staff
+            and not recently_written()
+        )
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.use_replica(request):
+            self.replica_token = routers.use_replica()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, "replica_token", None)
+        if token is not None:
+            routers.reset_replica(token)
+            self.replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
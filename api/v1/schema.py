@@ -0,0 +1,234 @@
+"""
+OpenAPI-схема и документация API: /api/v1/schema/, /docs/, /redoc/.
+
+РЕШЕНИЕ: Схема собирается один раз (manage.py build_schema) в файлы
+SCHEMA_ROOT, а /api/v1/schema/ отдает готовые байты
+ПОЧЕМУ:
+1. SpectacularAPIView на каждый запрос заново обходит все viewset'ы,
+   сериализаторы и фильтры - сотни миллисекунд CPU на неизменный ответ
+2. Рядом с JSON и YAML лежат сжатые варианты (.gz, .br, .zst) - сжатие
+   стоит один раз при сборке, а не на каждый запрос
+3. ETag - хеш содержимого, Cache-Control - долгий: клиенты и прокси
+   переспрашивают схему условным запросом и получают 304
+4. Модули drf_spectacular (генератор, YAML, Swagger UI и Redoc)
+   импортируются при первом запросе документации: воркерам, которые
+   обслуживают только API, они не нужны ни при старте, ни в памяти
+"""
+import hashlib
+import inspect
+import json
+import logging
+import os
+from functools import lru_cache
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.module_loading import import_string
+from django.views import View
+from rest_framework.viewsets import _is_extra_action
+
+from api.compression import CODECS, choose_encoding
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    "yaml": "application/vnd.oai.openapi; charset=utf-8",
+    "json": "application/vnd.oai.openapi+json",
+}
+MANIFEST = "manifest.json"
+EXTENSIONS = {"gzip": "gz", "br": "br", "zstd": "zst"}
+
+
+def artifact_name(fmt, encoding=None):
+    version = settings.SPECTACULAR_SETTINGS.get("VERSION") or "0"
+    name = f"openapi-{version}.{fmt}"
+    if encoding is not None:
+        name += f".{EXTENSIONS[encoding]}"
+    return name
+
+
+def render_schema():
+    """{формат: байты} - схема API, как ее отдал бы SpectacularAPIView"""
+    from drf_spectacular.generators import SchemaGenerator
+    from drf_spectacular.renderers import (
+        OpenApiJsonRenderer, OpenApiYamlRenderer,
+    )
+
+    # Регистрирует OpenApiViewExtension
+    from . import schema_extensions  # noqa: F401
+
+    schema = SchemaGenerator().get_schema(request=None, public=True)
+    return {
+        "yaml": OpenApiYamlRenderer().render(schema),
+        "json": OpenApiJsonRenderer().render(schema),
+    }
+
+
+def compressed_variants(content):
+    """{кодировка или None: байты}; не ставший меньше вариант не нужен"""
+    variants = {None: content}
+    for encoding, compress in CODECS.items():
+        compressed = compress(content)
+        if len(compressed) < len(content):
+            variants[encoding] = compressed
+    return variants
+
+
+def content_etag(content):
+    return hashlib.sha256(content).hexdigest()[:32]
+
+
+def build_artifacts(root):
+    """
+    Записывает схему и ее сжатые варианты в root, последним - манифест
+    (воркеры читают файлы только по манифесту). Возвращает манифест
+    """
+    os.makedirs(root, exist_ok=True)
+    manifest = {
+        "version": settings.SPECTACULAR_SETTINGS.get("VERSION"),
+        "formats": {},
+    }
+    for fmt, content in render_schema().items():
+        variants = compressed_variants(content)
+        for encoding, data in variants.items():
+            write_atomic(os.path.join(root, artifact_name(fmt, encoding)),
+                         data)
+        manifest["formats"][fmt] = {
+            "etag": content_etag(content),
+            "size": len(content),
+            "encodings": {
+                encoding: len(data)
+                for encoding, data in variants.items() if encoding
+            },
+        }
+    write_atomic(
+        os.path.join(root, MANIFEST),
+        json.dumps(manifest, indent=2).encode(),
+    )
+    return manifest
+
+
+def write_atomic(path, data):
+    # Воркер, читающий файл во время сборки, видит старую или новую
+    # версию целиком
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as output:
+        output.write(data)
+    os.replace(tmp, path)
+
+
+@lru_cache(maxsize=4)
+def load_artifacts(root, mtime):
+    """
+    {формат: (etag, {кодировка или None: байты})} из root.
+    mtime манифеста - часть ключа кэша: пересборка без рестарта
+    подхватывается следующим запросом
+    """
+    with open(os.path.join(root, MANIFEST), encoding="utf-8") as source:
+        manifest = json.load(source)
+    artifacts = {}
+    for fmt, meta in manifest["formats"].items():
+        variants = {}
+        for encoding in (None, *meta["encodings"]):
+            with open(os.path.join(root, artifact_name(fmt, encoding)),
+                      "rb") as source:
+                variants[encoding] = source.read()
+        artifacts[fmt] = (meta["etag"], variants)
+    return artifacts
+
+
+@lru_cache(maxsize=1)
+def generated_artifacts():
+    """Схема без сборки - генерируется в процессе один раз"""
+    logger.warning(
+        "Схема API не собрана (%s) - генерирую в процессе. "
+        "Выполните manage.py build_schema", settings.SCHEMA_ROOT,
+    )
+    return {
+        fmt: (content_etag(content), compressed_variants(content))
+        for fmt, content in render_schema().items()
+    }
+
+
+def get_artifacts():
+    root = str(settings.SCHEMA_ROOT)
+    try:
+        mtime = os.stat(os.path.join(root, MANIFEST)).st_mtime_ns
+    except FileNotFoundError:
+        return generated_artifacts()
+    return load_artifacts(root, mtime)
+
+
+class SchemaView(View):
+    """
+    Готовая схема. Формат - как у SpectacularAPIView: YAML по умолчанию,
+    JSON по ?format=json или Accept: application/vnd.oai.openapi+json
+    """
+
+    def get_format(self, request):
+        fmt = request.GET.get("format")
+        if fmt is None:
+            accept = request.headers.get("Accept", "")
+            fmt = "json" if "json" in accept else "yaml"
+        if fmt not in FORMATS:
+            raise Http404(f"Формат схемы: {', '.join(FORMATS)}")
+        return fmt
+
+    def get(self, request):
+        fmt = self.get_format(request)
+        etag, variants = get_artifacts()[fmt]
+        encoding = choose_encoding(
+            request.headers.get("Accept-Encoding", ""),
+            [name for name in settings.COMPRESSION_ENCODINGS
+             if name in variants],
+        )
+        # Байты вариантов разные - у каждого свой сильный ETag
+        etag = f'"{etag}-{encoding}"' if encoding else f'"{etag}"'
+
+        response = HttpResponse(
+            variants[encoding], content_type=FORMATS[fmt]
+        )
+        if encoding:
+            response["Content-Encoding"] = encoding
+        response["ETag"] = etag
+        response["Cache-Control"] = (
+            f"public, max-age={settings.SCHEMA_CACHE_MAX_AGE}"
+        )
+        patch_vary_headers(response, ("Accept", "Accept-Encoding"))
+        return get_conditional_response(
+            request, etag=etag, response=response
+        )
+
+
+def lazy_view(path, **initkwargs):
+    """
+    View, класс которого импортируется при первом запросе: модуль
+    drf_spectacular.views тянет за собой генератор схемы и YAML
+    """
+    view = None
+
+    def wrapper(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(path).as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+class StaticActionsMixin:
+    """
+    РЕШЕНИЕ: @action viewset'а ищутся без чтения атрибутов класса
+    ПОЧЕМУ: Роутер при загрузке URLconf вызывает get_extra_actions, а
+    стандартный inspect.getmembers читает и дескриптор schema, который
+    импортирует DEFAULT_SCHEMA_CLASS - drf_spectacular.openapi и еще
+    ~45 модулей на каждом старте воркера. Схема нужна только build_schema
+    """
+
+    @classmethod
+    def get_extra_actions(cls):
+        return [
+            method for _, method
+            in inspect.getmembers_static(cls, _is_extra_action)
+        ]
@@ -0,0 +1,26 @@
+"""
+Описания OpenAPI для view, которые drf_spectacular не разбирает сам.
+
+РЕШЕНИЕ: OpenApiViewExtension вместо @extend_schema на самих view
+ПОЧЕМУ: Модуль импортирует только render_schema() - views.py не тянет
+drf_spectacular при старте воркера (см. api.v1.schema)
+"""
+from drf_spectacular.extensions import OpenApiViewExtension
+from drf_spectacular.utils import extend_schema
+
+from .serializers import SuggestQuerySerializer, SuggestSerializer
+
+
+class SuggestViewExtension(OpenApiViewExtension):
+    target_class = "api.v1.views.SuggestView"
+
+    def view_replacement(self):
+        class SuggestView(self.target_class):
+            @extend_schema(
+                parameters=[SuggestQuerySerializer],
+                responses=SuggestSerializer,
+            )
+            def get(self, request):
+                return super().get(request)
+
+        return SuggestView
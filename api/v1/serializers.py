@@ -1,9 +1,217 @@
+from operator import itemgetter
+
 from django.conf import settings
-from rest_framework import serializers
+from django.core.files.storage import default_storage
+from rest_framework import permissions, serializers
+
+from api.instrumentation import timed
+from library import covers, facets
 from library.models import Author, Book
 
 
-class AuthorSerializer(serializers.ModelSerializer):
+# РЕШЕНИЕ: Жесткий лимит книг, раскрываемых у одного автора
+# ПОЧЕМУ: У плодовитого автора могут быть тысячи книг - без лимита
+# ?expand=books превращает страницу из 10 авторов в мегабайтный ответ
+EXPAND_BOOKS_LIMIT = 10
+
+EXPAND_QUERY_PARAM = "expand"
+FIELDS_QUERY_PARAM = "fields"
+EXCLUDE_QUERY_PARAM = "exclude"
+
+# Срезанный Prefetch в Django требует to_attr - раскрытые книги лежат здесь
+EXPANDED_BOOKS_ATTR = "expanded_books"
+
+
+def get_paths(request, param):
+    """
+    Разбирает ?param=books,author.books в множество путей.
+    Пути вложенных сериализаторов пишутся через точку.
+    """
+    if request is None:
+        return frozenset()
+    raw = request.query_params.get(param, "")
+    return frozenset(path.strip() for path in raw.split(",") if path.strip())
+
+
+def get_expand(request):
+    return get_paths(request, EXPAND_QUERY_PARAM)
+
+
+def get_sparse(request):
+    """
+    (?fields=, ?exclude=) для чтения. Запись принимает и возвращает все
+    поля - иначе выбор полей отключал бы их валидацию
+    """
+    if request is None or request.method not in permissions.SAFE_METHODS:
+        return frozenset(), frozenset()
+    return (
+        get_paths(request, FIELDS_QUERY_PARAM),
+        get_paths(request, EXCLUDE_QUERY_PARAM),
+    )
+
+
+def field_path(serializer):
+    """Путь от корневого сериализатора: ("author",) у BookSerializer.author"""
+    parts = []
+    node = serializer
+    while node.parent is not None:
+        if node.field_name:
+            parts.insert(0, node.field_name)
+        node = node.parent
+    return tuple(parts)
+
+
+def relative_paths(paths, parts):
+    """Для вложенного сериализатора отрезаем префикс: author.books -> books"""
+    if not parts:
+        return paths
+    prefix = ".".join(parts) + "."
+    return frozenset(
+        path[len(prefix):] for path in paths if path.startswith(prefix)
+    )
+
+
+class ExpandableFieldsMixin:
+    """
+    РЕШЕНИЕ: Дорогие связанные поля добавляются только по ?expand=
+    ПОЧЕМУ:
+    1. Связи, которые не попадают в ответ, не должны грузиться из БД
+    2. View по тому же ?expand= решает, какие prefetch/select_related нужны,
+       поэтому представление и форма запроса всегда согласованы
+    """
+
+    # имя поля -> фабрика сериализатора
+    expandable_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expand = self.get_expand()
+        for name, factory in self.expandable_fields.items():
+            if name in expand:
+                fields[name] = factory()
+        return fields
+
+    def get_expand(self):
+        if "expand" in self.context:
+            paths = frozenset(self.context["expand"])
+        else:
+            paths = get_expand(self.context.get("request"))
+        return relative_paths(paths, field_path(self))
+
+
+class SparseFieldsMixin:
+    """
+    РЕШЕНИЕ: ?fields=id,title,author.full_name и ?exclude=preface
+    ПОЧЕМУ:
+    1. Списку названий не нужны preface (TextField без ограничения),
+       bio и обложки - ни в ответе, ни в SELECT
+    2. Набор полей сериализатора - единственный источник правды: по нему
+       же SparseFieldsViewMixin строит only() и решает, нужен ли JOIN
+    3. Неизвестные имена игнорируются, как и неизвестные параметры фильтров
+    """
+
+    # Поле сериализатора -> колонки модели, если имена не совпадают
+    # (вычисляемые свойства, SerializerMethodField)
+    column_sources = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        include, exclude = self.get_sparse()
+        if include:
+            fields = {
+                name: field for name, field in fields.items()
+                if name in include
+                or any(path.startswith(name + ".") for path in include)
+            }
+        for name in exclude:
+            fields.pop(name, None)
+        return fields
+
+    def get_sparse(self):
+        include, exclude = get_sparse(self.context.get("request"))
+        parts = field_path(self)
+        # ?fields=author выбирает вложенного автора целиком
+        if any(".".join(parts[:end]) in include
+               for end in range(1, len(parts) + 1)):
+            include = frozenset()
+        return relative_paths(include, parts), relative_paths(exclude, parts)
+
+
+def model_columns(serializer, prefix=""):
+    """
+    Колонки для only() и связи для select_related/prefetch_related,
+    которые нужны выбранным полям сериализатора
+    """
+    columns, relations, prefetches = [], [], []
+    column_sources = getattr(serializer, "column_sources", {})
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.ListSerializer):
+            # Раскрытые списки (?expand=books) грузит Prefetch по pk
+            prefetches.append(prefix + field.source)
+        elif isinstance(field, serializers.BaseSerializer):
+            # Сам FK тоже: only() не дает select_related по отложенному полю
+            columns.append(prefix + field.source)
+            relations.append(prefix + field.source)
+            nested = model_columns(field, f"{prefix}{field.source}__")
+            # Из связи нужен хотя бы pk - иначе only() грузит ее целиком
+            columns += nested[0] or [f"{prefix}{field.source}__id"]
+            relations += nested[1]
+            prefetches += nested[2]
+        else:
+            columns += (
+                prefix + source
+                for source in column_sources.get(name, (field.source,))
+            )
+    return columns, relations, prefetches
+
+
+class TimedDataMixin:
+    """Время построения .data попадает в фазу serialize (api.instrumentation)"""
+
+    @property
+    def data(self):
+        with timed("serialize"):
+            return super().data
+
+
+class TimedListSerializer(TimedDataMixin, serializers.ListSerializer):
+    pass
+
+
+class LimitedListSerializer(serializers.ListSerializer):
+    """
+    Срез вместо полного списка: берем список из Prefetch(to_attr=...),
+    а если view его не подготовил - в SQL уходит LIMIT
+    """
+
+    limit = EXPAND_BOOKS_LIMIT
+
+    def get_attribute(self, instance):
+        prefetched = getattr(instance, EXPANDED_BOOKS_ATTR, None)
+        if prefetched is not None:
+            return prefetched
+        return super().get_attribute(instance)
+
+    def to_representation(self, data):
+        if hasattr(data, "all"):
+            data = data.all()
+        return super().to_representation(data[:self.limit])
+
+
+class BookBriefSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Краткая книга для ?expand=books - без автора, он уже известен"""
+
+    class Meta:
+        model = Book
+        fields = ("id", "title", "year")
+        read_only_fields = fields
+        list_serializer_class = LimitedListSerializer
+
+
+class AuthorSerializer(TimedDataMixin, SparseFieldsMixin,
+                       ExpandableFieldsMixin, serializers.ModelSerializer):
     # РЕШЕНИЕ: ReadOnlyField для вычисляемого свойства
     # ПОЧЕМУ: full_name не хранится в БД, а вычисляется на лету
     # Это позволяет фронтенду получать готовое ФИО без дополнительной обработки
@@ -18,11 +226,22 @@ class AuthorSerializer(serializers.ModelSerializer):
         model = Author
         fields = (
             "id", "last_name", "first_name",
-            "middle_name", "full_name", "birth_date", "bio"
+            "middle_name", "full_name", "birth_date", "bio",
+            "books_count", "first_year", "last_year",
         )
+        # Статистику ведут триггеры СУБД (library.stats), не клиент
+        read_only_fields = ("books_count", "first_year", "last_year")
+        list_serializer_class = TimedListSerializer
 
+    expandable_fields = {
+        "books": lambda: BookBriefSerializer(many=True, read_only=True),
+    }
 
-class BookSerializer(serializers.ModelSerializer):
+    column_sources = {"full_name": ("last_name", "first_name", "middle_name")}
+
+
+class BookSerializer(TimedDataMixin, SparseFieldsMixin,
+                     ExpandableFieldsMixin, serializers.ModelSerializer):
     # РЕШЕНИЕ: Вложенный serializer для автора при чтении
     # ПОЧЕМУ: Фронтенду нужна полная информация об авторе для отображения
     # Избегаем дополнительных запросов к API для получения данных автора
@@ -40,12 +259,20 @@ class BookSerializer(serializers.ModelSerializer):
 
     id = serializers.ReadOnlyField()
 
+    # РЕШЕНИЕ: Превью обложки по форматам и ширинам
+    # ПОЧЕМУ: Клиент выбирает размер под экран (srcset/<picture>) вместо
+    # загрузки оригинала. Пока превью строятся - пустой объект
+    cover_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = Book
         fields = (
             "id", "title", "year", "preface",
-            "cover", "author", "author_id"
+            "cover", "cover_srcset", "author", "author_id"
         )
+        list_serializer_class = TimedListSerializer
+
+    column_sources = {"cover_srcset": ("cover_variants",)}
 
     def validate_year(self, value):
         if value < 1000 or value > 2030:
@@ -53,3 +280,195 @@ class BookSerializer(serializers.ModelSerializer):
                 "Год издания должен быть между 1000 и 2030"
             )
         return value
+
+    def get_cover_srcset(self, book) -> dict:
+        return covers.srcset(book.cover_variants, self.context.get("request"))
+
+
+class FastAuthorSerializer:
+    """
+    РЕШЕНИЕ: Сериализация списка без полей DRF - из строк values()
+    ПОЧЕМУ:
+    1. ModelSerializer на каждую строку обходит поля, вызывает
+       get_attribute/to_representation и строит вложенный AuthorSerializer
+    2. Здесь колонки и их ключи в строке вычислены один раз в __init__,
+       строка - это только чтение ключей словаря
+    3. Только для чтения списков: запись идет через AuthorSerializer с
+       валидацией. Вывод совпадает с AuthorSerializer
+    """
+
+    fields = ("id", "last_name", "first_name", "middle_name", "birth_date",
+              "bio", "books_count", "first_year", "last_year")
+
+    def __init__(self, request=None, prefix=""):
+        self.request = request
+        # prefix="author__" - те же поля автора из строки книги
+        self.values = tuple(prefix + field for field in self.fields)
+        self.columns = itemgetter(*self.values)
+
+    def to_representation(self, row):
+        (pk, last_name, first_name, middle_name, birth_date, bio,
+         books_count, first_year, last_year) = self.columns(row)
+        return {
+            "id": pk,
+            "last_name": last_name,
+            "first_name": first_name,
+            "middle_name": middle_name,
+            "full_name": " ".join(
+                filter(None, (last_name, first_name, middle_name))
+            ),
+            "birth_date": birth_date.isoformat() if birth_date else None,
+            "bio": bio,
+            "books_count": books_count,
+            "first_year": first_year,
+            "last_year": last_year,
+        }
+
+    @timed("serialize")
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+class FastBookSerializer:
+    """Быстрый вывод списка книг; формат как у BookSerializer"""
+
+    fields = ("id", "title", "year", "preface", "cover", "cover_variants",
+              "author_id")
+
+    def __init__(self, request=None):
+        self.request = request
+        self.author = FastAuthorSerializer(request, prefix="author__")
+        self.values = self.fields + self.author.values
+        self.columns = itemgetter(*self.fields)
+
+    def cover_url(self, name):
+        # Как ImageField: пустое значение - None, иначе абсолютный URL
+        if not name:
+            return None
+        url = default_storage.url(name)
+        if self.request is not None:
+            return self.request.build_absolute_uri(url)
+        return url
+
+    @timed("serialize")
+    def serialize(self, rows):
+        # РЕШЕНИЕ: Кэш представлений авторов на время запроса
+        # ПОЧЕМУ: У книг на странице часто общий автор - словарь автора
+        # строится один раз и переиспользуется
+        authors = {}
+        data = []
+        for row in rows:
+            pk, title, year, preface, cover, variants, author_id = (
+                self.columns(row)
+            )
+            author = authors.get(author_id)
+            if author is None:
+                author = authors[author_id] = (
+                    self.author.to_representation(row)
+                )
+            data.append({
+                "id": pk,
+                "title": title,
+                "year": year,
+                "preface": preface,
+                "cover": self.cover_url(cover),
+                "cover_srcset": covers.srcset(variants, self.request),
+                "author": author,
+            })
+        return data
+
+
+class BookBulkSerializer(serializers.ModelSerializer):
+    """
+    РЕШЕНИЕ: Облегченная валидация строки bulk-загрузки
+    ПОЧЕМУ:
+    1. author_id - просто число: существование авторов проверяется одним
+       запросом на пачку, а не PrimaryKeyRelatedField на каждую строку
+    2. validators = [] отключает UniqueTogetherValidator (запрос на строку) -
+       совпадение (author, title) означает обновление, а не ошибку
+    """
+
+    author_id = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = Book
+        fields = ("title", "year", "preface", "author_id")
+        validators = []
+
+    validate_year = BookSerializer.validate_year
+
+
+class AuthorBulkSerializer(serializers.ModelSerializer):
+    """Строка bulk-загрузки авторов: с id - обновление, без id - создание"""
+
+    id = serializers.IntegerField(min_value=1, required=False)
+
+    class Meta:
+        model = Author
+        fields = (
+            "id", "last_name", "first_name", "middle_name", "birth_date", "bio"
+        )
+
+
+class MultiGetSerializer(serializers.Serializer):
+    """id для ?ids=1,2,3 и POST .../batch-get/ {"ids": [1, 2, 3]}"""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.MULTIGET_MAX_IDS,
+    )
+
+
+class SuggestQuerySerializer(serializers.Serializer):
+    """Параметры /api/v1/suggest/"""
+
+    q = serializers.CharField(max_length=100, trim_whitespace=True)
+    limit = serializers.IntegerField(min_value=1, max_value=20, default=10)
+
+
+class SuggestItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    display = serializers.CharField()
+
+
+class SuggestSerializer(serializers.Serializer):
+    """
+    Ответ /api/v1/suggest/. View собирает его словарем - сериализатор
+    описывает формат для OpenAPI-схемы
+    """
+
+    books = SuggestItemSerializer(many=True)
+    authors = SuggestItemSerializer(many=True)
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    """Параметры /api/v1/books/export/"""
+
+    # Не format: этот параметр DRF занимает под выбор рендерера
+    output = serializers.ChoiceField(choices=("ndjson", "csv"), default="ndjson")
+    gzip = serializers.BooleanField(default=False)
+
+
+class FacetQuerySerializer(serializers.Serializer):
+    """Параметры /api/v1/books/facets/"""
+
+    facet = serializers.MultipleChoiceField(
+        choices=facets.FACETS, required=False
+    )
+    # Авторов в каталоге - сотни тысяч, в панели - первые по числу книг
+    limit = serializers.IntegerField(min_value=1, max_value=1000, default=100)
+
+
+class ChangesQuerySerializer(serializers.Serializer):
+    """Параметры /api/v1/changes/"""
+
+    # Без since - только текущий номер: курсор для первой синхронизации
+    since = serializers.IntegerField(min_value=0, required=False)
+    limit = serializers.IntegerField(
+        min_value=1, max_value=settings.CHANGES_MAX_LIMIT, default=1000
+    )
+    # Секунд ждать новых изменений, если после since их нет (long-poll)
+    wait = serializers.FloatField(
+        min_value=0, max_value=settings.CHANGES_MAX_WAIT, default=0
+    )
@@ -0,0 +1,130 @@
+from rest_framework import filters
+from rest_framework.response import Response
+
+from library.snapshot import get_snapshot
+
+
+class SnapshotReadMixin:
+    """
+    РЕШЕНИЕ: list/retrieve отвечают из снимка каталога в mmap
+    (library.snapshot), если он свеж и запрос в нем выразим
+    ПОЧЕМУ:
+    1. Ни одного запроса к БД: ни за строками, ни за версией для ETag -
+       COUNT и MAX(updated_at) считаются по снимку, ни за кэшем ответов
+    2. Поддержаны фильтры snapshot_filters, ?ordering= по полям с индексом
+       в снимке, ?page= и ?cursor=. Ответ, ETag и курсоры те же, что у
+       ORM-пути - клиент не видит, откуда пришла страница
+    3. Остальное (поиск, expand, fields, include, ошибки валидации, курсор
+       на строку, которой уже нет) и любое чтение при устаревшем снимке -
+       прежним путем через ORM. После записи администратор видит ее сразу:
+       поколение каталога меняется, и снимок до пересборки не читается
+    """
+
+    # Таблица снимка (library.snapshot.MODELS)
+    snapshot_model = None
+    # Параметр запроса -> колонка группы снимка (library.snapshot.GROUPS)
+    snapshot_filters = {}
+    snapshot_params = {"format", "ordering", "page", "cursor"}
+
+    def get_read_snapshot(self, request, params):
+        if self.snapshot_model is None:
+            return None
+        if not set(request.query_params) <= params:
+            return None
+        return get_snapshot()
+
+    def snapshot_selection(self, request):
+        snapshot = self.get_read_snapshot(
+            request, self.snapshot_params | set(self.snapshot_filters)
+        )
+        if snapshot is None:
+            return None
+        values = {}
+        for param, column in self.snapshot_filters.items():
+            if param in request.query_params:
+                try:
+                    values[column] = int(request.query_params[param])
+                except ValueError:
+                    # Ошибку валидации сформулирует filterset
+                    return None
+        return snapshot.select(
+            self.snapshot_model, self.snapshot_ordering(request), values
+        )
+
+    def snapshot_ordering(self, request):
+        # Разбор как у OrderingFilter; поле без индекса в снимке дает
+        # select() = None и ORM
+        param = request.query_params.get(
+            filters.OrderingFilter.ordering_param
+        )
+        ordering = (
+            [field.strip() for field in param.split(",")] if param
+            else self.ordering
+        )
+        return self.paginator.with_tiebreaker(ordering)
+
+    def paginate_snapshot(self, selection, request):
+        """Строки страницы; None - курсор не найти в снимке"""
+        paginator = self.paginator
+        if paginator.cursor_query_param not in request.query_params:
+            return paginator.paginate_queryset(selection, request, view=self)
+
+        ordering = self.snapshot_ordering(request)
+        values, reverse = paginator.keyset_start(ordering, request)
+        limit = paginator.page_size + 1
+        if values is None:
+            rows = selection[-limit:][::-1] if reverse else selection[:limit]
+        else:
+            # Курсор указывает на строку по ее значениям сортировки: если
+            # в снимке у нее другие значения, место в порядке найдет только
+            # seek-запрос ORM
+            pk = values[-1]
+            row = (
+                selection.snapshot.get(self.snapshot_model, pk)
+                if isinstance(pk, int) else None
+            )
+            if row is None or paginator.row_values(row, ordering) != values:
+                return None
+            rows = selection.seek(pk, reverse, limit)
+        return paginator.keyset_page(rows)
+
+    def list(self, request, *args, **kwargs):
+        selection = self.snapshot_selection(request)
+        rows = (
+            None if selection is None
+            else self.paginate_snapshot(selection, request)
+        )
+        if rows is None:
+            return super().list(request, *args, **kwargs)
+
+        def respond(request):
+            data = self.fast_serializer_class(request=request).serialize(rows)
+            return self.get_paginated_response(data)
+
+        return self.conditional_version(
+            respond,
+            self.make_version(*selection.version(self.get_version_fields())),
+            request,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        snapshot = self.get_read_snapshot(request, {"format"})
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        row = None
+        if snapshot is not None and lookup.isdigit():
+            row = snapshot.get(self.snapshot_model, int(lookup))
+        if row is None:
+            # Нет в снимке - 404 и его формат остаются за get_object()
+            return super().retrieve(request, *args, **kwargs)
+
+        def respond(request):
+            serializer = self.fast_serializer_class(request=request)
+            return Response(serializer.serialize([row])[0])
+
+        return self.conditional_version(
+            respond,
+            self.make_version(
+                1, [row[field] for field in self.get_version_fields()]
+            ),
+            request,
+        )
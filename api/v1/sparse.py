@@ -0,0 +1,44 @@
+from .serializers import get_sparse, model_columns
+
+
+class SparseFieldsViewMixin:
+    """
+    РЕШЕНИЕ: ?fields=/?exclude= сужают и SELECT, а не только ответ
+    ПОЧЕМУ:
+    1. Колонки для only() берутся из полей сериализатора после выбора
+       (SparseFieldsMixin) - ответ и запрос не могут разойтись
+    2. Без полей автора select_related("author") снимается: JOIN и колонки
+       автора не читаются вовсе
+    3. Поля сортировки остаются в SELECT: keyset-курсор читает их из
+       первой и последней строки страницы
+    """
+
+    sparse_actions = ("list", "retrieve")
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in self.sparse_actions and any(
+            get_sparse(self.request)
+        ):
+            queryset = self.trim_queryset(queryset)
+        return queryset
+
+    def trim_queryset(self, queryset):
+        columns, relations, prefetches = model_columns(self.get_serializer())
+        annotations = queryset.query.annotations
+        for field in queryset.query.order_by:
+            if not isinstance(field, str):
+                continue
+            name = field.lstrip("-")
+            if name != "pk" and name not in annotations:
+                columns.append(name)
+                if "__" in name:
+                    relations.append(name.rsplit("__", 1)[0])
+
+        queryset = queryset.select_related(None)
+        if relations:
+            queryset = queryset.select_related(*dict.fromkeys(relations))
+        if not prefetches:
+            # Раскрытые книги вложены в автора, которого не выбрали
+            queryset = queryset.prefetch_related(None)
+        return queryset.only(*dict.fromkeys(columns))
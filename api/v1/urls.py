@@ -1,11 +1,12 @@
-from drf_spectacular.views import SpectacularSwaggerView, SpectacularRedocView, \
-    SpectacularAPIView
 from rest_framework.routers import DefaultRouter
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenObtainPairView, \
     TokenRefreshView
 
-from api.v1.views import AuthorViewSet, BookViewSet
+from api.v1.async_views import AsyncAuthorView, AsyncBookView
+from api.v1.changes import ChangesView
+from api.v1.schema import SchemaView, lazy_view
+from api.v1.views import AuthorViewSet, BookViewSet, SuggestView
 
 
 router = DefaultRouter()
@@ -14,10 +15,21 @@ router.register(r"books", BookViewSet, basename="book")
 
 urlpatterns = [
     path("", include(router.urls)),
-    path('schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('docs/', SpectacularSwaggerView.as_view(url_name='schema'),
+    path("suggest/", SuggestView.as_view(), name="suggest"),
+    path("changes/", ChangesView.as_view(), name="changes"),
+    path("async/books/", AsyncBookView.as_view(), name="async-book-list"),
+    path("async/books/<int:pk>/", AsyncBookView.as_view(),
+         name="async-book-detail"),
+    path("async/authors/", AsyncAuthorView.as_view(),
+         name="async-author-list"),
+    path("async/authors/<int:pk>/", AsyncAuthorView.as_view(),
+         name="async-author-detail"),
+    path('schema/', SchemaView.as_view(), name='schema'),
+    path('docs/', lazy_view("drf_spectacular.views.SpectacularSwaggerView",
+                            url_name='schema'),
          name='swagger-ui'),
-    path('redoc/', SpectacularRedocView.as_view(url_name='schema'),
+    path('redoc/', lazy_view("drf_spectacular.views.SpectacularRedocView",
+                             url_name='schema'),
          name='redoc'),
     path("token/", TokenObtainPairView.as_view(),
          name="token_obtain_pair"),
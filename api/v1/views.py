@@ -1,71 +1,193 @@
-from django.db.models import Prefetch
+from django.conf import settings
+from django.db.models import Prefetch, ProtectedError
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, permissions, filters
-from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from library import export, facets, suggest
 from library.models import Author, Book
-from .serializers import AuthorSerializer, BookSerializer
+from .bulk import save_authors, upsert_books
+from .cache import CachedResponseMixin
+from .conditional import ConditionalGetMixin
+from .envelope import IncludedAuthorsMixin
+from .fastpath import FastListMixin
+from .filters import CatalogueFilterBackend, FullTextSearchFilter
+from .multiget import MultiGetMixin
+from .pagination import KeysetPagination
+from .parsers import NDJSONParser
+from .replica import ReplicaReadMixin
+from .schema import StaticActionsMixin
+from .serializers import (
+    AuthorSerializer, BookSerializer, EXPAND_BOOKS_LIMIT, EXPANDED_BOOKS_ATTR,
+    ExportQuerySerializer, FacetQuerySerializer, FastAuthorSerializer,
+    FastBookSerializer, SuggestQuerySerializer, get_expand,
+)
+from .snapshot import SnapshotReadMixin
+from .sparse import SparseFieldsViewMixin
 
 
-class AuthorViewSet(viewsets.ModelViewSet):
+def get_bulk_rows(request):
+    rows = request.data
+    if not isinstance(rows, list):
+        raise ValidationError("Ожидается массив объектов или NDJSON.")
+    if len(rows) > settings.BULK_MAX_ROWS:
+        raise ValidationError(
+            f"Не больше {settings.BULK_MAX_ROWS} строк за запрос."
+        )
+    return rows
+
+
+class ProtectedConflict(APIException):
+    status_code = 409
+    default_detail = "Объект нельзя удалить: на него ссылаются книги."
+    default_code = "protected"
+
+
+def books_prefetch(lookup):
+    return Prefetch(
+        lookup,
+        queryset=Book.objects.only("id", "author_id", "title", "year")
+        .order_by("title", "id")[:EXPAND_BOOKS_LIMIT],
+        to_attr=EXPANDED_BOOKS_ATTR,
+    )
+
+
+class AuthorViewSet(MultiGetMixin, SnapshotReadMixin, ReplicaReadMixin,
+                    ConditionalGetMixin, CachedResponseMixin,
+                    SparseFieldsViewMixin, FastListMixin,
+                    StaticActionsMixin, viewsets.ModelViewSet):
     serializer_class = AuthorSerializer
+    fast_serializer_class = FastAuthorSerializer
+    pagination_class = KeysetPagination
+    snapshot_model = "author"
+
+    # Статистика автора (books_count, first_year, last_year) считается по
+    # книгам - запись книги тоже меняет ответ
+    cache_models = (Author, Book)
+
+    # РЕШЕНИЕ: Комбинация CatalogueFilterBackend + OrderingFilter +
+    # FullTextSearchFilter
+    # ПОЧЕМУ: CatalogueFilterBackend для диапазонов статистики,
+    # OrderingFilter для гибкой сортировки, FullTextSearchFilter для
+    # полнотекстового поиска по индексу. Поиск - последним, как у книг:
+    # иначе сортировка по умолчанию (ФИО) затирает сортировку по
+    # релевантности
+    filter_backends = [CatalogueFilterBackend, filters.OrderingFilter,
+                       FullTextSearchFilter]
 
-    # РЕШЕНИЕ: Комбинация SearchFilter + OrderingFilter
-    # ПОЧЕМУ: SearchFilter для полнотекстового поиска, OrderingFilter для гибкой сортировки
-    # Разделяем ответственность - каждый filter решает свою задачу
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    # РЕШЕНИЕ: Фильтры по денормализованной статистике (library.stats)
+    # ПОЧЕМУ: Колонки с индексами - "авторы с 10+ книгами" или "писавшие
+    # после 1900" не требуют GROUP BY по таблице книг
+    filterset_fields = {
+        "books_count": ["exact", "gte", "lte"],
+        "first_year": ["gte", "lte"],
+        "last_year": ["gte", "lte"],
+    }
 
     # РЕШЕНИЕ: Поиск по всем компонентам ФИО
     # ПОЧЕМУ: Пользователи могут искать "Лев", "Толстой" или "Николаевич"
-    # Порядок полей оптимизирован под созданные индексы БД
+    # Все они входят в Author.search_text; search_fields нужны для схемы
+    # и для СУБД без полнотекстового индекса
     search_fields = ["last_name", "first_name", "middle_name"]
 
     # РЕШЕНИЕ: Ограниченный набор полей для сортировки
     # ПОЧЕМУ: Предотвращаем сортировку по полям без индексов (bio, birth_date)
-    # Это защищает от медленных запросов при больших объемах данных
-    ordering_fields = ["last_name", "first_name"]
+    # Это защищает от медленных запросов при больших объемах данных.
+    # Поля статистики индексированы
+    ordering_fields = ["last_name", "first_name", "books_count",
+                       "first_year", "last_year"]
     ordering = ["last_name", "first_name"]
 
     def get_queryset(self):
         """
-        РЕШЕНИЕ: Prefetch с оптимизированным подзапросом для книг
+        РЕШЕНИЕ: Prefetch книг только при ?expand=books
         ПОЧЕМУ:
-        1. Избегаем N+1 запросов при обращении к author.books
-        2. Предварительно загружаем author для каждой книги (select_related)
-        3. Сортируем книги по title для консистентного порядка
-        4. Это критично при отображении авторов со списком их книг
-        """
-        return Author.objects.prefetch_related(
-            Prefetch(
-                "books",
-                queryset=Book.objects.select_related("author").order_by(
-                    "title")
-            )
-        )
+        1. AuthorSerializer по умолчанию не выводит книги - prefetch
+           был бы лишним запросом, результат которого выбрасывается
+        2. Раскрытые книги режутся до EXPAND_BOOKS_LIMIT на автора
+           прямо в SQL (оконная функция), а не в Python
+        3. select_related("author") в подзапросе не нужен - автор
+           уже известен, BookBriefSerializer его не выводит
+        """
+        # search_text нужен только индексу поиска - в ответ не попадает
+        queryset = Author.objects.defer("search_text")
+        if "books" in get_expand(self.request):
+            queryset = queryset.prefetch_related(books_prefetch("books"))
+        return queryset
+
+    def get_version_fields(self):
+        if "books" in get_expand(self.request):
+            return ("updated_at", "books__updated_at")
+        return ("updated_at",)
 
     def get_permissions(self):
-        if self.request.method in permissions.SAFE_METHODS:
+        # batch-get - POST только ради длинного списка id, по сути чтение
+        if self.request.method in permissions.SAFE_METHODS or \
+                self.action == "batch_get":
             return [permissions.AllowAny()]
         return [permissions.IsAdminUser()]
 
+    def perform_destroy(self, instance):
+        """
+        РЕШЕНИЕ: Автор с книгами (on_delete=PROTECT) - 409, а не 500
+        ПОЧЕМУ: Удаление не состоялось, в журнале изменений
+        (library.changes) надгробия нет - клиенту нужен понятный отказ
+        """
+        try:
+            instance.delete()
+        except ProtectedError as exc:
+            raise ProtectedConflict({
+                "detail": ProtectedConflict.default_detail,
+                "books": sorted(book.pk for book in exc.protected_objects),
+            })
+
+    @action(detail=False, methods=["post"],
+            parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """
+        Массовое создание/обновление авторов: строки с id обновляются,
+        без id - создаются. Ответ - счетчики и ошибки по номерам строк.
+        """
+        report = save_authors(get_bulk_rows(request))
+        return Response(report.as_dict())
+
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(MultiGetMixin, SnapshotReadMixin, ReplicaReadMixin,
+                  ConditionalGetMixin, CachedResponseMixin,
+                  IncludedAuthorsMixin, SparseFieldsViewMixin,
+                  FastListMixin, StaticActionsMixin,
+                  viewsets.ModelViewSet):
     serializer_class = BookSerializer
+    fast_serializer_class = FastBookSerializer
+    pagination_class = KeysetPagination
+    snapshot_model = "book"
+    snapshot_filters = {"author": "author_id", "year": "year"}
+
+    # Книга выводится вместе с автором - правка автора тоже меняет ответ
+    cache_models = (Book, Author)
+    version_fields = ("updated_at", "author__updated_at")
 
     # РЕШЕНИЕ: Три backend'а в определенном порядке
     # ПОЧЕМУ:
-    # 1. DjangoFilterBackend - точная фильтрация (author=1, year=1869)
+    # 1. CatalogueFilterBackend - точная фильтрация (author=1, year=1869)
     # 2. OrderingFilter - сортировка
-    # 3. SearchFilter - полнотекстовый поиск (обычно используется последним)
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter,
-                       filters.SearchFilter]
+    # 3. FullTextSearchFilter - полнотекстовый поиск (последним: без
+    #    ?ordering= он сортирует по релевантности)
+    filter_backends = [CatalogueFilterBackend, filters.OrderingFilter,
+                       FullTextSearchFilter]
 
     # РЕШЕНИЕ: Фильтрация только по индексированным полям
     # ПОЧЕМУ: author и year имеют составные индексы в БД
     # Это гарантирует быстрые запросы даже на миллионах записей
     filterset_fields = ["author", "year"]
 
-    # РЕШЕНИЕ: Поиск только по названию книги
-    # ПОЧЕМУ: title индексировано, поиск по preface был бы медленным
-    # Пользователи чаще всего ищут именно по названию
+    # РЕШЕНИЕ: Поиск по названию, предисловию и ФИО автора
+    # ПОЧЕМУ: Все три входят в Book.search_text под одним GIN/FTS5
+    # индексом, поэтому preface больше не делает поиск медленным.
+    # search_fields - запасной вариант для СУБД без полнотекстового индекса
     search_fields = ["title"]
 
     # РЕШЕНИЕ: Расширенные возможности сортировки включая связанные поля
@@ -85,9 +207,128 @@ class BookViewSet(viewsets.ModelViewSet):
         3. JOIN дешевле чем множественные SELECT
         4. Особенно критично при пагинации - 10 книг = 11 запросов без оптимизации
         """
-        return Book.objects.select_related("author")
+        queryset = Book.objects.select_related("author").defer(
+            "search_text", "author__search_text"
+        )
+        if "author.books" in get_expand(self.request):
+            queryset = queryset.prefetch_related(
+                books_prefetch("author__books")
+            )
+        return queryset
 
     def get_permissions(self):
-        if self.request.method in permissions.SAFE_METHODS:
+        # batch-get - POST только ради длинного списка id, по сути чтение
+        if self.request.method in permissions.SAFE_METHODS or \
+                self.action == "batch_get":
             return [permissions.AllowAny()]
         return [permissions.IsAdminUser()]
+
+    @action(detail=False, methods=["post"],
+            parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """
+        Массовый upsert книг по (author_id, title): существующая книга
+        автора с тем же названием обновляется, новая - создается.
+        """
+        report = upsert_books(get_bulk_rows(request))
+        return Response(report.as_dict())
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """
+        Полная выгрузка книг с авторами потоком (NDJSON или CSV, gzip по
+        желанию). Фильтры списка (author, year, search) применяются,
+        пагинация - нет: память не зависит от размера каталога.
+        """
+        params = ExportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        fmt = params.validated_data["output"]
+        compress = params.validated_data["gzip"]
+
+        queryset = self.filter_queryset(Book.objects.all())
+        filename = f"books.{fmt}"
+        content_type = export.FORMATS[fmt]
+        if compress:
+            filename += ".gz"
+            content_type = "application/gzip"
+
+        response = StreamingHttpResponse(
+            export.export(queryset, fmt=fmt, compress=compress),
+            content_type=content_type,
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=False, methods=["get"])
+    def facets(self, request):
+        """
+        Число книг по авторам, годам и десятилетиям при текущих ?search=
+        и фильтрах. Фасет не учитывает собственный фильтр: при ?year=1869
+        фасет годов показывает все годы, чтобы выбор можно было сменить.
+        """
+        return self.cached_response(self.get_facets, request)
+
+    def get_facets(self, request):
+        params = FacetQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        # Из query string MultipleChoiceField без ?facet= получает пустой
+        # список, а не default
+        wanted = params.validated_data["facet"] or set(facets.FACETS)
+
+        data = {}
+        if "author" in wanted:
+            data["author"] = facets.author_facet(
+                self.facet_queryset(request, "author"),
+                params.validated_data["limit"],
+            )
+        if wanted & {"year", "decade"}:
+            years = facets.year_facet(self.facet_queryset(request, "year"))
+            if "year" in wanted:
+                data["year"] = years
+            if "decade" in wanted:
+                data["decade"] = facets.decade_facet(years)
+        return Response(data)
+
+    def facet_queryset(self, request, field):
+        """
+        Книги под всеми фильтрами запроса, кроме field.
+        OrderingFilter не нужен - GROUP BY сортирует сам
+        """
+        query = request.query_params.copy()
+        query.pop(field, None)
+        queryset = Book.objects.all()
+        backend = CatalogueFilterBackend()
+        filterset = backend.get_filterset_class(self, queryset)(
+            data=query, queryset=queryset, request=request
+        )
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        return FullTextSearchFilter().filter_queryset(
+            request, filterset.qs, self
+        )
+
+
+class SuggestView(APIView):
+    """
+    РЕШЕНИЕ: Отдельный endpoint подсказок вместо ?search= в списке книг
+    ПОЧЕМУ:
+    1. Вызывается на каждое нажатие клавиши - только id и строка для
+       показа, без ModelSerializer, пагинации и COUNT(*)
+    2. Без аутентификации: каталог публичный, а JWT/сессия стоили бы
+       лишний запрос к БД на каждый символ
+    3. Поиск по pg_trgm индексу или по массиву в памяти (library.suggest)
+    """
+
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        params = SuggestQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        found = suggest.suggest(
+            params.validated_data["q"], params.validated_data["limit"]
+        )
+        return Response({
+            kind: [{"id": pk, "display": display} for pk, display in rows]
+            for kind, rows in found.items()
+        })
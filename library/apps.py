@@ -5,3 +5,6 @@ class LibraryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'library'
     verbose_name = 'Библиотека'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,77 @@
+"""
+Счетчики поколений каталога.
+
+РЕШЕНИЕ: Инвалидация кэша через номер поколения модели, а не удаление ключей
+ПОЧЕМУ:
+1. Ключ закэшированного ответа содержит текущие поколения Author/Book
+2. Любая запись увеличивает поколение - старые ключи просто перестают
+   запрашиваться и вытесняются по TTL/LRU самим backend'ом
+3. Инвалидация стоит O(1) и не требует сканирования ключей, которое
+   не поддерживают ни locmem, ни file, ни DB backend
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def get_cache():
+    return caches[settings.CATALOGUE_CACHE_ALIAS]
+
+
+def generation_key(model):
+    return f"catalogue:generation:{model._meta.label_lower}"
+
+
+def get_generations(*models):
+    """Возвращает кортеж текущих поколений в порядке переданных моделей"""
+    cache = get_cache()
+    keys = [generation_key(model) for model in models]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    for key in missing:
+        # РЕШЕНИЕ: Начальное значение - время в наносекундах, а не 0
+        # ПОЧЕМУ: Если счетчик вытеснили из кэша, нумерация не начнется
+        # заново и не совпадет с поколением старых закэшированных ответов
+        cache.add(key, time.time_ns(), timeout=None)
+    if missing:
+        found.update(cache.get_many(missing))
+    return tuple(found[key] for key in keys)
+
+
+RECENT_WRITE_KEY = "catalogue:recent-write"
+
+
+async def aget_generations(*models):
+    """get_generations для async views: DB/file-кэш нельзя звать из цикла"""
+    cache = get_cache()
+    keys = [generation_key(model) for model in models]
+    found = await cache.aget_many(keys)
+    missing = [key for key in keys if key not in found]
+    for key in missing:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+    if missing:
+        found.update(await cache.aget_many(missing))
+    return tuple(found[key] for key in keys)
+
+
+def bump_generation(model):
+    cache = get_cache()
+    key = generation_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+    if settings.DATABASE_REPLICAS:
+        # Пока ключ жив, каталог читается из основной БД (library.routers):
+        # иначе ответ с отстающей реплики закэшировался бы под новым
+        # поколением
+        cache.set(RECENT_WRITE_KEY, 1, settings.DB_REPLICA_LAG)
+
+
+def recently_written():
+    return get_cache().get(RECENT_WRITE_KEY) is not None
+
+
+async def arecently_written():
+    return await get_cache().aget(RECENT_WRITE_KEY) is not None
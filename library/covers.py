@@ -0,0 +1,224 @@
+"""
+Обложки книг: контентная адресация и превью.
+
+РЕШЕНИЕ: Оригинал хранится под sha256 содержимого, превью строятся в фоне
+ПОЧЕМУ:
+1. Список книг показывает миниатюры, а клиенты качали полный оригинал;
+   превью WebP/JPEG нужных ширин в разы легче
+2. Имя = хеш содержимого: повторная загрузка той же картинки не создает
+   второй файл, а имена превью детерминированы - повторная обработка
+   ничего не перезаписывает
+3. Декодирование и ресайз - сотни миллисекунд CPU; они идут в пуле
+   потоков после коммита, а не в потоке запроса. Pillow отпускает GIL
+   в resize/encode, поэтому потоки действительно работают параллельно
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.utils import timezone
+
+from .cache import bump_generation
+from .models import Book
+
+logger = logging.getLogger(__name__)
+
+ORIGINALS_DIR = "covers/sha256"
+VARIANTS_DIR = "covers/variants"
+
+# Формат превью -> (имя кодека Pillow, расширение, параметры save())
+ENCODERS = {
+    "webp": ("WEBP", "webp", {"method": 4}),
+    "jpeg": ("JPEG", "jpg", {"optimize": True, "progressive": True}),
+}
+
+
+def digest_file(file):
+    sha = hashlib.sha256()
+    for chunk in file.chunks():
+        sha.update(chunk)
+    file.seek(0)
+    return sha.hexdigest()
+
+
+def original_name(digest, filename):
+    extension = os.path.splitext(filename)[1].lower() or ".jpg"
+    return f"{ORIGINALS_DIR}/{digest[:2]}/{digest}{extension}"
+
+
+def save_once(name, content):
+    """
+    Запись по контентному имени: существующий файл не перезаписывается.
+    Если параллельный поток успел записать тот же файл, хранилище выдаст
+    имя с суффиксом - такую копию удаляем, содержимое ведь одинаковое.
+    """
+    if default_storage.exists(name):
+        return name
+    saved = default_storage.save(name, content)
+    if saved != name:
+        default_storage.delete(saved)
+    return name
+
+
+def store_original(file):
+    """
+    Сохраняет загруженный файл под именем из хеша содержимого и
+    возвращает это имя. Если такой файл уже есть - запись пропускается.
+    """
+    return save_once(original_name(digest_file(file), file.name), file)
+
+
+def variant_name(digest, width, fmt):
+    return f"{VARIANTS_DIR}/{digest[:2]}/{digest}/{width}.{ENCODERS[fmt][1]}"
+
+
+def open_image(data, max_width):
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(data))
+    # JPEG декодируется сразу в уменьшенном масштабе (1/2, 1/4, 1/8) -
+    # не распаковываем мегапиксели, которые ресайз все равно выбросит
+    if image.width > max_width:
+        height = max_width * image.height // image.width
+        image.draft("RGB", (max_width, height))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert(
+            "RGBA" if "transparency" in image.info else "RGB"
+        )
+    return image
+
+
+def flatten(image):
+    """JPEG без альфа-канала: прозрачность на белом фоне"""
+    from PIL import Image
+
+    if image.mode != "RGBA":
+        return image
+    background = Image.new("RGB", image.size, "white")
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+def render_variants(data, digest, sizes=None, formats=None):
+    """
+    Строит превью и возвращает {формат: {ширина: путь}}.
+    Ширина больше оригинала не увеличивается - берется оригинал.
+    """
+    from PIL import Image
+
+    sizes = sorted(sizes or settings.COVER_SIZES, reverse=True)
+    formats = formats or settings.COVER_FORMATS
+    variants = {fmt: {} for fmt in formats}
+
+    image = open_image(data, sizes[0])
+    # От большей ширины к меньшей: каждое превью уменьшается из
+    # предыдущего, а не из оригинала
+    source = image
+    for width in sizes:
+        if width < source.width:
+            height = max(1, round(source.height * width / source.width))
+            source = source.resize(
+                (width, height), Image.Resampling.LANCZOS, reducing_gap=3.0
+            )
+        for fmt in formats:
+            codec, _, options = ENCODERS[fmt]
+            name = variant_name(digest, width, fmt)
+            if not default_storage.exists(name):
+                frame = flatten(source) if codec == "JPEG" else source
+                buffer = io.BytesIO()
+                frame.save(
+                    buffer, codec, quality=settings.COVER_QUALITY, **options
+                )
+                save_once(name, ContentFile(buffer.getvalue()))
+            variants[fmt][str(width)] = name
+    return {
+        fmt: dict(sorted(names.items(), key=lambda item: int(item[0])))
+        for fmt, names in variants.items()
+    }
+
+
+def process_cover(name):
+    """
+    Строит превью файла обложки и записывает их всем книгам с этой
+    обложкой. Возвращает число обновленных книг.
+    """
+    with default_storage.open(name, "rb") as file:
+        data = file.read()
+    digest = hashlib.sha256(data).hexdigest()
+    variants = render_variants(data, digest)
+    # updated_at меняем явно: update() не трогает auto_now, а от него
+    # зависят ETag и Last-Modified списков
+    updated = Book.objects.filter(cover=name).update(
+        cover_variants=variants, updated_at=timezone.now()
+    )
+    if updated:
+        bump_generation(Book)
+    return updated
+
+
+_executor = None
+_executor_lock = threading.Lock()
+# Файлы, поставленные в очередь: одинаковая обложка у нескольких книг
+# обрабатывается один раз (process_cover обновляет все книги сразу)
+_pending = set()
+
+
+def process_in_worker(name):
+    try:
+        return process_cover(name)
+    except Exception:
+        logger.exception("Не удалось построить превью обложки %s", name)
+    finally:
+        with _executor_lock:
+            _pending.discard(name)
+        # У потока пула свои соединения с БД - не держим их открытыми
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.COVER_WORKERS,
+                    thread_name_prefix="covers",
+                )
+    return _executor
+
+
+def schedule(name):
+    executor = get_executor()
+    with _executor_lock:
+        if name in _pending:
+            return None
+        _pending.add(name)
+    return executor.submit(process_in_worker, name)
+
+
+def media_url(name, request=None):
+    """
+    URL файла от MEDIA_BASE_URL (CDN), если он задан; иначе URL хранилища,
+    абсолютный при наличии запроса
+    """
+    base = settings.MEDIA_BASE_URL
+    if base:
+        return f"{base.rstrip('/')}/{name}"
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def srcset(variants, request=None):
+    """{формат: {ширина: путь}} -> {формат: {ширина: URL}}"""
+    return {
+        fmt: {width: media_url(name, request) for width, name in sizes.items()}
+        for fmt, sizes in (variants or {}).items()
+    }
@@ -0,0 +1,512 @@
+"""
+Потоковая загрузка каталога: фикстура Django (JSON), NDJSON и CSV.
+
+РЕШЕНИЕ: Чтение потоком + пачки bulk_create/COPY без сигналов и индексов
+ПОЧЕМУ:
+1. loaddata читает фикстуру целиком и сохраняет объекты по одному с
+   сигналами и проверкой ограничений - на миллионах строк это часы
+2. Файл читается по блокам: JSON-массив разбирается объект за объектом
+   (raw_decode), NDJSON и CSV - построчно; в памяти одна пачка
+3. Вторичные индексы (Meta.indexes), поисковый индекс и триггеры
+   статистики снимаются на время загрузки: построить индекс по готовой
+   таблице дешевле, чем обновлять его на каждую строку. Поисковые
+   документы считаются в Python, статистика - одним пересчетом в конце
+4. PostgreSQL: COPY во временную таблицу + INSERT ... SELECT (с ON
+   CONFLICT DO NOTHING по желанию) - в разы быстрее многострочного INSERT
+5. Книги делятся между процессами по author_id: книги одного автора
+   пишет один процесс, конфликты unique_author_title не пересекаются
+"""
+import csv
+import gzip
+import io
+import json
+import multiprocessing
+import queue
+import sys
+from contextlib import contextmanager
+
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.db import connection, connections, models, transaction
+
+from .changes import (
+    install_change_triggers, record_reset, uninstall_change_triggers,
+)
+from .models import Author, Book
+from .search import (
+    author_document, book_document, install_search_indexes, rebuild_fts5,
+    uninstall_search_indexes,
+)
+from .stats import install_stats_triggers, uninstall_stats_triggers
+
+FORMATS = ("json", "ndjson", "csv")
+
+READ_BLOCK = 1 << 16
+
+AUTHOR_FIELDS = ("id", "last_name", "first_name", "middle_name",
+                 "birth_date", "bio")
+BOOK_FIELDS = ("id", "author_id", "title", "year", "preface", "cover")
+
+# Колонки выгрузки (library.export) с данными автора книги
+EXPORT_AUTHOR_COLUMNS = {
+    "author_id": "id",
+    "author_last_name": "last_name",
+    "author_first_name": "first_name",
+    "author_middle_name": "middle_name",
+    "author_birth_date": "birth_date",
+}
+
+
+class CatalogueImportError(Exception):
+    """Ошибка данных или загрузки с указанием места в файле"""
+
+
+def detect_format(path):
+    name = path.lower().removesuffix(".gz")
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    for fmt in FORMATS:
+        if name.endswith("." + fmt):
+            return fmt
+    return None
+
+
+def open_source(path):
+    """Текстовый поток: файл, file.gz или '-' (stdin)"""
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def json_array(stream):
+    """Объекты JSON-массива по одному, без чтения файла целиком"""
+    decoder = json.JSONDecoder()
+    buffer, position, eof = "", 0, False
+    started = False
+
+    while True:
+        # Между элементами - пробелы и запятые
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != "[":
+                    raise CatalogueImportError(
+                        "Ожидается JSON-массив объектов"
+                    )
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                value, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as exc:
+                if eof:
+                    raise CatalogueImportError(
+                        f"Неверный JSON: {exc}"
+                    ) from exc
+            else:
+                yield value
+                continue
+        elif eof:
+            raise CatalogueImportError("JSON-массив не закрыт")
+        # Буфер кончился или объект обрезан границей блока - дочитываем
+        block = stream.read(READ_BLOCK)
+        eof = not block
+        buffer, position = buffer[position:] + block, 0
+
+
+def ndjson_records(stream):
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise CatalogueImportError(f"Строка {number}: {exc}") from exc
+
+
+def read_records(stream, fmt):
+    if fmt == "json":
+        return json_array(stream)
+    if fmt == "ndjson":
+        return ndjson_records(stream)
+    return csv.DictReader(stream)
+
+
+def split_record(record):
+    """
+    Запись любого формата -> (автор или None, книга или None).
+    Понимает объекты фикстуры {"model", "pk", "fields"}, строки выгрузки
+    книг (library.export, с колонками author_*) и плоские строки авторов
+    """
+    if "model" in record and "fields" in record:
+        fields = dict(record["fields"])
+        fields["id"] = record.get("pk")
+        model = record["model"].lower()
+        if model == "library.author":
+            return fields, None
+        if model == "library.book":
+            fields["author_id"] = fields.pop("author", None)
+            return None, fields
+        return None, None
+    if "title" in record:
+        author = None
+        if record.get("author_last_name"):
+            author = {
+                field: record.get(column)
+                for column, field in EXPORT_AUTHOR_COLUMNS.items()
+            }
+        return author, record
+    if "last_name" in record:
+        return record, None
+    return None, None
+
+
+def clean(model, row, names):
+    """Строка (значения из CSV - строки) -> значения полей модели"""
+    data = {}
+    for name in names:
+        field = model._meta.get_field(name)
+        value = row.get(name)
+        if value is None or value == "":
+            if name == "id":
+                continue
+            value = None if field.null else field.get_default()
+        else:
+            value = field.to_python(value)
+        data[field.attname] = value
+    return data
+
+
+def build_authors(rows):
+    authors = []
+    for row in rows:
+        author = Author(**row)
+        author.search_text = author_document(author)
+        authors.append(author)
+    return authors
+
+
+def build_books(rows, names):
+    """names: author_id -> ФИО для поискового документа"""
+    missing = {
+        row["author_id"] for row in rows if row["author_id"] not in names
+    }
+    if missing:
+        # Автор загружен раньше или другим процессом
+        names = {**names, **{
+            author.pk: author.full_name
+            for author in Author.objects.only(
+                "id", "last_name", "first_name", "middle_name"
+            ).filter(pk__in=missing)
+        }}
+    books = []
+    for row in rows:
+        book = Book(**row)
+        book.search_text = book_document(book, names.get(book.author_id))
+        books.append(book)
+    return books
+
+
+def copy_supported():
+    return connection.vendor == "postgresql"
+
+
+def copy_insert(model, objs, ignore_conflicts=False):
+    """
+    COPY во временную таблицу и INSERT ... SELECT в основную.
+    Возвращает число вставленных строк
+    """
+    opts = model._meta
+    fields = [field for field in opts.concrete_fields]
+    columns = ", ".join(connection.ops.quote_name(f.column) for f in fields)
+    table = connection.ops.quote_name(opts.db_table)
+    staging = connection.ops.quote_name(f"{opts.db_table}_import")
+
+    buffer = io.StringIO()
+    # QUOTE_NONNUMERIC: None - пустое поле без кавычек (NULL в COPY CSV),
+    # пустая строка - "" (пустая строка)
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    for obj in objs:
+        row = []
+        for field in fields:
+            value = field.pre_save(obj, add=True)
+            if isinstance(field, models.JSONField):
+                value = json.dumps(value, cls=field.encoder)
+            else:
+                value = field.get_db_prep_save(value, connection)
+                if value is not None and not isinstance(value, (int, float)):
+                    value = str(value)
+            row.append(value)
+        writer.writerow(row)
+    buffer.seek(0)
+
+    pk = opts.pk.column
+    select = ", ".join(
+        f"COALESCE({connection.ops.quote_name(pk)}, "
+        f"nextval(pg_get_serial_sequence('{opts.db_table}', '{pk}')))"
+        if field.column == pk else connection.ops.quote_name(field.column)
+        for field in fields
+    )
+    conflict = " ON CONFLICT DO NOTHING" if ignore_conflicts else ""
+    copy = f"COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)"
+    with connection.cursor() as cursor:
+        # CREATE TABLE AS не копирует NOT NULL: id без значения допустим.
+        # Строки временной таблицы живут до конца транзакции пачки
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {staging} ON COMMIT DELETE ROWS "
+            f"AS SELECT {columns} FROM {table} WITH NO DATA"
+        )
+        raw = cursor.cursor
+        if hasattr(raw, "copy_expert"):  # psycopg2
+            raw.copy_expert(copy, buffer)
+        else:  # psycopg 3
+            with raw.copy(copy) as stream:
+                stream.write(buffer.getvalue())
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) "
+            f"SELECT {select} FROM {staging}{conflict}"
+        )
+        inserted = cursor.rowcount
+    return inserted
+
+
+def insert(model, objs, ignore_conflicts=False, use_copy=True):
+    if not objs:
+        return 0
+    with transaction.atomic():
+        if use_copy and copy_supported():
+            return copy_insert(model, objs, ignore_conflicts)
+        model.objects.bulk_create(objs, ignore_conflicts=ignore_conflicts)
+        return len(objs)
+
+
+@contextmanager
+def deferred_indexes(enabled=True):
+    """
+    Снимает Meta.indexes, поисковый индекс, триггеры статистики и
+    журнала изменений, потом строит их заново по заполненным таблицам.
+    Возвращает также при ошибке: каталог не должен остаться без индексов.
+    Вместо записи журнала на каждую строку - одна запись сброса
+    (library.changes): клиентам ленты все равно перечитывать каталог
+    """
+    if not enabled:
+        yield
+        return
+    indexed = [(model, model._meta.indexes) for model in (Author, Book)]
+    uninstall_stats_triggers(connection)
+    uninstall_search_indexes(connection)
+    uninstall_change_triggers(connection)
+    with connection.schema_editor() as editor:
+        for model, indexes in indexed:
+            for index in indexes:
+                editor.remove_index(model, index)
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for model, indexes in indexed:
+                for index in indexes:
+                    editor.add_index(model, index)
+        install_search_indexes(connection)
+        rebuild_fts5(connection)
+        install_stats_triggers(connection)
+        install_change_triggers(connection)
+        record_reset()
+
+
+def reset_sequences():
+    """После вставки с явными id автоинкремент должен продолжиться за ними"""
+    statements = connection.ops.sequence_reset_sql(no_style(), [Author, Book])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def book_worker(tasks, results, ignore_conflicts, use_copy):
+    """
+    Процесс загрузки книг: пачки из очереди до None. Соединение родитель
+    закрыл перед fork - процесс открывает свое
+    """
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            rows, names = task
+            books = build_books(rows, names)
+            results.put(("books", len(rows),
+                         insert(Book, books, ignore_conflicts, use_copy)))
+    except Exception as exc:
+        results.put(("error", f"{type(exc).__name__}: {exc}", 0))
+    finally:
+        connections.close_all()
+
+
+class CatalogueImporter:
+    """
+    Читает записи, пишет авторов пачками в основном процессе, книги -
+    в основном процессе (workers=1) или в процессах по author_id.
+    progress(stats) вызывается после каждой пачки
+    """
+
+    def __init__(self, chunk_size=5000, workers=1, ignore_conflicts=False,
+                 use_copy=True, progress=None):
+        self.chunk_size = chunk_size
+        # SQLite не переносит параллельную запись
+        self.workers = 1 if connection.vendor == "sqlite" else max(1, workers)
+        self.ignore_conflicts = ignore_conflicts
+        self.use_copy = use_copy
+        self.progress = progress or (lambda stats: None)
+        self.stats = {"read": 0, "authors": 0, "books": 0, "skipped": 0}
+        # ФИО авторов из этого файла - для поисковых документов книг
+        self.names = {}
+        self.seen_authors = set()
+        self.pending_authors = []
+        self.pending_books = [[] for _ in range(self.workers)]
+
+    def run(self, records):
+        self.start_workers()
+        try:
+            for number, record in enumerate(records, 1):
+                self.stats["read"] = number
+                try:
+                    self.add(record)
+                except (ValueError, TypeError, KeyError,
+                        ValidationError) as exc:
+                    raise CatalogueImportError(
+                        f"Запись {number}: {exc}"
+                    ) from exc
+            self.flush_authors()
+            for partition in range(self.workers):
+                self.flush_books(partition)
+            self.stop_workers()
+        except BaseException:
+            self.stop_workers(abort=True)
+            raise
+        reset_sequences()
+        return self.stats
+
+    def add(self, record):
+        author, book = split_record(record)
+        if author is None and book is None:
+            self.stats["skipped"] += 1
+            return
+        if author is not None:
+            author = clean(Author, author, AUTHOR_FIELDS)
+            author_id = author.get("id")
+            # В выгрузке книг автор повторяется в каждой строке
+            if author_id is None or author_id not in self.seen_authors:
+                if author_id is not None:
+                    self.seen_authors.add(author_id)
+                self.pending_authors.append(author)
+                if len(self.pending_authors) >= self.chunk_size:
+                    self.flush_authors()
+        if book is not None:
+            book = clean(Book, book, BOOK_FIELDS)
+            partition = book["author_id"] % self.workers
+            self.pending_books[partition].append(book)
+            if len(self.pending_books[partition]) >= self.chunk_size:
+                self.flush_books(partition)
+
+    def flush_authors(self):
+        if not self.pending_authors:
+            return
+        authors = build_authors(self.pending_authors)
+        self.stats["authors"] += insert(
+            Author, authors, self.ignore_conflicts, self.use_copy
+        )
+        for author in authors:
+            if author.pk is not None:
+                self.names[author.pk] = author.full_name
+        self.pending_authors = []
+        self.progress(self.stats)
+
+    def flush_books(self, partition):
+        rows = self.pending_books[partition]
+        if not rows:
+            return
+        # Авторы пачки должны быть в БД раньше книг (FK)
+        self.flush_authors()
+        self.pending_books[partition] = []
+        names = {
+            row["author_id"]: self.names[row["author_id"]]
+            for row in rows if row["author_id"] in self.names
+        }
+        if self.workers == 1:
+            self.stats["books"] += insert(
+                Book, build_books(rows, names),
+                self.ignore_conflicts, self.use_copy,
+            )
+        else:
+            self.send(partition, (rows, names))
+            self.collect(block=False)
+        self.progress(self.stats)
+
+    def start_workers(self):
+        self.processes = []
+        if self.workers == 1:
+            return
+        context = multiprocessing.get_context("fork")
+        # Ограниченные очереди: чтение файла не убегает вперед записи
+        self.tasks = [context.Queue(maxsize=2) for _ in range(self.workers)]
+        self.results = context.Queue()
+        # Дочерние процессы не должны унаследовать открытое соединение
+        connections.close_all()
+        for tasks in self.tasks:
+            process = context.Process(
+                target=book_worker,
+                args=(tasks, self.results, self.ignore_conflicts,
+                      self.use_copy),
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+
+    def send(self, partition, task):
+        while True:
+            try:
+                self.tasks[partition].put(task, timeout=1)
+                return
+            except queue.Full:
+                self.collect(block=False)
+                if not self.processes[partition].is_alive():
+                    raise CatalogueImportError(
+                        "Процесс загрузки книг завершился"
+                    )
+
+    def collect(self, block):
+        while True:
+            try:
+                kind, value, inserted = self.results.get(
+                    block=block, timeout=1 if block else None
+                )
+            except queue.Empty:
+                return
+            if kind == "error":
+                raise CatalogueImportError(value)
+            self.stats["books"] += inserted
+
+    def stop_workers(self, abort=False):
+        for process, tasks in zip(self.processes, getattr(self, "tasks", [])):
+            if abort:
+                process.terminate()
+            else:
+                tasks.put(None)
+        running = list(self.processes)
+        while running and not abort:
+            self.collect(block=True)
+            running = [p for p in running if p.is_alive()]
+        for process in self.processes:
+            process.join()
+        if not abort and self.processes:
+            # Результаты последних пачек могли прийти после выхода процессов
+            self.collect(block=False)
+            self.progress(self.stats)
+        self.processes = []
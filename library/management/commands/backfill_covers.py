@@ -0,0 +1,60 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from library.covers import process_cover
+from library.models import Book
+
+
+def process(name):
+    try:
+        return name, process_cover(name), None
+    except Exception as exc:
+        return name, 0, exc
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Строит превью существующих обложек (COVER_SIZES x COVER_FORMATS) "
+        "в несколько потоков"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 1,
+            help="Потоков обработки (по умолчанию - число CPU)",
+        )
+        parser.add_argument(
+            "--force", action="store_true",
+            help="Перестроить и обложки, у которых превью уже есть",
+        )
+
+    def handle(self, *args, **options):
+        books = Book.objects.exclude(cover="").exclude(cover__isnull=True)
+        if not options["force"]:
+            books = books.filter(cover_variants={})
+        # Одна обложка у нескольких книг обрабатывается один раз
+        names = list(
+            books.order_by().values_list("cover", flat=True).distinct()
+        )
+
+        processed = failed = updated = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            for name, count, error in pool.map(process, names):
+                if error is not None:
+                    failed += 1
+                    self.stderr.write(f"{name}: {error}")
+                    continue
+                processed += 1
+                updated += count
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"{name}: книг {count}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Обложек обработано: {processed}, с ошибками: {failed}, "
+            f"книг обновлено: {updated}"
+        ))
@@ -0,0 +1,67 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from library.cache import get_generations
+from library.snapshot import MODELS, Snapshot, build_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Собирает снимок каталога для чтения через mmap (library.snapshot). "
+        "С --watch пересобирает его при каждом изменении каталога"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path", default=settings.CATALOGUE_SNAPSHOT_PATH,
+            help="Файл снимка (по умолчанию CATALOGUE_SNAPSHOT_PATH)",
+        )
+        parser.add_argument(
+            "--watch", action="store_true",
+            help="Не завершаться: проверять поколения каталога раз в "
+                 "--interval секунд и пересобирать устаревший снимок",
+        )
+        parser.add_argument(
+            "--interval", type=float,
+            default=settings.CATALOGUE_SNAPSHOT_INTERVAL,
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not path:
+            raise CommandError(
+                "Не задан файл снимка: --path или CATALOGUE_SNAPSHOT_PATH"
+            )
+        if not options["watch"]:
+            self.build(path, options["verbosity"])
+            return
+
+        built = self.current_generations(path)
+        while True:
+            if built != get_generations(*MODELS.values()):
+                built = self.build(path, options["verbosity"])
+            time.sleep(options["interval"])
+
+    def current_generations(self, path):
+        try:
+            return Snapshot(path).generations
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def build(self, path, verbosity):
+        started = time.perf_counter()
+        header = build_snapshot(path)
+        if verbosity:
+            rows = ", ".join(
+                f"{model} {meta['rows']:,}"
+                for model, meta in header["tables"].items()
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"Снимок {path}: {rows}; "
+                f"{os.path.getsize(path) / 2**20:.1f} МБ за "
+                f"{time.perf_counter() - started:.1f} с"
+            ))
+        return tuple(header["generations"])
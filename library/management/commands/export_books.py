@@ -0,0 +1,38 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from library.export import DEFAULT_CHUNK_SIZE, FORMATS, export
+
+
+class Command(BaseCommand):
+    help = "Потоковая выгрузка всех книг с данными авторов в NDJSON или CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format", choices=sorted(FORMATS), default="ndjson",
+            dest="fmt",
+        )
+        parser.add_argument(
+            "--output", "-o",
+            help="Файл для записи (по умолчанию stdout)",
+        )
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument(
+            "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        stream = export(
+            fmt=options["fmt"],
+            compress=options["gzip"],
+            chunk_size=options["chunk_size"],
+        )
+        if options["output"]:
+            with open(options["output"], "wb") as output:
+                for block in stream:
+                    output.write(block)
+        else:
+            for block in stream:
+                sys.stdout.buffer.write(block)
+            sys.stdout.buffer.flush()
@@ -0,0 +1,113 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from library.cache import bump_generation
+from library.importer import (
+    FORMATS, CatalogueImportError, CatalogueImporter, copy_supported,
+    deferred_indexes, detect_format, open_source, read_records,
+)
+from library.models import Author, Book
+from library.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Потоковый импорт авторов и книг из фикстуры Django (JSON), NDJSON "
+        "или CSV (формат library.export): пачки bulk_create/COPY, индексы "
+        "строятся после загрузки, книги - в нескольких процессах"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", help="Файл (можно .gz) или '-' для stdin",
+        )
+        parser.add_argument(
+            "--format", choices=FORMATS, dest="fmt",
+            help="По умолчанию - по расширению файла",
+        )
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 1,
+            help="Процессов загрузки книг (на SQLite всегда 1)",
+        )
+        parser.add_argument(
+            "--ignore-conflicts", action="store_true",
+            help="Пропускать строки с занятым id или (автор, название)",
+        )
+        parser.add_argument(
+            "--no-copy", action="store_false", dest="use_copy",
+            help="bulk_create вместо COPY на PostgreSQL",
+        )
+        parser.add_argument(
+            "--keep-indexes", action="store_false", dest="defer_indexes",
+            help="Не снимать индексы на время загрузки (для небольшой "
+                 "дозагрузки в большой каталог)",
+        )
+
+    def handle(self, *args, **options):
+        fmt = options["fmt"] or detect_format(options["path"])
+        if fmt is None:
+            raise CommandError(
+                "Не удалось определить формат, укажите --format"
+            )
+        self.verbosity = options["verbosity"]
+        self.started = time.perf_counter()
+
+        importer = CatalogueImporter(
+            chunk_size=options["chunk_size"],
+            workers=options["workers"],
+            ignore_conflicts=options["ignore_conflicts"],
+            use_copy=options["use_copy"],
+            progress=self.progress,
+        )
+        mode = "COPY" if options["use_copy"] and copy_supported() \
+            else "bulk_create"
+        if self.verbosity:
+            self.stdout.write(
+                f"Импорт {fmt}: {mode}, процессов книг: {importer.workers}"
+            )
+
+        try:
+            with open_source(options["path"]) as stream, \
+                    deferred_indexes(options["defer_indexes"]):
+                stats = importer.run(read_records(stream, fmt))
+                if self.verbosity:
+                    self.stdout.write("\nПостроение индексов...")
+        except (CatalogueImportError, OSError) as exc:
+            raise CommandError(str(exc)) from exc
+        except IntegrityError as exc:
+            raise CommandError(
+                f"{exc}. Записи уже есть в базе? См. --ignore-conflicts"
+            ) from exc
+        loaded = time.perf_counter() - self.started
+
+        if self.verbosity:
+            self.stdout.write("Пересчет статистики авторов...")
+        reconcile(workers=importer.workers)
+        bump_generation(Author)
+        bump_generation(Book)
+
+        elapsed = time.perf_counter() - self.started
+        written = stats["authors"] + stats["books"]
+        self.stdout.write(self.style.SUCCESS(
+            f"Записей прочитано: {stats['read']:,}, авторов: "
+            f"{stats['authors']:,}, книг: {stats['books']:,}, пропущено "
+            f"записей других моделей: {stats['skipped']:,}. Загрузка "
+            f"{loaded:.1f} с ({written / loaded if loaded else 0:,.0f} "
+            f"строк/с), всего с индексами {elapsed:.1f} с"
+        ))
+
+    def progress(self, stats):
+        if self.verbosity < 1:
+            return
+        elapsed = time.perf_counter() - self.started
+        written = stats["authors"] + stats["books"]
+        self.stdout.write(
+            f"\rпрочитано {stats['read']:,}, авторов {stats['authors']:,}, "
+            f"книг {stats['books']:,} ({written / elapsed:,.0f} строк/с)",
+            ending="",
+        )
+        self.stdout.flush()
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from library.changes import prune
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет из журнала изменений записи старше --days дней. Клиенты "
+        "ленты с более старым курсором получат 410 и перечитают каталог"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.CHANGES_RETENTION_DAYS,
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options["days"])
+        deleted = prune(before)
+        self.stdout.write(self.style.SUCCESS(
+            f"Удалено записей журнала: {deleted:,}"
+        ))
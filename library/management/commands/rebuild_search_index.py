@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from library.models import Author, Book
+from library.search import (
+    author_document, book_document, install_search_indexes, rebuild_fts5,
+)
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает поисковые документы авторов и книг и индексы поиска"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        with transaction.atomic():
+            # Храним только ФИО, а не объекты - на миллионах авторов
+            # это заметная разница в памяти
+            names = {}
+            batch = []
+            for author in Author.objects.iterator(chunk_size=batch_size):
+                author.search_text = author_document(author)
+                names[author.pk] = author.full_name
+                batch.append(author)
+                if len(batch) >= batch_size:
+                    Author.objects.bulk_update(batch, ["search_text"])
+                    batch = []
+            Author.objects.bulk_update(batch, ["search_text"])
+
+            batch = []
+            total = 0
+            books = Book.objects.only("id", "author_id", "title", "preface")
+            for book in books.iterator(chunk_size=batch_size):
+                book.search_text = book_document(
+                    book, names.get(book.author_id)
+                )
+                batch.append(book)
+                if len(batch) >= batch_size:
+                    Book.objects.bulk_update(batch, ["search_text"])
+                    total += len(batch)
+                    batch = []
+            Book.objects.bulk_update(batch, ["search_text"])
+            total += len(batch)
+
+            install_search_indexes(connection)
+            rebuild_fts5(connection)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Обновлено авторов: {len(names)}, книг: {total}"
+        ))
@@ -0,0 +1,50 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from library.cache import bump_generation
+from library.models import Author
+from library.stats import install_stats_triggers, reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет статистику авторов (books_count, first_year, last_year) "
+        "с таблицей книг и исправляет расхождения диапазонами id в "
+        "несколько потоков"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 1,
+            help="Потоков пересчета (по умолчанию - число CPU; "
+                 "на SQLite всегда 1)",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=10000,
+            help="Авторов (диапазон id) на одну транзакцию",
+        )
+
+    def handle(self, *args, **options):
+        # Триггеры могли пропасть (ручной ALTER, восстановление из дампа
+        # без них) - без них расхождение появится снова
+        install_stats_triggers(connection)
+
+        def progress(done, total, checked, fixed):
+            if options["verbosity"] > 1:
+                self.stdout.write(
+                    f"{done}/{total}: проверено {checked}, исправлено {fixed}"
+                )
+
+        checked, fixed = reconcile(
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+            progress=progress,
+        )
+        if fixed:
+            bump_generation(Author)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Авторов проверено: {checked}, исправлено: {fixed}"
+        ))
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:10
+
+from django.db import migrations, models
+
+from library.search import (
+    install_search_indexes, normalize, rebuild_fts5, uninstall_search_indexes,
+)
+
+
+def full_name(author):
+    # Исторические модели не имеют свойства Author.full_name
+    return " ".join(
+        filter(None, (author.last_name, author.first_name, author.middle_name))
+    )
+
+
+def fill_search_text(apps, schema_editor):
+    Author = apps.get_model("library", "Author")
+    Book = apps.get_model("library", "Book")
+
+    names = {}
+    authors = list(Author.objects.all())
+    for author in authors:
+        names[author.pk] = full_name(author)
+        author.search_text = normalize(names[author.pk])
+    Author.objects.bulk_update(authors, ["search_text"], batch_size=1000)
+
+    batch = []
+    for book in Book.objects.iterator(chunk_size=1000):
+        parts = (book.title, names.get(book.author_id), book.preface)
+        book.search_text = normalize(" ".join(filter(None, parts)))
+        batch.append(book)
+        if len(batch) >= 1000:
+            Book.objects.bulk_update(batch, ["search_text"])
+            batch = []
+    Book.objects.bulk_update(batch, ["search_text"])
+
+
+def install(apps, schema_editor):
+    install_search_indexes(schema_editor.connection)
+    rebuild_fts5(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    uninstall_search_indexes(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0003_author_updated_at_book_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='search_text',
+            field=models.TextField(blank=True, editable=False, verbose_name='Поисковый документ'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='search_text',
+            field=models.TextField(blank=True, editable=False, verbose_name='Поисковый документ'),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(install, uninstall),
+    ]
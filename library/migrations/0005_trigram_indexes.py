@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from library.suggest import install_trigram_indexes, uninstall_trigram_indexes
+
+
+def install(apps, schema_editor):
+    install_trigram_indexes(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    uninstall_trigram_indexes(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0004_search_text'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:36
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+from library.stats import install_stats_triggers, uninstall_stats_triggers
+
+
+def fill_stats(apps, schema_editor):
+    Author = apps.get_model("library", "Author")
+    Book = apps.get_model("library", "Book")
+
+    stats = {
+        row["author_id"]: row
+        for row in Book.objects.order_by().values("author_id").annotate(
+            count=Count("id"), first=Min("year"), last=Max("year"),
+        )
+    }
+    authors = list(Author.objects.filter(pk__in=stats))
+    for author in authors:
+        row = stats[author.pk]
+        author.books_count = row["count"]
+        author.first_year = row["first"]
+        author.last_year = row["last"]
+    Author.objects.bulk_update(
+        authors, ["books_count", "first_year", "last_year"], batch_size=1000
+    )
+
+
+def install(apps, schema_editor):
+    install_stats_triggers(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    uninstall_stats_triggers(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0006_book_cover_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='books_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Книг'),
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='first_year',
+            field=models.PositiveSmallIntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Первая книга'),
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='last_year',
+            field=models.PositiveSmallIntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Последняя книга'),
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+        migrations.RunPython(install, uninstall),
+    ]
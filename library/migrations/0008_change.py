@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:03
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+from library.changes import install_change_triggers, uninstall_change_triggers
+
+
+def install(apps, schema_editor):
+    install_change_triggers(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    uninstall_change_triggers(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0007_author_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False, verbose_name='Номер')),
+                ('model', models.CharField(blank=True, max_length=10, verbose_name='Модель')),
+                ('object_id', models.BigIntegerField(blank=True, null=True, verbose_name='ID объекта')),
+                ('action', models.CharField(choices=[('insert', 'Создание'), ('update', 'Изменение'), ('delete', 'Удаление'), ('reset', 'Сброс')], max_length=6, verbose_name='Действие')),
+                ('created_at', models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), verbose_name='Время')),
+            ],
+            options={
+                'verbose_name': 'Изменение',
+                'verbose_name_plural': 'Журнал изменений',
+                'ordering': ['seq'],
+                'indexes': [models.Index(fields=['created_at'], name='change_created_idx')],
+            },
+        ),
+        migrations.RunPython(install, uninstall),
+    ]
@@ -1,4 +1,8 @@
 from django.db import models
+from django.db.models.functions import Now
+
+# Колонки статистики автора, которые ведут триггеры (library.stats)
+STATS_FIELDS = ("books_count", "first_year", "last_year")
 
 
 class Author(models.Model):
@@ -28,6 +32,40 @@ class Author(models.Model):
         blank=True,
         verbose_name="Биография"
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,  # РЕШЕНИЕ: Индекс для MAX(updated_at)
+        # ПОЧЕМУ: ETag/Last-Modified списков считаются агрегатом по нему
+        verbose_name="Изменен"
+    )
+    search_text = models.TextField(
+        blank=True,
+        editable=False,  # РЕШЕНИЕ: Поисковый документ, см. library.search
+        # ПОЧЕМУ: Заполняется сигналом pre_save, руками не редактируется
+        verbose_name="Поисковый документ"
+    )
+    books_count = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        editable=False,  # РЕШЕНИЕ: Денормализованная статистика, см. library.stats
+        # ПОЧЕМУ: Поддерживается триггерами СУБД на library_book -
+        # фильтр и сортировка по ней идут по индексу, без GROUP BY
+        verbose_name="Книг"
+    )
+    first_year = models.PositiveSmallIntegerField(
+        null=True,  # NULL - у автора нет книг
+        blank=True,
+        db_index=True,
+        editable=False,
+        verbose_name="Первая книга"
+    )
+    last_year = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        db_index=True,
+        editable=False,
+        verbose_name="Последняя книга"
+    )
 
     class Meta:
         ordering = ["last_name", "first_name"]
@@ -67,6 +105,25 @@ class Author(models.Model):
             filter(None, (self.last_name, self.first_name, self.middle_name))
         )
 
+    def save(self, *args, **kwargs):
+        """
+        РЕШЕНИЕ: Правка автора не пишет колонки статистики
+        ПОЧЕМУ: Их ведут триггеры на library_book; значения из
+        загруженного ранее экземпляра затерли бы то, что триггер насчитал
+        с тех пор. Исключаем их из UPDATE вместо пересчета и перечитывания
+        после каждого save()
+        """
+        if (
+            not self._state.adding
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in STATS_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.full_name
 
@@ -104,6 +161,26 @@ class Book(models.Model):
         null=True,
         verbose_name="Обложка"
     )
+    cover_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,  # РЕШЕНИЕ: Пути готовых превью {формат: {ширина: путь}}
+        # ПОЧЕМУ: Превью строятся в фоне; пустой словарь - еще не готовы,
+        # и API не отдает ссылки на несуществующие файлы
+        verbose_name="Превью обложки"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,  # РЕШЕНИЕ: Версия строки для ETag и If-Match
+        # ПОЧЕМУ: Дешевле хеша содержимого - меняется при каждом save()
+        verbose_name="Изменена"
+    )
+    search_text = models.TextField(
+        blank=True,
+        editable=False,  # РЕШЕНИЕ: Название + ФИО автора + предисловие
+        # ПОЧЕМУ: Один документ = один индекс и поиск без JOIN
+        verbose_name="Поисковый документ"
+    )
 
     class Meta:
         ordering = ["title"]
@@ -159,3 +236,66 @@ class Book(models.Model):
 
     def __str__(self):
         return f"{self.title} ({self.year})"
+
+
+class Change(models.Model):
+    """
+    Запись журнала изменений каталога (library.changes).
+
+    РЕШЕНИЕ: Строки пишут триггеры СУБД на library_author и library_book
+    ПОЧЕМУ: Как и статистика авторов, журнал видит любую запись - API,
+    админку, bulk, QuerySet.update(), loaddata, сырой SQL - и пишется в
+    той же транзакции: откаченное изменение не оставляет записи
+    """
+
+    INSERT = "insert"
+    UPDATE = "update"
+    DELETE = "delete"
+    RESET = "reset"
+    ACTIONS = [
+        (INSERT, "Создание"),
+        (UPDATE, "Изменение"),
+        (DELETE, "Удаление"),
+        # Изменения до этой записи недоступны (массовая загрузка или
+        # очистка журнала) - клиенту нужна полная синхронизация
+        (RESET, "Сброс"),
+    ]
+
+    seq = models.BigAutoField(
+        primary_key=True,  # РЕШЕНИЕ: Номер изменения = первичный ключ
+        # ПОЧЕМУ: Курсор ?since= читается range scan'ом по PK
+        verbose_name="Номер"
+    )
+    model = models.CharField(
+        max_length=10,
+        blank=True,  # Пусто у записи сброса
+        verbose_name="Модель"
+    )
+    object_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="ID объекта"
+    )
+    action = models.CharField(
+        max_length=6,
+        choices=ACTIONS,
+        verbose_name="Действие"
+    )
+    created_at = models.DateTimeField(
+        db_default=Now(),  # РЕШЕНИЕ: Время ставит СУБД
+        # ПОЧЕМУ: Строки вставляют триггеры, а не Django
+        verbose_name="Время"
+    )
+
+    class Meta:
+        ordering = ["seq"]
+        verbose_name = "Изменение"
+        verbose_name_plural = "Журнал изменений"
+
+        indexes = [
+            # Очистка журнала ищет границу по времени
+            models.Index(fields=["created_at"], name="change_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"#{self.seq} {self.action} {self.model} {self.object_id}"
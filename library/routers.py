@@ -0,0 +1,72 @@
+"""
+Маршрутизация чтения каталога на реплики.
+
+РЕШЕНИЕ: Реплику включает view, а не роутер сам по себе
+ПОЧЕМУ:
+1. Роутер не знает ни метода запроса, ни пользователя - решение
+   "можно ли читать с реплики" принимает ReplicaReadMixin во view и
+   сохраняет его в contextvar на время запроса
+2. Без явного включения все идет в default: админка, запись, фоновые
+   задачи, management-команды - чтение своих записей не ломается
+3. На реплику уходят только модели library: пользователи, сессии и
+   DatabaseCache (счетчики поколений!) всегда читаются из основной БД
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_APPS = {"library"}
+
+_replica = ContextVar("library_replica", default=None)
+
+
+def pick_replica():
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def use_replica():
+    """Включает чтение с реплики; возвращает токен для reset_replica()"""
+    return _replica.set(pick_replica())
+
+
+def reset_replica(token):
+    _replica.reset(token)
+
+
+@contextmanager
+def replica():
+    token = use_replica()
+    try:
+        yield
+    finally:
+        reset_replica(token)
+
+
+def current_replica():
+    return _replica.get()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _replica.get()
+        if alias is None or model._meta.app_label not in REPLICA_APPS:
+            return None
+        # Внутри транзакции основной БД читаем ее же: иначе не увидим
+        # собственные незакоммиченные изменения
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и default
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему реплик обновляет репликация, а не migrate
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,159 @@
+from django.apps import apps as global_apps
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, router, transaction
+from django.db.models.signals import (
+    post_delete, post_migrate, post_save, pre_save,
+)
+from django.dispatch import receiver
+
+from . import covers
+from .cache import bump_generation
+from .changes import install_change_triggers
+from .models import Author, Book
+from .search import (
+    author_document, book_document, install_search_indexes,
+    refresh_book_documents,
+)
+from .stats import STATS_FIELDS, install_stats_triggers, refresh_author_stats
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Book)
+def bump_catalogue_generation(sender, **kwargs):
+    """
+    РЕШЕНИЕ: Сигналы вместо вызовов во view
+    ПОЧЕМУ: Ловят запись из любого источника - API, админки, loaddata
+    (post_save приходит и при raw=True).
+
+    РЕШЕНИЕ: Увеличиваем поколение только после коммита
+    ПОЧЕМУ: Иначе параллельный GET может увидеть новое поколение раньше
+    новых данных и закэшировать под ним старый ответ
+    """
+    transaction.on_commit(lambda: bump_generation(sender), robust=True)
+
+
+@receiver(pre_save, sender=Author)
+def update_author_search_text(sender, instance, **kwargs):
+    document = author_document(instance)
+    # Запоминаем, поменялось ли ФИО - от него зависят документы книг
+    instance._search_text_changed = (
+        instance.pk is not None and instance.search_text != document
+    )
+    instance.search_text = document
+
+
+@receiver(post_save, sender=Author)
+def update_author_books_search_text(sender, instance, created, raw, **kwargs):
+    if created or raw or not getattr(instance, "_search_text_changed", False):
+        return
+    refresh_book_documents([instance])
+
+
+@receiver(post_save, sender=Author)
+def restore_author_stats(sender, instance, raw, **kwargs):
+    """
+    Статистику автора ведут триггеры на library_book (library.stats);
+    здесь исправляем то, что loaddata записал из фикстуры. Author.save()
+    колонки статистики не пишет - пересчитывать нечего
+    """
+    if not raw:
+        return
+    refresh_author_stats([instance.pk])
+    instance.refresh_from_db(fields=STATS_FIELDS)
+
+
+@receiver(pre_save, sender=Book)
+def update_book_search_text(sender, instance, raw, **kwargs):
+    try:
+        author_name = instance.author.full_name
+    except Author.DoesNotExist:
+        # loaddata может загрузить книгу раньше автора - документ
+        # достроит manage.py rebuild_search_index
+        if not raw:
+            raise
+        author_name = None
+    instance.search_text = book_document(instance, author_name)
+
+
+@receiver(pre_save, sender=Book)
+def store_cover(sender, instance, raw, **kwargs):
+    """
+    РЕШЕНИЕ: Новый файл обложки сохраняем сами, под хешем содержимого
+    ПОЧЕМУ: FileField.pre_save сохранил бы его под upload_to с суффиксом
+    при совпадении имени - дубликаты копились бы. Помеченный _committed
+    файл FileField уже не сохраняет
+    """
+    cover = instance.cover
+    if raw or not cover or cover._committed:
+        if not cover:
+            instance.cover_variants = {}
+        return
+    cover.name = covers.store_original(cover.file)
+    cover._committed = True
+    instance.cover_variants = {}
+    instance._cover_changed = True
+
+
+@receiver(post_save, sender=Book)
+def schedule_cover_variants(sender, instance, raw, **kwargs):
+    if raw or not getattr(instance, "_cover_changed", False):
+        return
+    instance._cover_changed = False
+    name = instance.cover.name
+    # Превью строятся после коммита: поток пула должен видеть книгу
+    transaction.on_commit(lambda: covers.schedule(name), robust=True)
+
+
+@receiver(post_migrate)
+def ensure_search_indexes(sender, app_config, using, apps=global_apps,
+                          **kwargs):
+    """
+    SQLite теряет триггеры FTS5, когда миграция пересоздает таблицу.
+    flush (и TransactionTestCase) шлет post_migrate без apps - тогда
+    берем текущие модели
+    """
+    if app_config.label != "library":
+        return
+    # Реплики (library.routers) не мигрируют - индексы им не нужны
+    if not router.allow_migrate(using, app_config.label):
+        return
+    try:
+        apps.get_model("library", "Book")._meta.get_field("search_text")
+    except (LookupError, FieldDoesNotExist):
+        return
+    install_search_indexes(connections[using])
+
+
+@receiver(post_migrate)
+def ensure_stats_triggers(sender, app_config, using, apps=global_apps,
+                          **kwargs):
+    """Триггеры статистики авторов теряются вместе с таблицей library_book"""
+    if app_config.label != "library":
+        return
+    if not router.allow_migrate(using, app_config.label):
+        return
+    try:
+        apps.get_model("library", "Author")._meta.get_field("books_count")
+    except (LookupError, FieldDoesNotExist):
+        return
+    install_stats_triggers(connections[using])
+
+
+@receiver(post_migrate)
+def ensure_change_triggers(sender, app_config, using, apps=global_apps,
+                           **kwargs):
+    """
+    Триггеры журнала теряются вместе с таблицами, а в SQLite еще и
+    перечисляют колонки - пересоздаются после каждого migrate
+    """
+    if app_config.label != "library":
+        return
+    if not router.allow_migrate(using, app_config.label):
+        return
+    try:
+        apps.get_model("library", "Change")
+    except LookupError:
+        return
+    install_change_triggers(connections[using])
@@ -0,0 +1,558 @@
+"""
+Снимок каталога для чтения списков и карточек без запросов к БД.
+
+РЕШЕНИЕ: manage.py build_snapshot компилирует авторов и книги в один
+колоночный файл, воркеры открывают его через mmap только на чтение
+ПОЧЕМУ:
+1. Каталог почти не меняется, а каждый воркер gunicorn заново читает из
+   БД одни и те же строки. Страницы файла лежат в page cache один раз
+   и общие для всех процессов - память не растет с числом воркеров
+2. Числа (id, годы, ссылка на автора, updated_at) - массивы фиксированной
+   ширины, строки - общий буфер UTF-8 и массив смещений. Чтение строки
+   снимка - несколько обращений к массивам, без разбора всего файла
+3. Для каждой сортировки списков (поле по возрастанию и по убыванию с id
+   на хвосте, как у KeysetPagination) построен массив номеров строк в
+   этом порядке и обратный к нему массив рангов. Порядок получен от самой
+   СУБД (ORDER BY) - совпадает с ORM, включая collation строк
+4. Книги сгруппированы по автору и году: фильтр - срез группы и
+   сортировка найденных строк по рангу, а не проход по каталогу
+5. Снимок помнит поколения каталога (library.cache) на момент сборки.
+   Пока они не совпадают с текущими, воркеры читают ORM; новый файл
+   подменяется атомарно (os.replace) и подхватывается по stat()
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from .cache import get_generations
+from .models import Author, Book
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"LIBSNAP1"
+MODELS = {"author": Author, "book": Book}
+
+# Колонки и их типы: id и datetime - int64 (микросекунды от эпохи),
+# int и date (порядковый номер дня) - int32 с NULL = -1, ref - номер
+# строки связанной таблицы, str и json - строки с отдельной маской NULL
+COLUMNS = {
+    "author": (
+        ("id", "id"), ("last_name", "str"), ("first_name", "str"),
+        ("middle_name", "str"), ("birth_date", "date"), ("bio", "str"),
+        ("books_count", "int"), ("first_year", "int"),
+        ("last_year", "int"), ("updated_at", "datetime"),
+    ),
+    "book": (
+        ("id", "id"), ("title", "str"), ("year", "int"),
+        ("preface", "str"), ("cover", "str"), ("cover_variants", "json"),
+        ("author_id", "ref"), ("updated_at", "datetime"),
+    ),
+}
+TYPECODES = {"id": "q", "datetime": "q", "int": "i", "date": "i", "ref": "i"}
+STRINGS = ("str", "json")
+NULL = -1
+
+# ref-колонки: модель, на строку которой ссылаются, и имя связи в ORM
+RELATIONS = {"book": {"author_id": ("author", "author")}}
+
+# Поля сортировки viewset'ов (api.v1.views); порядок по умолчанию берется
+# из Meta.ordering модели
+SORT_FIELDS = {
+    "author": ("last_name", "first_name", "books_count", "first_year",
+               "last_year"),
+    "book": ("title", "year", "author__last_name"),
+}
+
+# Колонки, по значению которых книги сгруппированы для фильтров
+GROUPS = {"book": ("author_id", "year")}
+
+# Поля версии (ConditionalGetMixin) с готовым MAX по всей таблице
+VERSION_FIELDS = {
+    "author": ("updated_at",),
+    "book": ("updated_at", "author__updated_at"),
+}
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+CHUNK_SIZE = 5000
+
+
+def encode(kind, value):
+    if kind == "datetime":
+        return (value - EPOCH) // MICROSECOND
+    if value is None:
+        return NULL
+    if kind == "date":
+        return value.toordinal()
+    return value
+
+
+def decode(kind, value):
+    if kind == "datetime":
+        return EPOCH + value * MICROSECOND
+    if value == NULL:
+        return None
+    if kind == "date":
+        return date.fromordinal(value)
+    return value
+
+
+def orderings(model):
+    """Сортировки, для которых строится индекс: с id на хвосте"""
+    default = tuple(MODELS[model]._meta.ordering)
+    found = {default + ("id",): None}
+    for field in SORT_FIELDS[model]:
+        found[(field, "id")] = None
+        found[(f"-{field}", "id")] = None
+    return list(found)
+
+
+def order_by(model, ordering):
+    """
+    ORDER BY индекса. NULL - первыми по возрастанию и последними по
+    убыванию, как в KeysetPagination.order_by
+    """
+    expressions = []
+    for field in ordering:
+        name = field.lstrip("-")
+        current = MODELS[model]
+        for part in name.split("__"):
+            db_field = current._meta.get_field(part)
+            current = db_field.related_model or current
+        if not db_field.null:
+            expressions.append(field)
+        elif field.startswith("-"):
+            expressions.append(F(name).desc(nulls_last=True))
+        else:
+            expressions.append(F(name).asc(nulls_first=True))
+    return expressions
+
+
+class StringColumnBuilder:
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array("q", [0])
+        self.nulls = bytearray()
+
+    def append(self, value):
+        self.nulls.append(value is None)
+        if value is not None:
+            self.data += value.encode()
+        self.offsets.append(len(self.data))
+
+
+def _grouped(keys, size):
+    """
+    Номера строк, сгруппированные по значению: (отсортированные значения,
+    смещения групп, строки). Внутри группы строки идут по возрастанию id
+    """
+    values = sorted(set(keys))
+    group = {value: index for index, value in enumerate(values)}
+    offsets = array("q", bytes(8 * (len(values) + 1)))
+    for key in keys:
+        offsets[group[key] + 1] += 1
+    for index in range(len(values)):
+        offsets[index + 1] += offsets[index]
+    fill = array("q", offsets)
+    rows = array("i", bytes(4 * size))
+    for row, key in enumerate(keys):
+        rows[fill[group[key]]] = row
+        fill[group[key]] += 1
+    return array("q", values), offsets, rows
+
+
+def _build_table(model, sections, positions):
+    columns = COLUMNS[model]
+    numbers = {
+        name: array(TYPECODES[kind]) for name, kind in columns
+        if kind not in STRINGS
+    }
+    strings = {
+        name: StringColumnBuilder() for name, kind in columns
+        if kind in STRINGS
+    }
+    groups = {name: [] for name in GROUPS.get(model, ())}
+    names = [name for name, _ in columns]
+    rows = (
+        MODELS[model].objects.order_by("id").values_list(*names)
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    for values in rows:
+        for (name, kind), value in zip(columns, values):
+            if name in groups:
+                groups[name].append(value)
+            if kind == "str":
+                strings[name].append(value)
+            elif kind == "json":
+                strings[name].append(
+                    None if value is None else json.dumps(value)
+                )
+            elif kind == "ref":
+                numbers[name].append(positions[RELATIONS[model][name][0]][
+                    value
+                ])
+            else:
+                numbers[name].append(encode(kind, value))
+
+    size = len(numbers["id"])
+    for name, values in numbers.items():
+        sections[f"{model}.{name}"] = values
+    for name, column in strings.items():
+        sections[f"{model}.{name}"] = column.offsets
+        sections[f"{model}.{name}.data"] = array("B", column.data)
+        sections[f"{model}.{name}.null"] = array("B", column.nulls)
+    for name, keys in groups.items():
+        values, offsets, members = _grouped(keys, size)
+        sections[f"{model}.by.{name}"] = values
+        sections[f"{model}.by.{name}.offsets"] = offsets
+        sections[f"{model}.by.{name}.rows"] = members
+    positions[model] = {pk: row for row, pk in enumerate(numbers["id"])}
+    return size
+
+
+def _build_indexes(model, size, sections, positions):
+    for ordering in orderings(model):
+        ids = (
+            MODELS[model].objects.order_by(*order_by(model, ordering))
+            .values_list("id", flat=True).iterator(chunk_size=CHUNK_SIZE)
+        )
+        order = array("i", (positions[model][pk] for pk in ids))
+        rank = array("i", bytes(4 * size))
+        for position, row in enumerate(order):
+            rank[row] = position
+        name = ",".join(ordering)
+        sections[f"{model}.order.{name}"] = order
+        sections[f"{model}.rank.{name}"] = rank
+
+
+def _relation(model, name):
+    """(ref-колонка, связанная модель) по имени связи в ORM"""
+    for ref, (target, relation) in RELATIONS[model].items():
+        if relation == name:
+            return ref, target
+    raise KeyError(name)
+
+
+def _aggregates(model, sections):
+    """MAX полей версии по всей таблице - как агрегат по пустому фильтру"""
+    result = {}
+    for field in VERSION_FIELDS[model]:
+        relation, _, column = field.rpartition("__")
+        values = sections[f"{model}.{column}"]
+        if relation:
+            ref, target = _relation(model, relation)
+            related = sections[f"{target}.{column}"]
+            values = [related[row] for row in set(sections[f"{model}.{ref}"])]
+        result[field] = max(values, default=None)
+    return result
+
+
+@transaction.atomic
+def collect():
+    """Все секции снимка из одного согласованного чтения БД"""
+    if connection.vendor == "postgresql":
+        # Иначе запись между запросами дала бы индекс со строкой, которой
+        # нет в колонках
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY"
+            )
+    sections = {}
+    positions = {}
+    tables = {}
+    for model in MODELS:
+        size = _build_table(model, sections, positions)
+        _build_indexes(model, size, sections, positions)
+        tables[model] = {"rows": size}
+    for model in MODELS:
+        tables[model]["aggregates"] = _aggregates(model, sections)
+    return tables, sections
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def build_snapshot(path):
+    """
+    Собирает снимок в path. Файл заменяется атомарно: воркер, открывший
+    старый снимок, дочитывает его. Возвращает заголовок
+    """
+    # Поколения - до чтения данных: запись, попавшая в снимок, но еще не
+    # увеличившая поколение, только сделает снимок устаревшим
+    generations = get_generations(*MODELS.values())
+    tables, sections = collect()
+
+    layout = {}
+    offset = 0
+    for name, values in sections.items():
+        layout[name] = [offset, values.typecode, len(values)]
+        offset = _align(offset + len(values) * values.itemsize)
+    header = {
+        "generations": list(generations),
+        "tables": tables,
+        "orderings": {model: orderings(model) for model in MODELS},
+        "sections": layout,
+    }
+    raw = json.dumps(header).encode()
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as output:
+        output.write(MAGIC + struct.pack("<Q", len(raw)) + raw)
+        start = _align(len(MAGIC) + 8 + len(raw))
+        for name, values in sections.items():
+            output.seek(start + layout[name][0])
+            values.tofile(output)
+        output.truncate(start + offset)
+        output.flush()
+        os.fsync(output.fileno())
+    os.replace(tmp, path)
+    return header
+
+
+class Table:
+    def __init__(self, snapshot, model, meta):
+        self.snapshot = snapshot
+        self.model = model
+        self.size = meta["rows"]
+        self.aggregates = meta["aggregates"]
+        self.ids = snapshot.sections[f"{model}.id"]
+        self.kinds = dict(COLUMNS[model])
+
+    def position(self, pk):
+        """Номер строки по id (id в снимке отсортированы) или None"""
+        row = bisect_left(self.ids, pk)
+        if row < self.size and self.ids[row] == pk:
+            return row
+        return None
+
+    def raw(self, column, row):
+        return self.snapshot.sections[f"{self.model}.{column}"][row]
+
+    def value(self, column, row):
+        kind = self.kinds[column]
+        if kind not in STRINGS:
+            return decode(kind, self.raw(column, row))
+        sections = self.snapshot.sections
+        if sections[f"{self.model}.{column}.null"][row]:
+            return None
+        offsets = sections[f"{self.model}.{column}"]
+        data = sections[f"{self.model}.{column}.data"]
+        text = str(data[offsets[row]:offsets[row + 1]], "utf-8")
+        return json.loads(text) if kind == "json" else text
+
+
+class Snapshot:
+    """Открытый через mmap снимок; общий для потоков процесса"""
+
+    def __init__(self, path):
+        with open(path, "rb") as source:
+            self.buffer = mmap.mmap(
+                source.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        view = memoryview(self.buffer)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path}: не снимок каталога этой версии")
+        (length,) = struct.unpack_from("<Q", self.buffer, len(MAGIC))
+        start = len(MAGIC) + 8
+        header = json.loads(bytes(view[start:start + length]))
+        start = _align(start + length)
+
+        self.sections = {}
+        for name, (offset, typecode, count) in header["sections"].items():
+            begin = start + offset
+            size = count * array(typecode).itemsize
+            self.sections[name] = view[begin:begin + size].cast(typecode)
+        self.generations = tuple(header["generations"])
+        self.orderings = {
+            model: {tuple(ordering) for ordering in found}
+            for model, found in header["orderings"].items()
+        }
+        self.tables = {
+            model: Table(self, model, meta)
+            for model, meta in header["tables"].items()
+        }
+
+    def maximum(self, model, field, rows):
+        """
+        MAX числового поля по строкам rows; author__updated_at - через
+        ref-колонку. Сравниваются сырые значения - NULL (-1) меньше любых
+        """
+        relation, _, column = field.rpartition("__")
+        values = self.sections[f"{model}.{column}"]
+        if relation:
+            ref, target = _relation(model, relation)
+            refs = self.sections[f"{model}.{ref}"]
+            values = self.sections[f"{target}.{column}"]
+            rows = (refs[row] for row in rows)
+        kind = dict(COLUMNS[target if relation else model])[column]
+        found = max((values[row] for row in rows), default=None)
+        return None if found is None else decode(kind, found)
+
+    def row(self, model, row):
+        """
+        Строка как словарь values(): у книги author_id и поля автора с
+        префиксом author__ (FastBookSerializer)
+        """
+        table = self.tables[model]
+        data = {}
+        for column, kind in COLUMNS[model]:
+            if kind != "ref":
+                data[column] = table.value(column, row)
+                continue
+            target, name = RELATIONS[model][column]
+            related = table.raw(column, row)
+            fields = self.row(target, related)
+            data[column] = fields["id"]
+            for key, value in fields.items():
+                data[f"{name}__{key}"] = value
+        return data
+
+    def get(self, model, pk):
+        row = self.tables[model].position(pk)
+        return None if row is None else self.row(model, row)
+
+    def group(self, model, column, value):
+        """Строки с column = value (GROUPS), по возрастанию id"""
+        name = f"{model}.by.{column}"
+        values = self.sections[name]
+        index = bisect_left(values, value)
+        if index == len(values) or values[index] != value:
+            return []
+        offsets = self.sections[f"{name}.offsets"]
+        return self.sections[f"{name}.rows"][
+            offsets[index]:offsets[index + 1]
+        ]
+
+    def select(self, model, ordering, filters=None):
+        """
+        Selection строк model в порядке ordering с фильтрами
+        {колонка из GROUPS: значение}; None - для ordering нет индекса
+        """
+        if tuple(ordering) not in self.orderings[model]:
+            return None
+        rows = None
+        if filters:
+            groups = sorted(
+                (self.group(model, column, value)
+                 for column, value in filters.items()),
+                key=len,
+            )
+            rows, *others = groups
+            if others:
+                others = [set(group) for group in others]
+                rows = [
+                    row for row in rows
+                    if all(row in other for other in others)
+                ]
+        return Selection(self, model, ordering, rows)
+
+
+class Selection:
+    """
+    Строки запроса в порядке сортировки. Последовательность словарей
+    values(): срез берет и Paginator, и keyset-пагинация
+    """
+
+    def __init__(self, snapshot, model, ordering, rows=None):
+        self.snapshot = snapshot
+        self.model = model
+        name = ",".join(ordering)
+        self.order = snapshot.sections[f"{model}.order.{name}"]
+        self.rank = snapshot.sections[f"{model}.rank.{name}"]
+        self.filtered = rows is not None
+        if self.filtered:
+            self.order = sorted(rows, key=self.rank.__getitem__)
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [
+                self.snapshot.row(self.model, row) for row in self.order[key]
+            ]
+        return self.snapshot.row(self.model, self.order[key])
+
+    def seek(self, pk, reverse, limit):
+        """
+        До limit строк строго после строки pk (reverse - перед ней, в
+        обратном порядке); None - строки pk в снимке нет
+        """
+        row = self.snapshot.tables[self.model].position(pk)
+        if row is None:
+            return None
+        rank = self.rank[row]
+        if reverse:
+            end = bisect_left(self.order, rank, key=self.rank.__getitem__)
+            rows = list(self.order[max(end - limit, 0):end])[::-1]
+        else:
+            start = bisect_right(self.order, rank, key=self.rank.__getitem__)
+            rows = self.order[start:start + limit]
+        return [self.snapshot.row(self.model, row) for row in rows]
+
+    def version(self, fields):
+        """
+        (число строк, [MAX каждого поля]) - то же, что агрегат
+        ConditionalGetMixin.get_version по отфильтрованному queryset
+        """
+        aggregates = self.snapshot.tables[self.model].aggregates
+        if not self.filtered and all(field in aggregates for field in fields):
+            return len(self), [
+                None if aggregates[field] is None
+                else decode("datetime", aggregates[field])
+                for field in fields
+            ]
+        return len(self), [
+            self.snapshot.maximum(self.model, field, self.order)
+            for field in fields
+        ]
+
+
+_lock = threading.Lock()
+_snapshot = None
+_snapshot_key = None
+
+
+def get_snapshot():
+    """
+    Снимок процесса или None: снимок выключен, не собран или отстал от
+    каталога. Новый файл подхватывается по stat() без рестарта воркера
+    """
+    global _snapshot, _snapshot_key
+    path = settings.CATALOGUE_SNAPSHOT_PATH
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    if key != _snapshot_key:
+        with _lock:
+            if key != _snapshot_key:
+                try:
+                    _snapshot = Snapshot(path)
+                except ValueError:
+                    logger.exception("Снимок каталога %s не открыт", path)
+                    _snapshot = None
+                # Старый mmap закроется, когда его отпустят текущие запросы
+                _snapshot_key = key
+    snapshot = _snapshot
+    if snapshot is None:
+        return None
+    if snapshot.generations != get_generations(*MODELS.values()):
+        return None
+    return snapshot
@@ -0,0 +1,239 @@
+"""
+Денормализованная статистика автора: число книг и диапазон лет.
+
+РЕШЕНИЕ: Колонки Author.books_count/first_year/last_year, которые
+поддерживают триггеры СУБД на library_book
+ПОЧЕМУ:
+1. Фильтр и сортировка по Count/Min/Max требуют GROUP BY по всем книгам
+   на каждый запрос; готовые колонки с индексами - обычный range scan
+2. Триггер видит любую запись в library_book: save(), bulk_create с
+   ON CONFLICT, QuerySet.update(), админку, loaddata и сырой SQL.
+   Сигналы Django bulk-операции пропускают
+3. Обновление инкрементальное: +1/-1 к счетчику, MIN/MAX с новым годом.
+   Пересчет границы идет только при удалении книги с крайним годом и
+   стоит один index seek по book_author_year_idx
+4. Триггер заодно двигает Author.updated_at - статистика входит в ответ
+   API, и ETag автора должен меняться вместе с ней
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections, transaction
+from django.db.models import Count, Max, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import STATS_FIELDS, Author, Book
+
+# Триггер срабатывает только на реальную смену автора или года: save()
+# пишет все колонки, и без условия правка названия трогала бы автора
+CHANGED = (
+    "OLD.author_id IS NOT NEW.author_id OR OLD.year IS NOT NEW.year"
+)
+
+SQLITE_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+def _remove_sql(now):
+    # Граница пересчитывается, только если удаляется крайний год
+    return (
+        "UPDATE library_author SET books_count = books_count - 1, "
+        "first_year = CASE WHEN OLD.year = first_year THEN ("
+        "SELECT MIN(year) FROM library_book WHERE author_id = OLD.author_id"
+        ") ELSE first_year END, "
+        "last_year = CASE WHEN OLD.year = last_year THEN ("
+        "SELECT MAX(year) FROM library_book WHERE author_id = OLD.author_id"
+        ") ELSE last_year END, "
+        f"updated_at = {now} "
+        "WHERE id = OLD.author_id"
+    )
+
+
+def _add_sql(now, least, greatest):
+    return (
+        "UPDATE library_author SET books_count = books_count + 1, "
+        f"first_year = {least}(COALESCE(first_year, NEW.year), NEW.year), "
+        f"last_year = {greatest}(COALESCE(last_year, NEW.year), NEW.year), "
+        f"updated_at = {now} "
+        "WHERE id = NEW.author_id"
+    )
+
+
+def install_stats_triggers(connection):
+    """
+    Создает триггеры статистики. Идемпотентна: вызывается из миграции и
+    после каждого migrate - SQLite теряет триггеры при пересоздании таблицы.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            _install_postgresql(cursor)
+        elif connection.vendor == "sqlite":
+            _install_sqlite(cursor)
+
+
+def _install_sqlite(cursor):
+    remove = _remove_sql(SQLITE_NOW)
+    add = _add_sql(SQLITE_NOW, "MIN", "MAX")
+    cursor.execute(
+        "CREATE TRIGGER IF NOT EXISTS library_book_stats_ai "
+        f"AFTER INSERT ON library_book BEGIN {add}; END"
+    )
+    cursor.execute(
+        "CREATE TRIGGER IF NOT EXISTS library_book_stats_ad "
+        f"AFTER DELETE ON library_book BEGIN {remove}; END"
+    )
+    # Смена автора или года = удаление у старого + добавление новому
+    cursor.execute(
+        "CREATE TRIGGER IF NOT EXISTS library_book_stats_au "
+        "AFTER UPDATE OF author_id, year ON library_book "
+        f"WHEN {CHANGED} BEGIN {remove}; {add}; END"
+    )
+
+
+def _install_postgresql(cursor):
+    remove = _remove_sql("now()")
+    add = _add_sql("now()", "LEAST", "GREATEST")
+    cursor.execute(
+        "CREATE OR REPLACE FUNCTION library_book_stats() RETURNS trigger "
+        "AS $$ BEGIN "
+        f"IF TG_OP IN ('DELETE', 'UPDATE') THEN {remove}; END IF; "
+        f"IF TG_OP IN ('INSERT', 'UPDATE') THEN {add}; END IF; "
+        "RETURN NULL; END $$ LANGUAGE plpgsql"
+    )
+    changed = CHANGED.replace("IS NOT", "IS DISTINCT FROM")
+    for name in ("aid", "au"):
+        cursor.execute(
+            f"DROP TRIGGER IF EXISTS library_book_stats_{name} ON library_book"
+        )
+    cursor.execute(
+        "CREATE TRIGGER library_book_stats_aid "
+        "AFTER INSERT OR DELETE ON library_book "
+        "FOR EACH ROW EXECUTE FUNCTION library_book_stats()"
+    )
+    cursor.execute(
+        "CREATE TRIGGER library_book_stats_au "
+        "AFTER UPDATE OF author_id, year ON library_book "
+        f"FOR EACH ROW WHEN ({changed}) "
+        "EXECUTE FUNCTION library_book_stats()"
+    )
+
+
+def uninstall_stats_triggers(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            for name in ("aid", "au"):
+                cursor.execute(
+                    f"DROP TRIGGER IF EXISTS library_book_stats_{name} "
+                    "ON library_book"
+                )
+            cursor.execute("DROP FUNCTION IF EXISTS library_book_stats()")
+        elif connection.vendor == "sqlite":
+            for name in ("ai", "ad", "au"):
+                cursor.execute(
+                    f"DROP TRIGGER IF EXISTS library_book_stats_{name}"
+                )
+
+
+def refresh_author_stats(author_ids):
+    """
+    Пересчитывает статистику авторов одним UPDATE с подзапросами.
+
+    РЕШЕНИЕ: Вызывается после загрузки автора через loaddata
+    ПОЧЕМУ: Фикстура приносит статистику из чужой базы, а save_base
+    (raw) пишет все колонки. Обычный Author.save() колонки статистики
+    не пишет
+    """
+    books = Book.objects.filter(author=OuterRef("pk")).order_by().values(
+        "author"
+    )
+
+    def aggregate(function, field):
+        return Subquery(books.annotate(value=function(field)).values("value"))
+
+    return Author.objects.filter(pk__in=author_ids).update(
+        books_count=Coalesce(aggregate(Count, "id"), 0),
+        first_year=aggregate(Min, "year"),
+        last_year=aggregate(Max, "year"),
+    )
+
+
+def actual_stats(author_ids=None, low=None, high=None):
+    """
+    {author_id: (books_count, first_year, last_year)} по таблице книг.
+    Авторы без книг в результат не попадают.
+    """
+    books = Book.objects.order_by()
+    if author_ids is not None:
+        books = books.filter(author_id__in=author_ids)
+    if low is not None:
+        books = books.filter(author_id__gte=low, author_id__lt=high)
+    rows = books.values("author_id").annotate(
+        count=Count("id"), first=Min("year"), last=Max("year"),
+    ).values_list("author_id", "count", "first", "last")
+    return {pk: tuple(stats) for pk, *stats in rows}
+
+
+def reconcile_range(low, high):
+    """
+    Сверяет статистику авторов с id в [low, high) и исправляет
+    расхождения. Возвращает (проверено, исправлено).
+    """
+    try:
+        with transaction.atomic():
+            # Блокировка строк авторов: триггер параллельной записи книги
+            # подождет, и пересчет не затрет его инкремент
+            authors = list(
+                Author.objects.filter(pk__gte=low, pk__lt=high)
+                .select_for_update().only("id", *STATS_FIELDS)
+            )
+            actual = actual_stats(low=low, high=high)
+            now = timezone.now()
+            stale = []
+            for author in authors:
+                expected = actual.get(author.pk, (0, None, None))
+                current = tuple(getattr(author, f) for f in STATS_FIELDS)
+                if current != expected:
+                    for field, value in zip(STATS_FIELDS, expected):
+                        setattr(author, field, value)
+                    author.updated_at = now
+                    stale.append(author)
+            Author.objects.bulk_update(
+                stale, [*STATS_FIELDS, "updated_at"], batch_size=1000
+            )
+        return len(authors), len(stale)
+    finally:
+        # У потока пула свои соединения с БД - не держим их открытыми
+        connections.close_all()
+
+
+def id_ranges(chunk_size):
+    bounds = Author.objects.order_by().aggregate(
+        low=Min("id"), high=Max("id")
+    )
+    if bounds["low"] is None:
+        return []
+    return [
+        (low, low + chunk_size)
+        for low in range(bounds["low"], bounds["high"] + 1, chunk_size)
+    ]
+
+
+def reconcile(workers=1, chunk_size=10000, progress=None):
+    """
+    Пересчитывает статистику всех авторов диапазонами id в пуле потоков.
+    Возвращает (проверено, исправлено).
+    """
+    # SQLite пишет в одну транзакцию за раз, а две читающие транзакции не
+    # могут одновременно стать пишущими ("database is locked")
+    if connections["default"].vendor == "sqlite":
+        workers = 1
+    checked = fixed = 0
+    ranges = id_ranges(chunk_size)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for done, (count, stale) in enumerate(
+            executor.map(lambda bounds: reconcile_range(*bounds), ranges), 1
+        ):
+            checked += count
+            fixed += stale
+            if progress:
+                progress(done, len(ranges), checked, fixed)
+    return checked, fixed
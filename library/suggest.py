@@ -0,0 +1,200 @@
+"""
+Подсказки (typeahead) по названиям книг и ФИО авторов.
+
+РЕШЕНИЕ: Отдельный легкий движок вместо ?search= в BookViewSet
+ПОЧЕМУ:
+1. Запрос приходит на каждое нажатие клавиши - нужен только id и строка
+   для показа, без сериализаторов, пагинации и COUNT(*)
+2. PostgreSQL: pg_trgm + GiST индекс, KNN-сортировка по расстоянию (<<->)
+   идет прямо по индексу и останавливается на LIMIT
+3. Остальные СУБД: сортированный массив ключей в памяти процесса и
+   бинарный поиск по префиксу; при смене поколения каталога
+   (library.cache) пересобирается в фоне
+"""
+import logging
+import threading
+from bisect import bisect_left
+
+from django.db import connection, connections
+from django.db.models import F, Func
+
+from .cache import get_generations
+from .models import Author, Book
+from .search import tokenize
+
+logger = logging.getLogger(__name__)
+
+# GiST-индексы pg_trgm: таблица -> (имя индекса, выражение ключа)
+TRIGRAM_INDEXES = {
+    "library_book": (
+        "book_title_trgm", "replace(lower(title), 'ё', 'е')"
+    ),
+    # Author.search_text уже нормализованное ФИО
+    "library_author": ("author_name_trgm", "search_text"),
+}
+
+
+class TitleKey(Func):
+    """Ключ названия; SQL побайтно совпадает с выражением индекса"""
+
+    template = "replace(lower(%(expressions)s), 'ё', 'е')"
+
+
+def suggest(query, limit=10):
+    """
+    Возвращает {"books": [(id, title)], "authors": [(id, full_name)]}
+    """
+    query = " ".join(tokenize(query))
+    if not query:
+        return {"books": [], "authors": []}
+    if connection.vendor == "postgresql":
+        return _suggest_postgresql(query, limit)
+    return get_memory_index().suggest(query, limit)
+
+
+def _suggest_postgresql(query, limit):
+    from django.contrib.postgres.search import TrigramWordDistance
+
+    books = (
+        Book.objects.alias(key=TitleKey(F("title")))
+        .filter(key__trigram_word_similar=query)
+        .order_by(TrigramWordDistance(query, "key"))
+        .values_list("id", "title")[:limit]
+    )
+    authors = (
+        Author.objects.filter(search_text__trigram_word_similar=query)
+        .order_by(TrigramWordDistance(query, "search_text"))
+        .values_list("id", "last_name", "first_name", "middle_name")[:limit]
+    )
+    return {
+        "books": list(books),
+        "authors": [(pk, full_name(*names)) for pk, *names in authors],
+    }
+
+
+def full_name(*parts):
+    return " ".join(filter(None, parts))
+
+
+class PrefixIndex:
+    """
+    Отсортированный массив ключей для поиска по префиксу.
+    Ключ заводится на каждое слово строки: "мир" находит "Война и мир".
+    """
+
+    def __init__(self, rows):
+        entries = []
+        for pk, display in rows:
+            words = tokenize(display)
+            for position in range(len(words)):
+                entries.append((" ".join(words[position:]), position, pk))
+        entries.sort()
+        self.keys = [entry[0] for entry in entries]
+        self.entries = entries
+        self.display = dict(rows)
+
+    def search(self, prefix, limit):
+        found = []
+        seen = set()
+        # Индексный цикл вместо среза: срез копировал бы хвост массива
+        for index in range(bisect_left(self.keys, prefix), len(self.keys)):
+            key, position, pk = self.entries[index]
+            if not key.startswith(prefix):
+                break
+            if pk in seen:
+                continue
+            seen.add(pk)
+            found.append((position, len(self.display[pk]), pk))
+            # Совпадения с начала строки важнее совпадений с середины;
+            # набираем запас и ранжируем внутри него
+            if len(found) >= limit * 4:
+                break
+        found.sort()
+        return [(pk, self.display[pk]) for _, _, pk in found[:limit]]
+
+
+class MemorySuggestIndex:
+    def __init__(self):
+        self.books = PrefixIndex(list(Book.objects.values_list("id", "title")))
+        self.authors = PrefixIndex([
+            (pk, full_name(*names))
+            for pk, *names in Author.objects.values_list(
+                "id", "last_name", "first_name", "middle_name"
+            )
+        ])
+
+    def suggest(self, query, limit):
+        return {
+            "books": self.books.search(query, limit),
+            "authors": self.authors.search(query, limit),
+        }
+
+
+_lock = threading.Lock()
+_memory_index = None
+_memory_generation = None
+_rebuilding = False
+
+
+def get_memory_index():
+    """
+    РЕШЕНИЕ: Индекс процесса пересобирается в фоновом потоке; до подмены
+    запросы обслуживает прежний
+    ПОЧЕМУ: Сборка читает все названия и ФИО из БД - на миллионе книг
+    это секунды. Синхронно их платил бы первый запрос подсказок после
+    каждой записи в каждом воркере. Подсказка, отстающая от каталога на
+    время сборки, приемлема; синхронно строится только первый индекс
+    """
+    global _memory_index, _memory_generation, _rebuilding
+    generation = get_generations(Author, Book)
+    if _memory_generation == generation:
+        return _memory_index
+    with _lock:
+        if _memory_index is None:
+            _memory_index = MemorySuggestIndex()
+            _memory_generation = generation
+        elif _memory_generation != generation and not _rebuilding:
+            _rebuilding = True
+            threading.Thread(
+                target=_rebuild, args=(generation,),
+                name="suggest-index", daemon=True,
+            ).start()
+    return _memory_index
+
+
+def _rebuild(generation):
+    global _memory_index, _memory_generation, _rebuilding
+    try:
+        index = MemorySuggestIndex()
+        with _lock:
+            _memory_index = index
+            # Поколение - снятое до чтения: запись во время сборки
+            # запустит следующую
+            _memory_generation = generation
+    except Exception:
+        logger.exception("Индекс подсказок не пересобран")
+    finally:
+        with _lock:
+            _rebuilding = False
+        # У потока свои соединения с БД - не держим их открытыми
+        connections.close_all()
+
+
+def install_trigram_indexes(connection):
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for table, (index, expression) in TRIGRAM_INDEXES.items():
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {index} ON {table} "
+                f"USING gist (({expression}) gist_trgm_ops)"
+            )
+
+
+def uninstall_trigram_indexes(connection):
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        for index, _ in TRIGRAM_INDEXES.values():
+            cursor.execute(f"DROP INDEX IF EXISTS {index}")
@@ -0,0 +1,94 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from library.models import Author, Book
+
+
+class ChangeListQueryCountTests(TestCase):
+    """
+    Число SQL на страницу списка в админке не зависит от числа строк и
+    фильтров: автор книги приходит JOIN'ом (list_select_related), фильтры
+    не перечисляют значения из БД, поиск идет по FTS
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = [
+            Author.objects.create(
+                last_name=f"Фамилия{i}", first_name="Имя",
+                birth_date=f"18{i}0-01-01",
+            )
+            for i in range(3)
+        ]
+        for author in authors:
+            for year in range(1900, 1904):
+                Book.objects.create(
+                    author=author, title=f"{author.last_name} {year}",
+                    year=year,
+                )
+        cls.author = authors[0]
+        cls.admin = get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def assertQueries(self, count, url, params=None):
+        with self.assertNumQueries(count):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    # Сессия + пользователь + COUNT + страница
+    def test_book_changelist(self):
+        cl = self.assertQueries(4, "/admin/library/book/").context["cl"]
+        self.assertEqual(cl.result_count, 12)
+
+    def test_book_changelist_year_range(self):
+        cl = self.assertQueries(
+            4, "/admin/library/book/", {"year__gte": 1901, "year__lte": 1902}
+        ).context["cl"]
+        self.assertEqual(cl.result_count, 6)
+
+    def test_book_changelist_author_filter(self):
+        # + подпись выбранного автора в автокомплите фильтра
+        cl = self.assertQueries(
+            5, "/admin/library/book/", {"author__id__exact": self.author.pk}
+        ).context["cl"]
+        self.assertEqual(cl.result_count, 4)
+
+    def test_book_changelist_search(self):
+        cl = self.assertQueries(
+            4, "/admin/library/book/", {"q": "фамилия1"}
+        ).context["cl"]
+        self.assertEqual(cl.result_count, 4)
+
+    def test_author_changelist(self):
+        cl = self.assertQueries(4, "/admin/library/author/").context["cl"]
+        self.assertEqual(cl.result_count, 3)
+
+    def test_author_changelist_birth_date_range(self):
+        cl = self.assertQueries(4, "/admin/library/author/", {
+            "birth_date__gte": "1810-01-01", "birth_date__lte": "1830-01-01",
+        }).context["cl"]
+        self.assertEqual(cl.result_count, 2)
+
+    def test_author_changelist_books_count_range(self):
+        cl = self.assertQueries(
+            4, "/admin/library/author/", {"books_count__gte": 4}
+        ).context["cl"]
+        self.assertEqual(cl.result_count, 3)
+
+    def test_author_changelist_search(self):
+        cl = self.assertQueries(
+            4, "/admin/library/author/", {"q": "фамилия2"}
+        ).context["cl"]
+        self.assertEqual(cl.result_count, 1)
+
+    def test_author_autocomplete(self):
+        response = self.assertQueries(4, "/admin/autocomplete/", {
+            "app_label": "library", "model_name": "book",
+            "field_name": "author", "term": "фамилия",
+        })
+        self.assertEqual(len(response.json()["results"]), 3)
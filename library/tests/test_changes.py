@@ -0,0 +1,32 @@
+from django.test import SimpleTestCase
+
+from library.changes import compact
+from library.models import Change
+
+
+class CompactTests(SimpleTestCase):
+    def test_keeps_latest_change(self):
+        rows = [
+            (1, "book", 1, Change.UPDATE),
+            (2, "author", 1, Change.UPDATE),
+            (3, "book", 1, Change.DELETE),
+        ]
+        self.assertEqual(compact(rows), [
+            (2, "author", 1, Change.UPDATE),
+            (3, "book", 1, Change.DELETE),
+        ])
+
+    def test_insert_survives_later_updates(self):
+        rows = [
+            (1, "book", 1, Change.INSERT),
+            (2, "book", 2, Change.UPDATE),
+            (3, "book", 1, Change.UPDATE),
+        ]
+        self.assertEqual(compact(rows), [
+            (2, "book", 2, Change.UPDATE),
+            (3, "book", 1, Change.INSERT),
+        ])
+
+    def test_deleted_insert_is_tombstone(self):
+        rows = [(1, "book", 1, Change.INSERT), (2, "book", 1, Change.DELETE)]
+        self.assertEqual(compact(rows), [(2, "book", 1, Change.DELETE)])
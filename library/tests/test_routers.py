@@ -0,0 +1,109 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from library import routers
+from library.cache import get_cache
+from library.models import Author, Book
+
+
+# Реплика в тестах - зеркало основной БД (TEST_REPLICA в settings или
+# реплики из DB_REPLICAS): отдельное соединение к тем же данным.
+# TransactionTestCase: в TestCase запись под транзакцией default блокирует
+# чтение через соединение реплики
+REPLICAS = settings.DATABASE_REPLICAS or [settings.TEST_REPLICA]
+
+
+@override_settings(
+    DATABASE_REPLICAS=REPLICAS,
+    DATABASE_ROUTERS=["library.routers.ReplicaRouter"],
+    CATALOGUE_CACHE_TIMEOUT=0, CATALOGUE_SNAPSHOT_PATH="",
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {DEFAULT_DB_ALIAS, *REPLICAS}
+
+    def setUp(self):
+        self.author = Author.objects.create(
+            last_name="Фамилия", first_name="Имя"
+        )
+        self.book = Book.objects.create(
+            author=self.author, title="Книга", year=1900
+        )
+        self.admin = get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+        # Записи выше открыли окно DB_REPLICA_LAG - закрываем его
+        get_cache().clear()
+
+    def catalogue_queries(self, request):
+        """Алиасы БД, получившие запросы к таблицам library_*"""
+        with ExitStack() as stack:
+            captured = {
+                alias: stack.enter_context(
+                    CaptureQueriesContext(connections[alias])
+                )
+                for alias in self.databases
+            }
+            response = request()
+        used = {
+            alias for alias, context in captured.items()
+            if any("library_" in query["sql"] for query in context)
+        }
+        return response, used
+
+    def assertRouted(self, aliases, request, status=200):
+        response, used = self.catalogue_queries(request)
+        self.assertEqual(response.status_code, status)
+        self.assertTrue(used)
+        self.assertLessEqual(used, set(aliases))
+        # Реплика включается только на время запроса
+        self.assertIsNone(routers.current_replica())
+        return response
+
+    def test_anonymous_read_uses_replica(self):
+        self.assertRouted(REPLICAS, lambda: self.client.get("/api/v1/books/"))
+        self.assertRouted(
+            REPLICAS,
+            lambda: self.client.get(f"/api/v1/authors/{self.author.pk}/"),
+        )
+
+    def test_not_found_resets_replica(self):
+        self.assertRouted(
+            REPLICAS,
+            lambda: self.client.get("/api/v1/books/0/"),
+            status=404,
+        )
+
+    def test_admin_reads_and_writes_primary(self):
+        self.client.force_login(self.admin)
+        self.assertRouted(
+            [DEFAULT_DB_ALIAS], lambda: self.client.get("/api/v1/books/")
+        )
+        self.assertRouted([DEFAULT_DB_ALIAS], lambda: self.client.patch(
+            f"/api/v1/books/{self.book.pk}/", {"year": 1901},
+            content_type="application/json",
+        ))
+
+    def test_read_after_write_uses_primary(self):
+        self.client.force_login(self.admin)
+        self.client.patch(
+            f"/api/v1/books/{self.book.pk}/", {"year": 1901},
+            content_type="application/json",
+        )
+        self.client.logout()
+        response = self.assertRouted(
+            [DEFAULT_DB_ALIAS],
+            lambda: self.client.get(f"/api/v1/books/{self.book.pk}/"),
+        )
+        self.assertEqual(response.json()["year"], 1901)
+
+    def test_atomic_block_reads_primary(self):
+        with routers.replica():
+            self.assertIn(routers.ReplicaRouter().db_for_read(Book), REPLICAS)
+            with transaction.atomic():
+                self.assertIsNone(routers.ReplicaRouter().db_for_read(Book))
+        self.assertIsNone(routers.current_replica())
@@ -0,0 +1,23 @@
+from django.test import TestCase
+
+from library.models import Author, Book
+
+
+class AuthorStatsSaveTests(TestCase):
+    def test_save_keeps_trigger_stats(self):
+        author = Author.objects.create(last_name="Фамилия", first_name="Имя")
+        stale = Author.objects.get(pk=author.pk)
+        Book.objects.create(author=author, title="Книга", year=1900)
+
+        # Экземпляр загружен до книги: save() не должен затереть
+        # статистику и не должен ее перечитывать - один UPDATE
+        stale.bio = "Биография"
+        with self.assertNumQueries(1):
+            stale.save()
+
+        author.refresh_from_db()
+        self.assertEqual(author.bio, "Биография")
+        self.assertEqual(
+            (author.books_count, author.first_year, author.last_year),
+            (1, 1900, 1900),
+        )
@@ -1,5 +1,7 @@
 import os
+import sys
 from datetime import timedelta
+from importlib.util import find_spec
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -19,6 +21,8 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    # Лукапы pg_trgm (trigram_word_similar) для /api/v1/suggest/
+    "django.contrib.postgres",
 
     "rest_framework",
     "django_filters",
@@ -30,6 +34,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым: в замер попадают и остальные middleware (сессии, auth)
+    "api.instrumentation.InstrumentationMiddleware",
+    # Сразу за ним: сжимается окончательный ответ, время сжатия - в замере
+    "api.compression.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -81,6 +89,111 @@ else:
         }
     }
 
+# РЕШЕНИЕ: Постоянные соединения с проверкой перед повторным использованием
+# ПОЧЕМУ: Без CONN_MAX_AGE каждый запрос заново устанавливает TCP/TLS-
+# соединение и аутентифицируется в PostgreSQL - под нагрузкой это дольше
+# самих запросов. CONN_HEALTH_CHECKS отбрасывает соединение, которое
+# сервер закрыл, вместо ошибки в первом запросе
+DATABASES["default"]["CONN_MAX_AGE"] = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = (
+    os.getenv("DB_CONN_HEALTH_CHECKS", "True") == "True"
+)
+
+# РЕШЕНИЕ: Пул соединений PostgreSQL (DB_POOL=True)
+# ПОЧЕМУ: Общий на процесс пул нужен ASGI и многопоточным воркерам, где
+# соединение на поток не переиспользуется. Требует psycopg 3 и
+# psycopg_pool; с пулом CONN_MAX_AGE должен быть 0 - соединения
+# возвращаются в пул в конце запроса
+if os.getenv("DB_POOL", "False") == "True":
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"].setdefault("OPTIONS", {})["pool"] = {
+        "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+        "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+        "timeout": int(os.getenv("DB_POOL_TIMEOUT", "10")),
+    }
+
+# РЕШЕНИЕ: Реплики для чтения каталога (DB_REPLICAS)
+# ПОЧЕМУ: Анонимные GET книг и авторов - почти весь трафик; их можно
+# читать с реплик, а запись и чтение после записи оставить основной БД
+# (library.routers). Значение - через запятую: host[:port] для
+# PostgreSQL или файлы для SQLite. Остальные параметры берутся из default
+REPLICA_SOURCES = [
+    value.strip() for value in os.getenv("DB_REPLICAS", "").split(",")
+    if value.strip()
+]
+DATABASE_REPLICAS = []
+for index, replica in enumerate(REPLICA_SOURCES, start=1):
+    alias = f"replica_{index}"
+    # В тестах реплика смотрит в тестовую основную БД
+    settings_dict = dict(DATABASES["default"], TEST={"MIRROR": "default"})
+    if settings_dict["ENGINE"] == "django.db.backends.sqlite3":
+        settings_dict["NAME"] = BASE_DIR / replica
+    else:
+        host, _, port = replica.partition(":")
+        settings_dict["HOST"] = host
+        settings_dict["PORT"] = port or settings_dict["PORT"]
+    DATABASES[alias] = settings_dict
+    DATABASE_REPLICAS.append(alias)
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ["library.routers.ReplicaRouter"]
+
+# РЕШЕНИЕ: В тестах всегда есть реплика-зеркало основной БД
+# ПОЧЕМУ: Тесты маршрутизации (library/tests/test_routers.py) должны
+# идти при обычном manage.py test. TEST["MIRROR"] - отдельное соединение
+# к тестовой основной БД, как у настоящей реплики; в DATABASE_REPLICAS
+# алиас включают сами тесты, остальные тесты читают только default
+TEST_REPLICA = "replica_test"
+if sys.argv[1:2] == ["test"]:
+    DATABASES[TEST_REPLICA] = dict(
+        DATABASES["default"], TEST={"MIRROR": "default"}
+    )
+
+# Сколько секунд после записи в каталог все чтения идут в основную БД:
+# должно покрывать отставание реплик
+DB_REPLICA_LAG = int(os.getenv("DB_REPLICA_LAG", "5"))
+
+# РЕШЕНИЕ: Backend кэша задается через окружение, по умолчанию locmem
+# ПОЧЕМУ: Для нескольких воркеров без внешнего сервиса достаточно
+# FileBasedCache или DatabaseCache (после manage.py createcachetable)
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", "library-api"),
+    }
+}
+
+# Кэш ответов каталога (GET /api/v1/books/, /api/v1/authors/)
+CATALOGUE_CACHE_ALIAS = "default"
+CATALOGUE_CACHE_TIMEOUT = int(os.getenv("CATALOGUE_CACHE_TIMEOUT", "3600"))
+
+# Массовая загрузка (POST /api/v1/books/bulk/, /api/v1/authors/bulk/):
+# строк в одной транзакции и максимум строк в одном запросе
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "1000"))
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "100000"))
+
+# Пакетное чтение (?ids= и POST .../batch-get/): максимум id за запрос
+MULTIGET_MAX_IDS = int(os.getenv("MULTIGET_MAX_IDS", "200"))
+
+# Лента изменений (GET /api/v1/changes/, library.changes): максимум
+# записей на страницу, максимум секунд long-poll, период опроса журнала
+# во время ожидания и сколько дней хранить журнал (prune_changes)
+CHANGES_MAX_LIMIT = int(os.getenv("CHANGES_MAX_LIMIT", "10000"))
+CHANGES_MAX_WAIT = int(os.getenv("CHANGES_MAX_WAIT", "30"))
+CHANGES_POLL_INTERVAL = float(os.getenv("CHANGES_POLL_INTERVAL", "1"))
+CHANGES_RETENTION_DAYS = int(os.getenv("CHANGES_RETENTION_DAYS", "30"))
+
+# Снимок каталога в mmap (library.snapshot, manage.py build_snapshot):
+# путь к файлу (пусто - выключен) и период проверки поколений каталога
+# в build_snapshot --watch. Поколения общие для сборщика и воркеров только
+# при общем CACHES (file, database, redis): с locmem снимок не используется
+CATALOGUE_SNAPSHOT_PATH = os.getenv("CATALOGUE_SNAPSHOT_PATH", "")
+CATALOGUE_SNAPSHOT_INTERVAL = float(
+    os.getenv("CATALOGUE_SNAPSHOT_INTERVAL", "5")
+)
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
@@ -100,18 +213,92 @@ MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 MEDIA_BASE_URL = os.getenv('MEDIA_BASE_URL', '')
 
+# Обложки: ширины (px) и форматы превью, качество кодирования и число
+# потоков, которые строят превью вне запроса
+COVER_SIZES = [
+    int(size) for size in os.getenv("COVER_SIZES", "160,320,640").split(",")
+]
+COVER_FORMATS = os.getenv("COVER_FORMATS", "webp,jpeg").split(",")
+COVER_QUALITY = int(os.getenv("COVER_QUALITY", "80"))
+COVER_WORKERS = int(os.getenv("COVER_WORKERS", "2"))
+
 AUTH_USER_MODEL = "users.CustomUser"
 
+# РЕШЕНИЕ: Инструментирование запросов API (api.instrumentation)
+# ПОЧЕМУ: Число и время SQL, повторы (N+1), сериализация и рендер на
+# каждый запрос - в Server-Timing, в лог api.requests и в /metrics
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "True") == "True"
+INSTRUMENTATION_PATH_PREFIXES = ["/api/"]
+INSTRUMENTATION_SERVER_TIMING = (
+    os.getenv("INSTRUMENTATION_SERVER_TIMING", "True") == "True"
+)
+# Сколько последних запросов endpoint'а участвуют в перцентилях
+INSTRUMENTATION_WINDOW = int(os.getenv("INSTRUMENTATION_WINDOW", "1024"))
+# Один и тот же SQL столько раз за запрос - предупреждение о N+1 в логе
+INSTRUMENTATION_DUPLICATE_THRESHOLD = int(
+    os.getenv("INSTRUMENTATION_DUPLICATE_THRESHOLD", "5")
+)
+# Пустой - /metrics выключен (404): перцентили и счетчики по endpoint'ам
+# не должны быть доступны кому угодно
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# РЕШЕНИЕ: Сжатие ответов по Accept-Encoding (api.compression)
+# ПОЧЕМУ: JSON списков с повторяющимися авторами сжимается в разы;
+# br и zstd работают, если установлены пакеты brotli и zstandard
+COMPRESSION_ENCODINGS = os.getenv(
+    "COMPRESSION_ENCODINGS", "zstd,br,gzip"
+).split(",")
+# Меньшие ответы отдаются как есть
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        # Строка лога api.requests - уже JSON
+        "raw": {"format": "%(message)s"},
+    },
+    "handlers": {
+        "requests": {"class": "logging.StreamHandler", "formatter": "raw"},
+    },
+    "loggers": {
+        # WARNING по умолчанию - только запросы с N+1; строка на каждый
+        # запрос (INFO, нужна bench_replay --log) включается явно
+        "api.requests": {
+            "handlers": ["requests"],
+            "level": os.getenv("INSTRUMENTATION_LOG_LEVEL", "WARNING"),
+            "propagate": False,
+        },
+    },
+}
+
+# РЕШЕНИЕ: Stateless JWT (JWT_STATELESS=True) - пользователь из claims
+# ПОЧЕМУ: JWTAuthentication читает пользователя из БД на каждый запрос;
+# StatelessJWTAuthentication берет is_staff/is_superuser из токена, а
+# отзыв проверяет по версии прав (users.revocation)
+JWT_STATELESS = os.getenv("JWT_STATELESS", "False") == "True"
+# Размер LRU проверенных токенов на процесс
+JWT_VERIFIED_CACHE_SIZE = int(os.getenv("JWT_VERIFIED_CACHE_SIZE", "1024"))
+# Как часто процесс перечитывает версию прав пользователя из БД (сек)
+JWT_REVOCATION_CHECK_INTERVAL = int(
+    os.getenv("JWT_REVOCATION_CHECK_INTERVAL", "5")
+)
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
         "rest_framework.filters.OrderingFilter",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.v1.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.StatelessJWTAuthentication' if JWT_STATELESS
+        else 'rest_framework_simplejwt.authentication.JWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
 'DEFAULT_PERMISSION_CLASSES': [
@@ -119,12 +306,28 @@ REST_FRAMEWORK = {
     ],
 }
 
+# MessagePack - только если установлен пакет msgpack (api.v1.renderers)
+if find_spec("msgpack") is not None:
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"].insert(
+        1, "api.v1.renderers.MessagePackRenderer"
+    )
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'ROTATE_REFRESH_TOKENS': True,
+    'TOKEN_OBTAIN_SERIALIZER':
+        'users.tokens.CatalogueTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER':
+        'users.tokens.CatalogueTokenRefreshSerializer',
 }
 
+# РЕШЕНИЕ: Схема OpenAPI собирается заранее (manage.py build_schema)
+# ПОЧЕМУ: /api/v1/schema/ отдает готовый файл со сжатыми вариантами
+# вместо генерации на каждый запрос (api.v1.schema)
+SCHEMA_ROOT = Path(os.getenv("SCHEMA_ROOT", BASE_DIR / "schema"))
+SCHEMA_CACHE_MAX_AGE = int(os.getenv("SCHEMA_CACHE_MAX_AGE", "86400"))
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Library API',
     'DESCRIPTION': 'API для просмотра библиотеки книг',
@@ -1,6 +1,13 @@
 from django.contrib import admin
+from django.contrib.admin.utils import unquote
 from django.contrib.auth.admin import UserAdmin
 from .models import CustomUser
+from .revocation import bump_auth_version, revoke_deleted
+
+# Поля, изменение которых отзывает выданные пользователю JWT
+AUTH_FIELDS = {
+    "is_active", "is_staff", "is_superuser", "groups", "user_permissions",
+}
 
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
@@ -26,4 +33,31 @@ class CustomUserAdmin(UserAdmin):
             "classes": ("wide",),
             "fields": ("username", "email", "password1", "password2"),
         }),
-    )
\ No newline at end of file
+    )
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # РЕШЕНИЕ: Смена прав или статуса увеличивает auth_version
+        # ПОЧЕМУ: Stateless-токены несут is_staff в claims - старый токен
+        # иначе сохранил бы отобранные права до истечения срока
+        if change and AUTH_FIELDS & set(form.changed_data):
+            bump_auth_version(obj)
+
+    def delete_model(self, request, obj):
+        pk = obj.pk
+        super().delete_model(request, obj)
+        # Без строки пользователя версии нет - токены отклоняются
+        # (users.revocation); этим процессом - сразу после коммита
+        revoke_deleted([pk])
+
+    def delete_queryset(self, request, queryset):
+        pks = list(queryset.values_list("pk", flat=True))
+        super().delete_queryset(request, queryset)
+        revoke_deleted(pks)
+
+    def user_change_password(self, request, id, form_url=""):
+        response = super().user_change_password(request, id, form_url)
+        # Успешная смена пароля заканчивается редиректом
+        if request.method == "POST" and response.status_code == 302:
+            bump_auth_version(self.get_object(request, unquote(id)))
+        return response
@@ -0,0 +1,72 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import (
+    JWTStatelessUserAuthentication,
+)
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .revocation import is_revoked
+
+
+class VerifiedTokenCache:
+    """LRU проверенных токенов: raw-токен -> объект токена"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.tokens = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, raw_token):
+        with self.lock:
+            token = self.tokens.get(raw_token)
+            if token is not None:
+                self.tokens.move_to_end(raw_token)
+        if token is None:
+            return None
+        try:
+            # Подпись уже проверена, срок действия - нет
+            token.check_exp()
+        except TokenError:
+            with self.lock:
+                self.tokens.pop(raw_token, None)
+            return None
+        return token
+
+    def put(self, raw_token, token):
+        with self.lock:
+            self.tokens[raw_token] = token
+            self.tokens.move_to_end(raw_token)
+            while len(self.tokens) > self.maxsize:
+                self.tokens.popitem(last=False)
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    РЕШЕНИЕ: JWT без загрузки пользователя из БД (JWT_STATELESS=True)
+    ПОЧЕМУ:
+    1. JWTAuthentication делает SELECT users_customuser на каждый запрос
+    2. Здесь request.user - TokenUser: id, is_staff и is_superuser из
+       claims (users.tokens), поэтому IsAdminUser отвечает по токену
+    3. Отзыв - сравнение claim ver с версией прав (users.revocation)
+    4. Проверка подписи горячих токенов кэшируется в LRU процесса;
+       срок действия и отзыв проверяются на каждый запрос
+    """
+
+    verified = VerifiedTokenCache(settings.JWT_VERIFIED_CACHE_SIZE)
+
+    def get_validated_token(self, raw_token):
+        token = self.verified.get(raw_token)
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            self.verified.put(raw_token, token)
+        return token
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        version = validated_token.get("ver")
+        # Токен без ver выдан до включения режима - в нем нет и прав
+        if version is None or is_revoked(user.id, version):
+            raise InvalidToken("Токен отозван, войдите заново.")
+        return user
@@ -2,6 +2,13 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 class CustomUser(AbstractUser):
+    auth_version = models.PositiveIntegerField(
+        default=1,
+        editable=False,  # РЕШЕНИЕ: Версия прав, копируется в JWT (claim ver)
+        # ПОЧЕМУ: Токен с меньшей версией отозван - права, статус или
+        # пароль менялись после его выдачи (users.revocation)
+        verbose_name="Версия прав"
+    )
 
     class Meta:
         verbose_name = "Пользователь"
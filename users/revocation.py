@@ -0,0 +1,78 @@
+"""
+Отзыв JWT без запроса к таблице пользователей на каждый запрос.
+
+РЕШЕНИЕ: Версия прав читается из users_customuser.auth_version и держится
+в словаре процесса JWT_REVOCATION_CHECK_INTERVAL секунд
+ПОЧЕМУ:
+1. Stateless-токен проверяется без БД, поэтому отозвать его можно только
+   сравнением claim ver с текущей версией пользователя
+2. Источник версии - строка пользователя, а не кэш: запись в кэше могли
+   вытеснить (locmem общий с кэшем ответов) или не увидеть другие
+   процессы (locmem у каждого свой), и отзыв молча переставал работать
+3. На горячем пути - поиск в dict; к БД - один SELECT по первичному ключу
+   на пользователя раз в интервал. Удаленный или неактивный пользователь
+   версии не имеет - его токены отклоняются
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+
+# user_id -> (monotonic-время проверки, версия или None)
+_versions = {}
+_lock = threading.Lock()
+
+
+def remember_version(user_id, version):
+    # simplejwt кладет user_id в токен строкой - ключи везде строки
+    with _lock:
+        _versions[str(user_id)] = (time.monotonic(), version)
+
+
+def bump_auth_version(user):
+    """Увеличивает версию прав: все выданные пользователю токены отозваны"""
+    type(user).objects.filter(pk=user.pk).update(
+        auth_version=F("auth_version") + 1
+    )
+    user.refresh_from_db(fields=["auth_version"])
+    user_id, version = user.pk, user.auth_version
+    # Этот процесс отклоняет старые токены сразу, остальные - после
+    # перечитывания версии
+    transaction.on_commit(
+        lambda: remember_version(user_id, version), robust=True
+    )
+
+
+def revoke_deleted(user_ids):
+    """Токены удаленных пользователей отклоняются этим процессом сразу"""
+    user_ids = list(user_ids)
+    transaction.on_commit(
+        lambda: [remember_version(pk, None) for pk in user_ids], robust=True
+    )
+
+
+def load_version(user_id):
+    return get_user_model().objects.filter(
+        pk=user_id, is_active=True
+    ).values_list("auth_version", flat=True).first()
+
+
+def current_version(user_id):
+    """Версия прав пользователя или None, если его нет или он неактивен"""
+    user_id = str(user_id)
+    now = time.monotonic()
+    cached = _versions.get(user_id)
+    if cached and now - cached[0] < settings.JWT_REVOCATION_CHECK_INTERVAL:
+        return cached[1]
+    version = load_version(user_id)
+    with _lock:
+        _versions[user_id] = (now, version)
+    return version
+
+
+def is_revoked(user_id, version):
+    current = current_version(user_id)
+    return current is None or version < current
@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer, TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+
+
+def stamp_claims(token, user):
+    """
+    РЕШЕНИЕ: Права и версия прав пользователя - в claims токена
+    ПОЧЕМУ: StatelessJWTAuthentication отвечает на IsAdminUser по токену,
+    без SELECT пользователя; access-токен копирует claims из refresh
+    """
+    token["is_staff"] = user.is_staff
+    token["is_superuser"] = user.is_superuser
+    token["ver"] = user.auth_version
+    return token
+
+
+class CatalogueTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return stamp_claims(super().get_token(user), user)
+
+
+class CatalogueTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    РЕШЕНИЕ: При обновлении claims берутся из БД, а не из refresh-токена
+    ПОЧЕМУ:
+    1. Refresh - редкая операция, один SELECT здесь не страшен
+    2. Refresh-токен, выданный до смены прав, статуса или пароля (ver
+       меньше текущей), не обновляется - нужен повторный вход
+    3. Токены, выданные до появления claims, получают их при обновлении
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        user = get_user_model().objects.filter(**{
+            api_settings.USER_ID_FIELD:
+                refresh.payload.get(api_settings.USER_ID_CLAIM),
+        }).first()
+        version = refresh.payload.get("ver")
+        if (
+            user is None
+            or not api_settings.USER_AUTHENTICATION_RULE(user)
+            or (version is not None and version != user.auth_version)
+        ):
+            raise AuthenticationFailed(
+                self.error_messages["no_active_account"], "no_active_account",
+            )
+        stamp_claims(refresh, user)
+
+        # Дальше - как в TokenRefreshSerializer.validate
+        data = {"access": str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    pass
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data["refresh"] = str(refresh)
+        return data